@@ -0,0 +1,67 @@
+"""Microbenchmark for NIP-04 encryption with and without the shared secret cache.
+
+Simulates an agent exchanging messages with a fixed set of counterparties and
+reports messages per second for pynostr's ``EncryptedDirectMessage`` (one ECDH per
+message) and for :mod:`agentstr.relays.crypto` (one ECDH per counterparty).
+
+Usage:
+    python benchmarks/bench_nip04.py [--messages 5000] [--counterparties 200]
+"""
+import argparse
+import random
+import time
+
+from pynostr.encrypted_dm import EncryptedDirectMessage
+from pynostr.key import PrivateKey
+
+from agentstr.relays.crypto import clear_shared_secret_cache, nip04_decrypt, nip04_encrypt, shared_secret_cache_info
+
+
+def bench(label: str, fn, pairs: list[tuple[str, str, str]]) -> float:
+    t0 = time.perf_counter()
+    for args in pairs:
+        fn(*args)
+    rate = len(pairs) / (time.perf_counter() - t0)
+    print(f"{label:<32} {rate:>10,.0f} msg/s")
+    return rate
+
+
+def pynostr_encrypt(private_key_hex: str, public_key_hex: str, message: str) -> str:
+    dm = EncryptedDirectMessage()
+    dm.encrypt(private_key_hex, cleartext_content=message, recipient_pubkey=public_key_hex)
+    return dm.encrypted_message
+
+
+def pynostr_decrypt(private_key_hex: str, public_key_hex: str, message: str) -> str:
+    dm = EncryptedDirectMessage()
+    dm.decrypt(private_key_hex, encrypted_message=message, public_key_hex=public_key_hex)
+    return dm.cleartext_content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--counterparties", type=int, default=200)
+    args = parser.parse_args()
+
+    ours = PrivateKey()
+    theirs = [PrivateKey() for _ in range(args.counterparties)]
+    message = "Hello, agent! " * 20
+    peers = [random.choice(theirs) for _ in range(args.messages)]
+    to_encrypt = [(ours.hex(), peer.public_key.hex(), message) for peer in peers]
+    to_decrypt = [(ours.hex(), peer.public_key.hex(), nip04_encrypt(peer.hex(), ours.public_key.hex(), message))
+                  for peer in peers]
+    clear_shared_secret_cache()
+
+    print(f"{args.messages} messages, {args.counterparties} counterparties")
+    before = bench("encrypt (pynostr)", pynostr_encrypt, to_encrypt)
+    after = bench("encrypt (cached secret)", nip04_encrypt, to_encrypt)
+    print(f"{'speedup':<32} {after / before:>10.1f}x")
+    before = bench("decrypt (pynostr)", pynostr_decrypt, to_decrypt)
+    after = bench("decrypt (cached secret)", nip04_decrypt, to_decrypt)
+    print(f"{'speedup':<32} {after / before:>10.1f}x")
+    print(shared_secret_cache_info())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Benchmark SQLiteDatabase appends and history reads on a large message table.
+
+Seeds a database with ``--messages`` rows spread over ``--threads`` threads, then
+runs the same workload against three copies of it:
+
+- ``legacy``: default mode with the old single-column indexes (the previous behaviour);
+- ``default``: default mode with the composite thread index;
+- ``performance``: WAL, tuned pragmas, group-committing writer and read pool.
+
+The workload appends messages from many concurrent conversations and reads the
+latest 20 messages of random threads, reporting throughput and latency
+percentiles for each.
+
+Usage:
+    python benchmarks/bench_sqlite.py [--messages 1000000] [--threads 10000] [--concurrency 100]
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from agentstr.database import SQLiteDatabase
+
+AGENT = "bench"
+
+
+def seed(path: str, messages: int, threads: int):
+    conn = sqlite3.connect(path)
+    created_at = datetime.now(timezone.utc).isoformat()
+
+    def rows():
+        for i in range(messages):
+            thread = i % threads
+            yield (AGENT, f"thread{thread}", i // threads, f"user{thread}", "user" if i % 2 else "agent",
+                   f"message {i}", "x" * 200, "request", None, None, None, created_at)
+
+    with conn:
+        conn.executemany("INSERT INTO message (agent_name, thread_id, idx, user_id, role, message, content, kind, "
+                         "satoshis, extra_inputs, extra_outputs, created_at) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", rows())
+    conn.close()
+
+
+def use_legacy_indexes(path: str):
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("DROP INDEX IF EXISTS idx_message_thread_user")
+        conn.execute("CREATE INDEX idx_message_agent_name ON message (agent_name)")
+        conn.execute("CREATE INDEX idx_message_thread_id ON message (thread_id)")
+    conn.close()
+
+
+def report(label: str, count: int, elapsed: float, latencies: list[float]):
+    p50 = statistics.median(latencies) * 1000
+    p99 = statistics.quantiles(latencies, n=100)[98] * 1000
+    print(f"  {label:<8} {count / elapsed:>10,.0f} ops/s   p50 {p50:>8.2f} ms   p99 {p99:>8.2f} ms")
+
+
+async def run(label: str, path: str, threads: int, concurrency: int, operations: int):
+    db = SQLiteDatabase(f"sqlite://{path}", agent_name=AGENT, performance=label == "performance")
+    # Open without re-creating the composite index for the legacy copy
+    if label == "legacy":
+        db._ensure_message_table = _noop
+    await db.async_init()
+    print(label)
+    try:
+        latencies: list[float] = []
+
+        async def append(worker: int):
+            for i in range(operations // concurrency):
+                thread = random.randrange(threads)
+                t0 = time.perf_counter()
+                await db.add_message(f"thread{thread}", f"user{thread}", "agent", message=f"reply {worker}.{i}",
+                                     content="y" * 200, kind="final_response")
+                latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*[append(w) for w in range(concurrency)])
+        report("append", len(latencies), time.perf_counter() - t0, latencies)
+
+        latencies = []
+
+        async def read(worker: int):
+            for _ in range(operations // concurrency):
+                thread = random.randrange(threads)
+                t0 = time.perf_counter()
+                await db.get_messages(f"thread{thread}", f"user{thread}", limit=20, reverse=True)
+                latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*[read(w) for w in range(concurrency)])
+        report("history", len(latencies), time.perf_counter() - t0, latencies)
+    finally:
+        await db.close()
+
+
+async def _noop():
+    pass
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--threads", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--operations", type=int, default=5_000)
+    parser.add_argument("--modes", nargs="+", default=["legacy", "default", "performance"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "base.db")
+        db = await SQLiteDatabase(f"sqlite://{base}", agent_name=AGENT).async_init()
+        await db.close()
+        t0 = time.perf_counter()
+        seed(base, args.messages, args.threads)
+        print(f"Seeded {args.messages:,} messages in {args.threads:,} threads in {time.perf_counter() - t0:.1f}s")
+        print(f"{args.operations:,} operations per phase from {args.concurrency} concurrent conversations")
+        for mode in args.modes:
+            path = os.path.join(tmp, f"{mode}.db")
+            shutil.copy(base, path)
+            if mode == "legacy":
+                use_legacy_indexes(path)
+            await run(mode, path, args.threads, args.concurrency, args.operations)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
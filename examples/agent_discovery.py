@@ -14,8 +14,8 @@ client = NostrClient(relays)
 
 async def run():
     events = await client.read_posts_by_tag("agentstr_agents", limit=5)
-    for event in events:
-        metadata = await client.get_metadata_for_pubkey(event.pubkey)
+    metadata_by_pubkey = await client.get_metadata_for_pubkeys([event.pubkey for event in events])
+    for metadata in metadata_by_pubkey.values():
         try:
             agent_info = AgentCard.model_validate_json(metadata.about)
             print(json.dumps(agent_info.model_dump(), indent=4))
@@ -14,8 +14,8 @@ client = NostrClient(relays)
 
 async def run():
     events = await client.read_posts_by_tag("mcp_research_tools", limit=2)
-    for event in events:
-        metadata = await client.get_metadata_for_pubkey(event.pubkey)
+    metadata_by_pubkey = await client.get_metadata_for_pubkeys([event.pubkey for event in events])
+    for metadata in metadata_by_pubkey.values():
         try:
             mcp_definition = json.loads(metadata.about)
             print(json.dumps(mcp_definition, indent=4))
@@ -1,3 +1,4 @@
+import asyncio
 import os
 from typing import Callable
 from langchain_openai import ChatOpenAI
@@ -148,33 +149,48 @@ class AgentstrAgent:
         return checkpointer
 
     
+    def _create_chat_generator(self, checkpointer: AsyncPostgresSaver | AsyncSqliteSaver, mcp_tools: list[list[BaseTool]]):
+        """Creates the react agent's chat generator from the MCP servers' tools."""
+        all_tools = [tool for tools in mcp_tools for tool in tools] + self.tools
+        agent = create_react_agent(
+            model=ChatOpenAI(temperature=0,
+                            base_url=self.llm_base_url,
+                            api_key=self.llm_api_key,
+                            model_name=self.llm_model_name),
+            tools=all_tools,
+            prompt=self.prompt,
+            checkpointer=checkpointer,
+        )
+        return langgraph_chat_generator(agent, self.nostr_mcp_clients)
+
     async def _create_agent_server(self, checkpointer: AsyncPostgresSaver | AsyncSqliteSaver):
         """Creates and configures the NostrAgentServer."""
-        all_tools = []
-        for nostr_mcp_client in self.nostr_mcp_clients:
-            all_tools.extend(await to_langgraph_tools(nostr_mcp_client))
-        all_tools.extend(self.tools)
+        # Fetch all tool catalogs at once; get_skills then reads the cached catalogs
+        mcp_tools = await asyncio.gather(*[to_langgraph_tools(client) for client in self.nostr_mcp_clients])
 
-        all_skills = [skill for skills in [await nostr_mcp_client.get_skills() for nostr_mcp_client in self.nostr_mcp_clients] for skill in skills]
+        all_skills = [skill for nostr_mcp_client in self.nostr_mcp_clients for skill in await nostr_mcp_client.get_skills()]
 
         await checkpointer.setup()
 
         if self.agent_callable is not None:
             # Create dummy agent
             chat_generator = None
-        else:            
-            # Create react agent
-            agent = create_react_agent(
-                model=ChatOpenAI(temperature=0,
-                                base_url=self.llm_base_url,
-                                api_key=self.llm_api_key,
-                                model_name=self.llm_model_name),
-                tools=all_tools,
-                prompt=self.prompt,
-                checkpointer=checkpointer,
-            )
-
-            chat_generator = langgraph_chat_generator(agent, self.nostr_mcp_clients)
+        else:
+            # Create react agent, rebuilt whenever an MCP server republishes its tools
+            current = self._create_chat_generator(checkpointer, mcp_tools)
+
+            async def chat_generator(input: ChatInput):
+                async for output in current(input):
+                    yield output
+
+            async def on_tools_changed(_: dict):
+                nonlocal current
+                mcp_tools = await asyncio.gather(*[to_langgraph_tools(client) for client in self.nostr_mcp_clients])
+                current = self._create_chat_generator(checkpointer, mcp_tools)
+                logger.info("Rebuilt agent with updated MCP tools")
+
+            for nostr_mcp_client in self.nostr_mcp_clients:
+                nostr_mcp_client.add_update_callback(on_tools_changed)
 
         # Create Nostr Agent
         nostr_agent = NostrAgent(
@@ -200,4 +216,10 @@ class AgentstrAgent:
         """Starts the agent server."""
         async with self.checkpointer as checkpointer:
             server = await self._create_agent_server(checkpointer)
-            await server.start()
\ No newline at end of file
+            for nostr_mcp_client in self.nostr_mcp_clients:
+                nostr_mcp_client.watch()
+            try:
+                await server.start()
+            finally:
+                for nostr_mcp_client in self.nostr_mcp_clients:
+                    await nostr_mcp_client.close()
\ No newline at end of file
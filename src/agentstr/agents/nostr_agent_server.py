@@ -1,19 +1,23 @@
 import asyncio
 import uuid
 import os
-import time
+from typing import AsyncIterator, Awaitable, Callable
 
 from pynostr.event import Event
 from datetime import datetime, timezone, timedelta
 
 from agentstr.agents.nostr_agent import NostrAgent
 from agentstr.database import Database, BaseDatabase
-from agentstr.models import ChatInput, ChatOutput, Message, User, NoteFilters
+from agentstr.database.cache import CachedDatabase
+from agentstr.database.journal import MessageJournal
+from agentstr.models import ChatInput, ChatOutput, Message, ThreadSummary, User, NoteFilters
 from agentstr.commands.base import Commands
 from agentstr.commands.commands import DefaultCommands
+from agentstr.dispatcher import DispatcherStats, KeyedDispatcher
 from agentstr.logger import get_logger
 from agentstr.nostr_client import NostrClient
 from agentstr.mcp.nostr_mcp_client import NostrMCPClient
+from agentstr.relays.checkpoint import CheckpointStore
 
 logger = get_logger(__name__)
 
@@ -42,7 +46,16 @@ class NostrAgentServer:
                  db: BaseDatabase | None = None,
                  note_filters: NoteFilters | None = None,
                  commands: Commands | None = None,
-                 recipient_pubkey: str | None = None):
+                 recipient_pubkey: str | None = None,
+                 max_workers: int = 8,
+                 max_queue_size: int = 1000,
+                 resume: bool = True,
+                 write_behind: bool = True,
+                 history_limit: int | None = 20,
+                 history_max_tokens: int | None = None,
+                 summarizer: Callable[[str | None, list[Message]], Awaitable[str]] | None = None,
+                 new_thread_refresh_seconds: float | None = None,
+                 user_cache_ttl: float | None = 60):
         """
         Initialize a NostrAgentServer.
 
@@ -57,18 +70,40 @@ class NostrAgentServer:
             note_filters (NoteFilters, optional): Filters for subscribing to specific Nostr notes/events.
             commands (Commands, optional): Custom command handler. If not provided, uses DefaultCommands.
             recipient_pubkey (str, optional): The public key to listen for direct messages from.
+            max_workers (int, optional): Number of messages handled concurrently (default: 8).
+            max_queue_size (int, optional): Messages that may wait for a worker before the listener is paused (default: 1000).
+            resume (bool, optional): Checkpoint the message listener in the database and, after a restart, replay messages that arrived while the server was down (default: True).
+            write_behind (bool, optional): Save chat history through a batching journal instead of one commit per message, so replies do not wait for the database (default: True).
+            history_limit (int, optional): Maximum number of recent messages passed to the agent as history (None for no limit, default: 20).
+            history_max_tokens (int, optional): Token budget for the history passed to the agent (see :py:meth:`BaseDatabase.get_history`).
+            summarizer (Callable, optional): Async function ``(previous_summary, messages) -> summary``. If set, messages that fall out of the history window are folded into a rolling summary stored with the thread and passed to the agent as ``ChatInput.summary``.
+            new_thread_refresh_seconds (float, optional): Idle seconds after which a user's next message starts a new thread (default: the NEW_THREAD_REFRESH_SECONDS environment variable, or 3600).
+            user_cache_ttl (float, optional): Seconds users (balance and current thread) are cached in memory, see :class:`CachedDatabase` (None to read the database every time, default: 60).
         """
         self.client = nostr_client or (nostr_mcp_client.client if nostr_mcp_client else NostrClient(relays=relays, private_key=private_key, nwc_str=nwc_str))
         self.nostr_agent = nostr_agent
         self.db = db or Database()
         if self.db and self.db.agent_name is None:
             self.db.agent_name = self.nostr_agent.agent_card.name
+        if user_cache_ttl is not None and not isinstance(self.db, CachedDatabase):
+            self.db = CachedDatabase(self.db, ttl=user_cache_ttl)
         if self.nostr_agent.agent_card.nostr_pubkey is None:
             self.nostr_agent.agent_card.nostr_pubkey = self.client.private_key.public_key.bech32()
         if self.nostr_agent.agent_card.nostr_relays is None:
             self.nostr_agent.agent_card.nostr_relays = self.client.relays
         self.commands = commands or DefaultCommands(db=self.db, nostr_client=self.client, agent_card=nostr_agent.agent_card)
         self.recipient_pubkey = recipient_pubkey
+        self.dispatcher = KeyedDispatcher(self._direct_message_callback, workers=max_workers, max_queue_size=max_queue_size)
+        # Replies waiting for an invoice to be paid
+        self._background_tasks: set[asyncio.Task] = set()
+        self.checkpoint = CheckpointStore(self.db, listener_id="direct_messages") if resume else None
+        self.history: MessageJournal | BaseDatabase = MessageJournal(self.db) if write_behind else self.db
+        self.history_limit = history_limit
+        self.history_max_tokens = history_max_tokens
+        self.summarizer = summarizer
+        if new_thread_refresh_seconds is None:
+            new_thread_refresh_seconds = float(os.getenv("NEW_THREAD_REFRESH_SECONDS", 3600))  # default 1 hour
+        self.new_thread_refresh_seconds = new_thread_refresh_seconds
 
     async def _save_input(self, chat_input: ChatInput):
         """
@@ -77,8 +112,8 @@ class NostrAgentServer:
         Args:
             chat_input (ChatInput): The input message and metadata from the user.
         """
-        logger.debug(f"Saving input: {chat_input.model_dump_json()}")
-        await self.db.add_message(
+        logger.debug(f"Saving input: {chat_input.model_dump_json(exclude={'history'})}")
+        await self.history.add_message(
             thread_id=chat_input.thread_id, 
             user_id=chat_input.user_id, 
             role="user",
@@ -98,7 +133,7 @@ class NostrAgentServer:
             chat_output (ChatOutput): The agent or tool's output message and metadata.
         """
         logger.debug(f"Saving output: {chat_output.model_dump_json()}")
-        await self.db.add_message(
+        await self.history.add_message(
             thread_id=chat_output.thread_id, 
             user_id=chat_output.user_id, 
             role=chat_output.role,
@@ -122,10 +157,11 @@ class NostrAgentServer:
             bool: True if payment was successful or not required, False if insufficient balance.
         """
         logger.info(f"Checking payment: {user.available_balance} >= {satoshis}")
-        if user.available_balance >= satoshis:
-            logger.info(f"Auto payment successful: {user.available_balance} >= {satoshis}")
-            user.available_balance -= satoshis
-            await self.db.upsert_user(user)
+        # Deduct in the database, so concurrent requests cannot spend the same sats
+        updated = await self.db.adjust_balance(user.user_id, -satoshis)
+        if updated is not None:
+            logger.info(f"Auto payment successful: {updated.available_balance + satoshis} >= {satoshis}")
+            user.available_balance = updated.available_balance
             return True
         logger.info(f"Auto payment failed: {user.available_balance} < {satoshis}")
         return False
@@ -145,24 +181,24 @@ class NostrAgentServer:
             bool: True if payment was successful, False if payment failed.
         """
         logger.info(f"Waiting for payment: {user.available_balance} >= {satoshis} (timeout: {timeout}, interval: {interval})")
-        start_time = time.time()
-        success = False
-        while True:
-            if await self.client.nwc_relay.did_payment_succeed(invoice):
-                logger.info(f"Payment succeeded: {invoice}")
-                success = True
-                break
-            if self._check_balance_and_deduct(user, satoshis):
-                logger.info(f"Payment succeeded from deposit.")
-                success = True
-                break
-            if time.time() - start_time > timeout:
-                logger.info(f"Payment failed: {invoice}")
-                break
-            await asyncio.sleep(interval)
-        if not success:
-            return False
-        return True
+        # Invoice payments are pushed by the wallet's payment watcher; meanwhile wake up
+        # every `interval` seconds to check whether a deposit now covers the request
+        payment = asyncio.create_task(self.client.nwc_relay.wait_for_payment_success(invoice, timeout=timeout, interval=interval))
+        try:
+            while True:
+                done, _ = await asyncio.wait({payment}, timeout=interval)
+                if done:
+                    break
+                if await self._check_balance_and_deduct(user, satoshis):
+                    logger.info(f"Payment succeeded from deposit.")
+                    return True
+        finally:
+            payment.cancel()
+        if payment.result():
+            logger.info(f"Payment succeeded: {invoice}")
+            return True
+        logger.info(f"Payment failed: {invoice}")
+        return False
 
     async def chat(self, chat_input: ChatInput, event: Event, delegation_tags: dict[str, str], history: list[Message]):
         """
@@ -183,9 +219,11 @@ class NostrAgentServer:
         paying_user = await self.db.get_user(user_id=recipient_pubkey)
 
         # Save user message to db
-        logger.info(f"Saving input: {chat_input.model_dump_json()}")
+        logger.info(f"Saving input: {chat_input.model_dump_json(exclude={'history'})}")
         await self._save_input(chat_input)
-        
+
+        stream = self.nostr_agent.chat_stream(chat_input)
+
         # Handle base agent payments
         if self.nostr_agent.agent_card.satoshis or 0 > 0:
             logger.info(f"Checking payment: {paying_user.available_balance} >= {self.nostr_agent.agent_card.satoshis}")
@@ -195,14 +233,27 @@ class NostrAgentServer:
                 logger.info(f"Invoice: {invoice}")
                 message = f"Pay {self.nostr_agent.agent_card.satoshis} sats to use this agent.\n\n{invoice}"
                 await self.client.send_direct_message(recipient_pubkey, message, tags=delegation_tags)
-                if not await self._wait_for_payment(paying_user, self.nostr_agent.agent_card.satoshis, invoice):
-                    logger.info(f"Payment failed: {invoice}")
-                    message = "Payment failed. Please try again."
-                    await self.client.send_direct_message(recipient_pubkey, message, tags=delegation_tags)
-                    return
+                self._reply_after_payment(stream, paying_user, self.nostr_agent.agent_card.satoshis, invoice,
+                                          recipient_pubkey, delegation_tags)
+                return
+
+        await self._stream_reply(stream, paying_user, recipient_pubkey, delegation_tags)
+
+    async def _stream_reply(self, stream: AsyncIterator[ChatOutput], paying_user: User, recipient_pubkey: str,
+                            delegation_tags: dict[str, str] | None):
+        """
+        Send the agent's response chunks to the user, handling tool payments.
 
-        # Handle tool payments
-        async for chunk in self.nostr_agent.chat_stream(chat_input):
+        If a tool call needs an invoice paid, the rest of the stream is handed to a
+        background task that resumes it once the payment arrives.
+
+        Args:
+            stream (AsyncIterator[ChatOutput]): The agent's response stream.
+            paying_user (User): The user paying for the request.
+            recipient_pubkey (str): The public key to reply to.
+            delegation_tags (dict[str, str], optional): Delegation tags to add to replies.
+        """
+        async for chunk in stream:
             try:
                 # Save output
                 await self._save_output(chunk)
@@ -216,14 +267,9 @@ class NostrAgentServer:
                         logger.info(f"Invoice: {invoice}")
                         message = f'{chunk.message}\n\nJust pay {chunk.satoshis} sats.\n\n{invoice}'
                         await self.client.send_direct_message(recipient_pubkey, message, tags=delegation_tags)
-                        if await self._wait_for_payment(paying_user, chunk.satoshis, invoice):
-                            logger.info(f"Payment succeeded: {invoice}")
-                            continue
-                        else:
-                            logger.info(f"Payment failed: {invoice}")
-                            message = "Payment failed. Please try again."
-                            await self.client.send_direct_message(recipient_pubkey, message, tags=delegation_tags)
-                            break
+                        self._reply_after_payment(stream, paying_user, chunk.satoshis, invoice, recipient_pubkey,
+                                                  delegation_tags)
+                        return
                 elif chunk.kind == 'requires_input':
                     logger.info(f"Requires input: {chunk}")
                     raise NotImplementedError("requires_input not implemented")
@@ -233,14 +279,47 @@ class NostrAgentServer:
                 else:
                     logger.info(f"Final response: {chunk}")
                     message = chunk.message
-                    await self.client.send_direct_message(recipient_pubkey, message, tags=delegation_tags)     
-                    
+                    await self.client.send_direct_message(recipient_pubkey, message, tags=delegation_tags)
+
             except Exception as e:
                 logger.error(f"Error in chat: {e}")
                 message = "An error occurred. Please try again."
                 await self.client.send_direct_message(recipient_pubkey, message, tags=delegation_tags)
                 break
 
+    def _reply_after_payment(self, stream: AsyncIterator[ChatOutput], paying_user: User, satoshis: int, invoice: str,
+                             recipient_pubkey: str, delegation_tags: dict[str, str] | None):
+        """
+        Wait for `invoice` in a background task, then finish the reply.
+
+        The worker handling the message is freed as soon as the invoice is sent, so users
+        who never pay do not hold up anyone else.
+
+        Args:
+            stream (AsyncIterator[ChatOutput]): The rest of the agent's response stream.
+            paying_user (User): The user paying for the request.
+            satoshis (int): The required payment amount.
+            invoice (str): The BOLT11 invoice sent to the user.
+            recipient_pubkey (str): The public key to reply to.
+            delegation_tags (dict[str, str], optional): Delegation tags to add to replies.
+        """
+        async def finish():
+            try:
+                if await self._wait_for_payment(paying_user, satoshis, invoice):
+                    await self._stream_reply(stream, paying_user, recipient_pubkey, delegation_tags)
+                    return
+                logger.info(f"Payment failed: {invoice}")
+                await self.client.send_direct_message(recipient_pubkey, "Payment failed. Please try again.",
+                                                      tags=delegation_tags)
+            except Exception as e:
+                logger.error(f"Error finishing reply after payment: {e}", exc_info=True)
+                await self.client.send_direct_message(recipient_pubkey, "An error occurred. Please try again.",
+                                                      tags=delegation_tags)
+
+        task = asyncio.create_task(finish())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
     async def _parse_message(self, event: Event, message: str) -> str | ChatInput | None:
         """
         Parse and preprocess an incoming message, handling commands and filtering noise.
@@ -343,31 +422,91 @@ class NostrAgentServer:
         else:
             user_id, thread_id, delegation_tags = await self._get_user_and_thread_ids(event)
 
-        # Get message history
-        history = await self.db.get_messages(thread_id=thread_id, user_id=user_id)
-        logger.debug(f"Message history: {history}")
-
-        # Check for latest thread_id
-        if len(history) > 0:
-            latest_thread_id = history[-1].thread_id
-            latest_created_at = history[-1].created_at
-            new_thread_refresh_seconds = os.getenv("NEW_THREAD_REFRESH_SECONDS", 3600)  # default 1 hour
-            if latest_created_at < datetime.now(timezone.utc) - timedelta(seconds=new_thread_refresh_seconds):
-                logger.info(f"New thread detected: {latest_thread_id} != {thread_id} or {latest_created_at} < {datetime.now(timezone.utc) - timedelta(seconds=new_thread_refresh_seconds)}")
-                thread_id = uuid.uuid4().hex
-                await self.db.set_current_thread_id(user_id=user_id, thread_id=thread_id)
+        # Start a new thread if the current one has been idle for too long
+        history: list[Message] = []
+        summary: ThreadSummary | None = None
+        thread_info = await self.history.get_thread_info(thread_id=thread_id, user_id=user_id)
+        idle_since = datetime.now(timezone.utc) - timedelta(seconds=self.new_thread_refresh_seconds)
+        if thread_info is not None and thread_info.last_created_at < idle_since:
+            logger.info(f"New thread for user {user_id}: {thread_id} idle since {thread_info.last_created_at}")
+            thread_id = uuid.uuid4().hex
+            await self.db.set_current_thread_id(user_id=user_id, thread_id=thread_id)
+        elif thread_info is not None:
+            # Get the recent message history
+            history = await self.history.get_history(thread_id=thread_id, user_id=user_id,
+                                                     limit=self.history_limit, max_tokens=self.history_max_tokens)
+            logger.debug(f"Message history: {len(history)} message(s) up to {thread_info.last_idx}")
+            if self.summarizer is not None:
+                summary = await self.db.get_thread_summary(thread_id=thread_id, user_id=user_id)
 
         # Create chat input
         chat_input = ChatInput(
             message=message, 
             thread_id=thread_id, 
             user_id=user_id, 
-            extra_inputs=delegation_tags or {}
+            extra_inputs=delegation_tags or {},
+            history=history,
+            summary=summary.summary if summary else None,
         )
 
         # Chat with agent
         await self.chat(chat_input, event=event, delegation_tags=delegation_tags, history=history)
 
+        if self.summarizer is not None and history:
+            await self._update_summary(thread_id, user_id, history, summary)
+
+    async def _update_summary(self, thread_id: str, user_id: str, history: list[Message], summary: ThreadSummary | None):
+        """
+        Fold messages that fell out of the history window into the thread's rolling summary.
+
+        At most one page of messages is summarized per turn, so a long thread that had no
+        summary yet catches up over several turns.
+
+        Args:
+            thread_id (str): The thread to summarize.
+            user_id (str): The thread's user.
+            history (list[Message]): The history window passed to the agent this turn.
+            summary (ThreadSummary, optional): The thread's current summary.
+        """
+        covered = summary.up_to_idx if summary else -1
+        try:
+            dropped = await self.db.get_messages(thread_id=thread_id, user_id=user_id, after_idx=covered,
+                                                 before_idx=history[0].idx, limit=self.db.HISTORY_PAGE_SIZE)
+            if not dropped:
+                return
+            text = await self.summarizer(summary.summary if summary else None, dropped)
+            await self.db.set_thread_summary(thread_id=thread_id, user_id=user_id, summary=text, up_to_idx=dropped[-1].idx)
+        except Exception as e:
+            logger.warning(f"Could not update the summary of thread {thread_id}: {e}")
+
+
+    async def _dispatch_message(self, event: Event, message: str) -> asyncio.Future[None]:
+        """
+        Queue an incoming direct message for the worker pool.
+
+        Messages from the same user (or delegated thread) are handled in order, while
+        different users are served in parallel.
+
+        Args:
+            event (Event): The Nostr event containing the message.
+            message (str): The message content.
+
+        Returns:
+            asyncio.Future[None]: Completes once the message is handled, so the listener
+            only checkpoints it then.
+        """
+        delegation_tags = self._check_delegation(event)
+        key = tuple(delegation_tags["t"]) if delegation_tags else event.pubkey
+        return await self.dispatcher.submit(key, event, message)
+
+    def stats(self) -> DispatcherStats:
+        """
+        Return message queue metrics (queue depth, wait time, throughput).
+
+        Returns:
+            DispatcherStats: Current dispatcher metrics.
+        """
+        return self.dispatcher.stats()
 
     async def start(self):
         """
@@ -397,5 +536,19 @@ class NostrAgentServer:
         # Start direct message listener
         tasks = []
         logger.info(f"Starting message listener for {self.client.public_key.bech32()}")
-        tasks.append(self.client.direct_message_listener(callback=self._direct_message_callback, recipient_pubkey=self.recipient_pubkey))
-        await asyncio.gather(*tasks)
+        tasks.append(self.client.direct_message_listener(callback=self._dispatch_message, recipient_pubkey=self.recipient_pubkey,
+                                                         checkpoint=self.checkpoint))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # Finish queued messages first, so their replies are journaled and their
+            # progress checkpointed before those are closed
+            await self.dispatcher.close(drain=True)
+            # Replies still waiting for payment are given up
+            for task in self._background_tasks:
+                task.cancel()
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
+            if isinstance(self.history, MessageJournal):
+                await self.history.close()
+            if self.checkpoint is not None:
+                await self.checkpoint.close()
@@ -103,9 +103,7 @@ class DefaultCommands(Commands):
         await self.nostr_client.send_direct_message(pubkey, invoice)
 
         async def on_payment_success():
-            user = await self.db.get_user(pubkey)
-            user.available_balance += amount
-            await self.db.upsert_user(user)
+            user = await self.db.adjust_balance(pubkey, amount)
             await self.nostr_client.send_direct_message(pubkey, f"Payment successful! Your new balance is {user.available_balance} sats")
         
         async def on_payment_failure():
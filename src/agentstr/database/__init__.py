@@ -11,12 +11,16 @@ logger = get_logger(__name__)
 # Public factory
 # ---------------------------------------------------------------------
 
-def Database(conn_str: Optional[str] = None, *, agent_name: str | None = None) -> BaseDatabase:
+def Database(conn_str: Optional[str] = None, *, agent_name: str | None = None, **kwargs) -> BaseDatabase:
     """Factory returning an appropriate database backend instance.
 
+    Extra keyword arguments are passed to the backend, e.g. ``performance=True``
+    for :class:`SQLiteDatabase` or ``max_pool_size`` for :class:`PostgresDatabase`.
+
     Examples
     --------
     >>> db = Database("sqlite://:memory:")
+    >>> db = Database("sqlite://agent.db", performance=True)
     >>> db = await db.async_init()
     """
 
@@ -25,9 +29,9 @@ def Database(conn_str: Optional[str] = None, *, agent_name: str | None = None) -
     conn_str = conn_str or env_conn or "sqlite://agentstr_local.db"
     if conn_str.startswith("sqlite://"):
         logger.info("Using SQLite backend")
-        return SQLiteDatabase(conn_str, agent_name=agent_name)
+        return SQLiteDatabase(conn_str, agent_name=agent_name, **kwargs)
     if conn_str.startswith("postgres://") or conn_str.startswith("postgresql://"):
         conn_str = conn_str.replace("postgresql://", "postgres://", 1)
         logger.info("Using Postgres backend")
-        return PostgresDatabase(conn_str, agent_name=agent_name)
+        return PostgresDatabase(conn_str, agent_name=agent_name, **kwargs)
     raise ValueError(f"Unsupported connection string: {conn_str}")
@@ -13,17 +13,25 @@ All implementations share the same async API.
 from __future__ import annotations
 
 import abc
-from typing import Any, List, Literal
-from agentstr.models import Message, User
+from typing import Any, Callable, List, Literal
+from agentstr.models import Message, ThreadInfo, ThreadSummary, User
 
 from agentstr.logger import get_logger
 
 logger = get_logger(__name__)
 
 
+def estimate_tokens(message: Message) -> int:
+    """Cheap token estimate for *message* (about four characters per token)."""
+    return len(message.content or message.message) // 4 + 1
+
+
 class BaseDatabase(abc.ABC):
     """Abstract base class for concrete database backends."""
 
+    #: Messages fetched per query while filling a token-budgeted history window.
+    HISTORY_PAGE_SIZE = 50
+
     def __init__(self, conn_str: str, agent_name: str | None = None):
         self.conn_str = conn_str
         self.agent_name = agent_name
@@ -52,6 +60,18 @@ class BaseDatabase(abc.ABC):
     async def upsert_user(self, user: "User") -> None:
         """Create or update *user* in storage atomically."""
 
+    async def adjust_balance(self, user_id: str, delta: int) -> "User | None":
+        """Add *delta* satoshis to the balance of *user_id* and return the updated
+        user.  A change that would make the balance negative is refused and returns
+        None.  Backends override this with a single atomic statement; this default
+        reads and writes the user separately."""
+        user = await self.get_user(user_id)
+        if user.available_balance + delta < 0:
+            return None
+        user.available_balance += delta
+        await self.upsert_user(user)
+        return user
+
     # ------------------------------------------------------------------
     # Message history operations
     # ------------------------------------------------------------------
@@ -70,6 +90,14 @@ class BaseDatabase(abc.ABC):
     ) -> "Message":
         """Append a message to a thread and return the stored model."""
 
+    async def add_messages(self, messages: list[dict[str, Any]]) -> None:
+        """Append several messages, each given as :py:meth:`add_message` keyword
+        arguments plus an optional ``created_at`` datetime.  Messages of the same
+        thread get consecutive indices in list order.  Backends override this to
+        write the batch in one transaction."""
+        for message in messages:
+            await self.add_message(**{k: v for k, v in message.items() if k != "created_at"})
+
     @abc.abstractmethod
     async def get_messages(
         self,
@@ -83,6 +111,65 @@ class BaseDatabase(abc.ABC):
     ) -> List["Message"]:
         """Retrieve messages for *thread_id* ordered by idx."""
 
+    async def get_history(
+        self,
+        thread_id: str,
+        user_id: str,
+        *,
+        limit: int | None = None,
+        max_tokens: int | None = None,
+        count_tokens: Callable[[Message], int] = estimate_tokens,
+    ) -> List["Message"]:
+        """Return the latest messages of *thread_id* ordered by idx: at most *limit*
+        messages, and only as many of the newest as fit in *max_tokens* according to
+        *count_tokens*.  Only the window is read, newest first, so the cost does not
+        grow with the length of the thread.  Without either bound the whole thread
+        is returned."""
+        if limit is None and max_tokens is None:
+            return await self.get_messages(thread_id, user_id)
+        window: list[Message] = []
+        tokens = 0
+        before_idx = None
+        while limit is None or len(window) < limit:
+            page_size = self.HISTORY_PAGE_SIZE if limit is None else limit - len(window)
+            if max_tokens is not None:
+                page_size = min(page_size, self.HISTORY_PAGE_SIZE)
+            page = await self.get_messages(thread_id, user_id, limit=page_size, before_idx=before_idx, reverse=True)
+            for message in page:
+                if max_tokens is not None:
+                    tokens += count_tokens(message)
+                    if tokens > max_tokens:
+                        return window[::-1]
+                window.append(message)
+            if len(page) < page_size:
+                break
+            before_idx = page[-1].idx
+        return window[::-1]
+
+    async def get_thread_info(self, thread_id: str, user_id: str) -> ThreadInfo | None:
+        """Return metadata of the latest message of *thread_id*, or None if the thread
+        is empty.  Backends override this with a query that skips message bodies."""
+        messages = await self.get_messages(thread_id, user_id, limit=1, reverse=True)
+        if not messages:
+            return None
+        last = messages[0]
+        return ThreadInfo(thread_id=thread_id, user_id=user_id, last_idx=last.idx, last_role=last.role,
+                          last_kind=last.kind, last_created_at=last.created_at)
+
+    # ------------------------------------------------------------------
+    # Thread summaries
+    # ------------------------------------------------------------------
+    async def get_thread_summary(self, thread_id: str, user_id: str) -> ThreadSummary | None:
+        """Return the stored rolling summary of *thread_id*, if any.  The default
+        stores no summaries and always returns None."""
+        return None
+
+    async def set_thread_summary(self, thread_id: str, user_id: str, summary: str, up_to_idx: int) -> None:
+        """Store *summary* as covering the messages of *thread_id* up to and including
+        *up_to_idx*.  A summary never replaces one that covers more messages.  The
+        default discards it; backends override this to persist summaries."""
+        return None
+
     # ------------------------------------------------------------------
     # Current thread ID helpers
     # ------------------------------------------------------------------
@@ -94,3 +181,31 @@ class BaseDatabase(abc.ABC):
     async def set_current_thread_id(self, user_id: str, thread_id: str | None) -> None:
         """Persist *thread_id* as the current thread for *user_id*."""
 
+
+    # ------------------------------------------------------------------
+    # Listener checkpoints
+    # ------------------------------------------------------------------
+    async def get_checkpoints(self, listener_id: str) -> dict[str, int]:
+        """Return the high-water ``created_at`` of *listener_id* for each relay.  The
+        default stores no checkpoints, so listeners do not resume where they left off."""
+        return {}
+
+    async def save_checkpoints(
+        self,
+        listener_id: str,
+        checkpoints: dict[str, int],
+        events: list[tuple[str, int]],
+    ) -> None:
+        """Atomically advance the per-relay high-water marks of *listener_id* and
+        record the ``(event_id, created_at)`` pairs it has processed.  Marks never
+        move backwards.  The default discards them; backends override this to make
+        listeners resumable."""
+        return None
+
+    async def get_processed_event_ids(self, listener_id: str, since: int) -> list[str]:
+        """Return ids of events processed by *listener_id* created at or after *since*."""
+        return []
+
+    async def prune_processed_events(self, listener_id: str, before: int) -> None:
+        """Forget processed events of *listener_id* created before *before*."""
+        return None
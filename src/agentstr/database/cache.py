@@ -0,0 +1,255 @@
+"""Write-through cache of user state in front of a database.
+
+:class:`CachedDatabase` keeps recently used :class:`~agentstr.models.User` rows in
+memory, so handling a message does not read the same user several times.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, List, Literal, Self
+
+from agentstr.database.base import BaseDatabase, estimate_tokens
+from agentstr.logger import get_logger
+from agentstr.models import Message, ThreadInfo, ThreadSummary, User
+
+logger = get_logger(__name__)
+
+
+class CachedDatabase(BaseDatabase):
+    """Wraps a :class:`BaseDatabase` and caches users (balance and current thread).
+
+    Reads of a cached user are served from memory for *ttl* seconds.  Writes go to
+    the database first and then update the cache (write-through).  Concurrent
+    :py:meth:`get_user` calls for the same uncached user share one query.  At most
+    *max_users* users are kept; the least recently used are dropped first.
+
+    Balance changes always go to the database through
+    :py:meth:`BaseDatabase.adjust_balance`, which refuses to take a balance below
+    zero, so a stale cached balance can never let a deduction through.  Writes made
+    to the wrapped database directly, or by other processes, show up in cached
+    reads once the entry expires.  Every other method is passed through.
+
+    Args:
+        db: Database to cache.
+        ttl: Seconds a cached user is served without reading the database.
+        max_users: Maximum number of cached users.
+    """
+
+    def __init__(self, db: BaseDatabase, ttl: float = 60, max_users: int = 10000):
+        self.db = db
+        # Paging is done by the wrapped database, which reads its own value
+        self.HISTORY_PAGE_SIZE = db.HISTORY_PAGE_SIZE
+        self.ttl = ttl
+        self.max_users = max_users
+        # user_id -> (user, time stored)
+        self._users: OrderedDict[str, tuple[User, float]] = OrderedDict()
+        self._loading: dict[str, asyncio.Future[User]] = {}
+        # Reads and writes in flight per user.  When they overlap, the row each one
+        # returns may already be outdated, so none of them is cached.
+        self._in_flight: Counter[str] = Counter()
+        self._overlapped: set[str] = set()
+        self._hits = 0
+        self._misses = 0
+
+    # The connection details belong to the wrapped database
+    @property
+    def conn_str(self) -> str:
+        return self.db.conn_str
+
+    @property
+    def agent_name(self) -> str | None:
+        return self.db.agent_name
+
+    @agent_name.setter
+    def agent_name(self, value: str | None) -> None:
+        self.db.agent_name = value
+
+    @property
+    def conn(self) -> Any:
+        return self.db.conn
+
+    # --------------------------- cache -------------------------------
+    def _cached(self, user_id: str) -> User | None:
+        entry = self._users.get(user_id)
+        if entry is None:
+            return None
+        user, stored_at = entry
+        if time.monotonic() - stored_at >= self.ttl:
+            del self._users[user_id]
+            return None
+        self._users.move_to_end(user_id)
+        return user
+
+    def _store(self, user: User) -> None:
+        self._users[user.user_id] = (user.model_copy(), time.monotonic())
+        self._users.move_to_end(user.user_id)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+
+    def _begin(self, user_id: str) -> None:
+        if self._in_flight[user_id]:
+            self._overlapped.add(user_id)
+        self._in_flight[user_id] += 1
+
+    def _end(self, user_id: str, write: bool) -> bool:
+        """Finish a read or write and return whether its result may be cached."""
+        if write:
+            self._users.pop(user_id, None)
+        cacheable = user_id not in self._overlapped
+        self._in_flight[user_id] -= 1
+        if not self._in_flight[user_id]:
+            del self._in_flight[user_id]
+            self._overlapped.discard(user_id)
+        return cacheable
+
+    def invalidate(self, user_id: str | None = None) -> None:
+        """Drop *user_id* (or every user) from the cache."""
+        if user_id is None:
+            self._users.clear()
+            self._overlapped.update(self._in_flight)
+        else:
+            self._users.pop(user_id, None)
+            if user_id in self._in_flight:
+                self._overlapped.add(user_id)
+
+    def stats(self) -> dict[str, int | float]:
+        """Return the cache size and hit rate."""
+        lookups = self._hits + self._misses
+        return {
+            "users": len(self._users),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+        }
+
+    # --------------------------- lifecycle -------------------------------
+    async def async_init(self) -> Self:
+        await self.db.async_init()
+        return self
+
+    async def close(self) -> None:
+        self._users.clear()
+        await self.db.close()
+
+    # --------------------------- users -------------------------------
+    async def get_user(self, user_id: str) -> User:
+        user = self._cached(user_id)
+        if user is not None:
+            self._hits += 1
+            return user.model_copy()
+        self._misses += 1
+        # Share a query already in flight for this user
+        while (loading := self._loading.get(user_id)) is not None:
+            try:
+                return (await asyncio.shield(loading)).model_copy()
+            except asyncio.CancelledError:
+                if not loading.cancelled():
+                    raise
+                # The caller running the query was cancelled; run it again
+        loading = asyncio.get_running_loop().create_future()
+        self._loading[user_id] = loading
+        self._begin(user_id)
+        try:
+            user = await self.db.get_user(user_id)
+        except asyncio.CancelledError:
+            loading.cancel()
+            raise
+        except Exception as e:
+            loading.set_exception(e)
+            loading.exception()  # only waiters need to see it
+            raise
+        else:
+            loading.set_result(user)
+        finally:
+            del self._loading[user_id]
+            cacheable = self._end(user_id, write=False)
+        if cacheable:
+            self._store(user)
+        return user.model_copy()
+
+    async def upsert_user(self, user: User) -> None:
+        self._begin(user.user_id)
+        try:
+            await self.db.upsert_user(user)
+        finally:
+            cacheable = self._end(user.user_id, write=True)
+        if cacheable:
+            self._store(user)
+
+    async def adjust_balance(self, user_id: str, delta: int) -> User | None:
+        self._begin(user_id)
+        try:
+            user = await self.db.adjust_balance(user_id, delta)
+        finally:
+            cacheable = self._end(user_id, write=True)
+        if cacheable and user is not None:
+            self._store(user)
+        return user
+
+    async def get_current_thread_id(self, user_id: str) -> str | None:
+        return (await self.get_user(user_id)).current_thread_id
+
+    async def set_current_thread_id(self, user_id: str, thread_id: str | None) -> None:
+        cached = self._cached(user_id)
+        if cached is not None and cached.current_thread_id == thread_id:
+            return
+        self._begin(user_id)
+        try:
+            await self.db.set_current_thread_id(user_id, thread_id)
+        finally:
+            cacheable = self._end(user_id, write=True)
+        if cacheable and cached is not None:
+            cached.current_thread_id = thread_id
+            self._store(cached)
+
+    # --------------------------- pass-through -------------------------------
+    async def add_message(
+        self,
+        thread_id: str,
+        user_id: str,
+        role: Literal["user", "agent", "tool"],
+        message: str = "",
+        content: str = "",
+        kind: str = "request",
+        satoshis: int | None = None,
+        extra_inputs: dict[str, Any] = {},
+        extra_outputs: dict[str, Any] = {},
+    ) -> Message:
+        return await self.db.add_message(thread_id, user_id, role, message=message, content=content, kind=kind,
+                                         satoshis=satoshis, extra_inputs=extra_inputs, extra_outputs=extra_outputs)
+
+    async def add_messages(self, messages: list[dict[str, Any]]) -> None:
+        await self.db.add_messages(messages)
+
+    async def get_messages(self, thread_id: str, user_id: str, **kwargs) -> List[Message]:
+        return await self.db.get_messages(thread_id, user_id, **kwargs)
+
+    async def get_history(self, thread_id: str, user_id: str, *, limit: int | None = None,
+                          max_tokens: int | None = None,
+                          count_tokens: Callable[[Message], int] = estimate_tokens) -> List[Message]:
+        return await self.db.get_history(thread_id, user_id, limit=limit, max_tokens=max_tokens,
+                                         count_tokens=count_tokens)
+
+    async def get_thread_info(self, thread_id: str, user_id: str) -> ThreadInfo | None:
+        return await self.db.get_thread_info(thread_id, user_id)
+
+    async def get_thread_summary(self, thread_id: str, user_id: str) -> ThreadSummary | None:
+        return await self.db.get_thread_summary(thread_id, user_id)
+
+    async def set_thread_summary(self, thread_id: str, user_id: str, summary: str, up_to_idx: int) -> None:
+        await self.db.set_thread_summary(thread_id, user_id, summary, up_to_idx)
+
+    async def get_checkpoints(self, listener_id: str) -> dict[str, int]:
+        return await self.db.get_checkpoints(listener_id)
+
+    async def save_checkpoints(self, listener_id: str, checkpoints: dict[str, int],
+                               events: list[tuple[str, int]]) -> None:
+        await self.db.save_checkpoints(listener_id, checkpoints, events)
+
+    async def get_processed_event_ids(self, listener_id: str, since: int) -> list[str]:
+        return await self.db.get_processed_event_ids(listener_id, since)
+
+    async def prune_processed_events(self, listener_id: str, before: int) -> None:
+        await self.db.prune_processed_events(listener_id, before)
@@ -0,0 +1,183 @@
+"""Write-behind journal batching chat history writes.
+
+:class:`MessageJournal` accepts messages without waiting for the database and
+writes them in batches, so that replies are not held up by a commit per
+streamed chunk.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Any, List, Literal
+
+from agentstr.database.base import BaseDatabase
+from agentstr.logger import get_logger
+from agentstr.models import Message, ThreadInfo
+
+logger = get_logger(__name__)
+
+
+class MessageJournal:
+    """Buffers :py:meth:`BaseDatabase.add_message` calls and writes them in batches.
+
+    Messages are queued in memory and written with :py:meth:`BaseDatabase.add_messages`
+    (one transaction per batch) every *flush_interval* seconds, or as soon as
+    *batch_size* messages are waiting.  Each message keeps the time it was
+    journaled as its ``created_at``, and messages of a thread keep their order.
+
+    Reads through :py:meth:`get_messages` first flush the thread's pending messages, so
+    a caller always sees its own writes.  When *max_queue_size* messages are waiting,
+    :py:meth:`add_message` blocks until a flush makes room.  Call :py:meth:`close` on
+    shutdown to write what is left; messages still queued when the process crashes
+    are lost.
+
+    A failed write raises from :py:meth:`flush` (and so from the reads that trigger
+    it) and is retried.  After *max_retries* failed attempts the batch is dropped and
+    kept in :py:attr:`dead_letters`, so one bad batch cannot stall every other
+    thread or leave writers blocked.
+
+    Args:
+        db: Database the messages are written to.
+        flush_interval: Maximum seconds a message waits before it is written.
+        batch_size: Number of waiting messages that triggers a write.
+        max_queue_size: Maximum number of waiting messages before writers block.
+        max_retries: Failed attempts after which a batch is dropped.
+    """
+
+    def __init__(self, db: BaseDatabase, flush_interval: float = 0.05, batch_size: int = 100,
+                 max_queue_size: int = 10000, max_retries: int = 5):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_queue_size = max_queue_size
+        self.max_retries = max_retries
+        #: Messages dropped after *max_retries* failed writes (the most recent *max_queue_size*).
+        self.dead_letters: deque[dict[str, Any]] = deque(maxlen=max_queue_size)
+        # Consecutive failed attempts to write the batch at the head of the queue
+        self._failures = 0
+        self._pending: list[dict[str, Any]] = []
+        # Threads with messages that are queued or being written
+        self._threads: Counter[str] = Counter()
+        self._flusher: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+
+    @property
+    def pending(self) -> int:
+        """Number of messages not yet written."""
+        return sum(self._threads.values())
+
+    async def add_message(
+        self,
+        thread_id: str,
+        user_id: str,
+        role: Literal["user", "agent", "tool"],
+        message: str = "",
+        content: str = "",
+        kind: str = "request",
+        satoshis: int | None = None,
+        extra_inputs: dict[str, Any] = {},
+        extra_outputs: dict[str, Any] = {},
+    ) -> Message:
+        """Queue a message for the next batch (see :py:meth:`BaseDatabase.add_message`).
+
+        Returns the queued message.  Its ``idx`` is -1, as the database only assigns
+        one when the batch is written.
+        """
+        while len(self._pending) >= self.max_queue_size:
+            self._wakeup.set()
+            self._space.clear()
+            await self._space.wait()
+        entry = {
+            "thread_id": thread_id,
+            "user_id": user_id,
+            "role": role,
+            "message": message,
+            "content": content,
+            "kind": kind,
+            "satoshis": satoshis,
+            "extra_inputs": extra_inputs,
+            "extra_outputs": extra_outputs,
+            "created_at": datetime.now(timezone.utc),
+        }
+        queued = Message(agent_name=self.db.agent_name or "", idx=-1, **entry)
+        self._pending.append(entry)
+        self._threads[thread_id] += 1
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return queued
+
+    async def get_messages(self, thread_id: str, user_id: str, **kwargs) -> List[Message]:
+        """Write the thread's pending messages, then read it (see :py:meth:`BaseDatabase.get_messages`)."""
+        if self._threads[thread_id]:
+            await self.flush()
+        return await self.db.get_messages(thread_id, user_id, **kwargs)
+
+    async def get_history(self, thread_id: str, user_id: str, **kwargs) -> List[Message]:
+        """Write the thread's pending messages, then read its window (see :py:meth:`BaseDatabase.get_history`)."""
+        if self._threads[thread_id]:
+            await self.flush()
+        return await self.db.get_history(thread_id, user_id, **kwargs)
+
+    async def get_thread_info(self, thread_id: str, user_id: str) -> ThreadInfo | None:
+        """Write the thread's pending messages, then read its latest message metadata."""
+        if self._threads[thread_id]:
+            await self.flush()
+        return await self.db.get_thread_info(thread_id, user_id)
+
+    async def _flush_loop(self) -> None:
+        while self._pending:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Could not write {len(self._pending)} journaled message(s): {e!s}")
+                await asyncio.sleep(self.flush_interval)
+
+    async def flush(self) -> None:
+        """Write all queued messages now."""
+        async with self._flush_lock:
+            while self._pending:
+                batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+                try:
+                    await self.db.add_messages(batch)
+                except Exception:
+                    self._failures += 1
+                    if self._failures < self.max_retries:
+                        # Keep the batch, in order, for the next attempt
+                        self._pending = batch + self._pending
+                    else:
+                        logger.error(f"Dropping {len(batch)} journaled message(s) after {self._failures} failed writes")
+                        self.dead_letters.extend(batch)
+                        self._failures = 0
+                        self._written(batch)
+                    raise
+                except BaseException:
+                    self._pending = batch + self._pending
+                    raise
+                self._failures = 0
+                self._written(batch)
+
+    def _written(self, batch: list[dict[str, Any]]) -> None:
+        """Stop tracking `batch`, whether it was written or dropped."""
+        self._threads.subtract(m["thread_id"] for m in batch)
+        self._threads += Counter()  # drop threads with nothing left
+        self._space.set()
+
+    async def close(self) -> None:
+        """Stop the background writer and write any queued messages."""
+        if self._flusher is not None:
+            # Let a write in progress finish rather than cancelling it halfway
+            async with self._flush_lock:
+                self._flusher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flusher
+            self._flusher = None
+        await self.flush()
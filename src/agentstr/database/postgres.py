@@ -1,9 +1,11 @@
+import asyncio
+import contextlib
 import asyncpg
 import json
 from datetime import datetime, timezone
 from typing import Self, Any, List, Literal
 
-from agentstr.models import Message, User
+from agentstr.models import Message, ThreadInfo, ThreadSummary, User
 from agentstr.database.base import BaseDatabase
 from agentstr.logger import get_logger
 
@@ -11,26 +13,132 @@ logger = get_logger(__name__)
 
 
 class PostgresDatabase(BaseDatabase):
-    """PostgreSQL implementation using `asyncpg`."""
+    """PostgreSQL implementation using an `asyncpg` connection pool.
+
+    Concurrent coroutines each borrow their own connection from the pool instead of
+    queueing on a single one. The hot queries use fixed query texts, so asyncpg's
+    per-connection statement cache keeps them prepared after their first use on each
+    connection. A background task checks the pool every *health_check_interval*
+    seconds and replaces its connections if the check fails.
+
+    Args:
+        conn_str: Postgres connection string.
+        agent_name: Name scoping all rows to one agent.
+        min_pool_size: Connections opened up front and kept open.
+        max_pool_size: Maximum number of connections.
+        statement_cache_size: Prepared statements cached per connection (use 0 behind
+            PgBouncer in transaction mode).
+        command_timeout: Default timeout in seconds for each query (None for no timeout).
+        health_check_interval: Seconds between pool health checks (None to disable).
+    """
 
     USER_TABLE_NAME = "agentstr_users"
     MESSAGE_TABLE_NAME = "agentstr_messages"
+    THREAD_COUNTER_TABLE_NAME = "agentstr_thread_counters"
+    THREAD_SUMMARY_TABLE_NAME = "agentstr_thread_summaries"
+    CHECKPOINT_TABLE_NAME = "agentstr_listener_checkpoints"
+    PROCESSED_EVENT_TABLE_NAME = "agentstr_processed_events"
 
-    def __init__(self, conn_str: str, *, agent_name: str | None = None):
+    GET_USER_QUERY = f"SELECT available_balance, current_thread_id FROM {USER_TABLE_NAME} WHERE agent_name = $1 AND user_id = $2"
+    UPSERT_USER_QUERY = f"""INSERT INTO {USER_TABLE_NAME} (agent_name, user_id, available_balance, current_thread_id)
+            VALUES ($1, $2, $3, $4)
+            ON CONFLICT (agent_name, user_id) DO UPDATE
+            SET available_balance = EXCLUDED.available_balance, current_thread_id = EXCLUDED.current_thread_id"""
+    # Updates only the current thread, so a concurrent balance change is not overwritten
+    SET_THREAD_QUERY = f"""INSERT INTO {USER_TABLE_NAME} (agent_name, user_id, available_balance, current_thread_id)
+            VALUES ($1, $2, 0, $3)
+            ON CONFLICT (agent_name, user_id) DO UPDATE SET current_thread_id = EXCLUDED.current_thread_id"""
+    # Balance changes happen in one statement; a debit never takes the balance below zero
+    DEBIT_QUERY = f"""UPDATE {USER_TABLE_NAME} SET available_balance = available_balance + $3
+            WHERE agent_name = $1 AND user_id = $2 AND available_balance + $3 >= 0
+            RETURNING available_balance, current_thread_id"""
+    CREDIT_QUERY = f"""INSERT INTO {USER_TABLE_NAME} (agent_name, user_id, available_balance, current_thread_id)
+            VALUES ($1, $2, $3, NULL)
+            ON CONFLICT (agent_name, user_id) DO UPDATE
+            SET available_balance = {USER_TABLE_NAME}.available_balance + EXCLUDED.available_balance
+            RETURNING available_balance, current_thread_id"""
+    # Allocates the thread's next index from its counter row (seeded from existing messages)
+    # and inserts the message in one statement. The counter row lock serializes appends.
+    ADD_MESSAGE_QUERY = f"""WITH counter AS (
+            INSERT INTO {THREAD_COUNTER_TABLE_NAME} (agent_name, thread_id, next_idx)
+            VALUES ($1::TEXT, $2::TEXT, (SELECT COALESCE(MAX(idx), -1) + 2 FROM {MESSAGE_TABLE_NAME} WHERE agent_name = $1 AND thread_id = $2))
+            ON CONFLICT (agent_name, thread_id) DO UPDATE SET next_idx = {THREAD_COUNTER_TABLE_NAME}.next_idx + 1
+            RETURNING next_idx - 1 AS idx
+        )
+        INSERT INTO {MESSAGE_TABLE_NAME} (agent_name, thread_id, idx, user_id, role, message, content, kind, satoshis, extra_inputs, extra_outputs, created_at)
+        SELECT $1, $2, counter.idx, $3::TEXT, $4::TEXT, $5::TEXT, $6::TEXT, $7::TEXT, $8::INTEGER, $9::TEXT, $10::TEXT, $11::TIMESTAMP
+        FROM counter
+        RETURNING idx"""
+
+    def __init__(self, conn_str: str, *, agent_name: str | None = None, min_pool_size: int = 2,
+                 max_pool_size: int = 10, statement_cache_size: int = 100, command_timeout: float | None = 60,
+                 health_check_interval: float | None = 30):
         super().__init__(conn_str, agent_name)
+        self.min_pool_size = min_pool_size
+        self.max_pool_size = max_pool_size
+        self.statement_cache_size = statement_cache_size
+        self.command_timeout = command_timeout
+        self.health_check_interval = health_check_interval
+        self.pool: asyncpg.Pool | None = None
+        self._health_task: asyncio.Task | None = None
 
     async def async_init(self) -> Self:
         logger.debug("Connecting to Postgres: %s", self.conn_str)
-        self.conn = await asyncpg.connect(dsn=self.conn_str)
+        self.pool = await asyncpg.create_pool(
+            dsn=self.conn_str,
+            min_size=self.min_pool_size,
+            max_size=self.max_pool_size,
+            statement_cache_size=self.statement_cache_size,
+            command_timeout=self.command_timeout,
+        )
+        # The pool offers the same query methods as a connection
+        self.conn = self.pool
         await self._ensure_user_table()
         await self._ensure_message_table()
+        await self._ensure_checkpoint_tables()
+        if self.health_check_interval:
+            self._health_task = asyncio.create_task(self._health_loop())
         return self
 
     async def close(self) -> None:
-        if self.conn:
-            await self.conn.close()
+        if self._health_task is not None:
+            self._health_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._health_task
+            self._health_task = None
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
             self.conn = None
 
+    # --------------------------- pool -------------------------------
+    async def health_check(self, timeout: float = 5) -> bool:
+        """Return True if a pooled connection answers a trivial query within *timeout* seconds."""
+        try:
+            async with self.pool.acquire(timeout=timeout) as conn:
+                return await conn.fetchval("SELECT 1", timeout=timeout) == 1
+        except Exception as e:
+            logger.warning("[Postgres] Health check failed: %s", e)
+            return False
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            if not await self.health_check():
+                # Replace every connection once it is released
+                await self.pool.expire_connections()
+
+    def pool_stats(self) -> dict[str, int]:
+        """Return the pool's size, idle connections and configured bounds."""
+        if self.pool is None:
+            return {"size": 0, "idle": 0, "min_size": self.min_pool_size, "max_size": self.max_pool_size}
+        return {
+            "size": self.pool.get_size(),
+            "idle": self.pool.get_idle_size(),
+            "min_size": self.pool.get_min_size(),
+            "max_size": self.pool.get_max_size(),
+        }
+
     # --------------------------- helpers -------------------------------
     async def _ensure_user_table(self) -> None:
         await self.conn.execute(
@@ -73,6 +181,49 @@ class PostgresDatabase(BaseDatabase):
         await self.conn.execute(
             f"CREATE INDEX IF NOT EXISTS idx_{self.MESSAGE_TABLE_NAME}_user ON {self.MESSAGE_TABLE_NAME} (agent_name, user_id)"
         )
+        await self.conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {self.THREAD_COUNTER_TABLE_NAME} (
+                agent_name TEXT NOT NULL,
+                thread_id  TEXT NOT NULL,
+                next_idx   INTEGER NOT NULL,
+                PRIMARY KEY (agent_name, thread_id)
+            )"""
+        )
+        await self.conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {self.THREAD_SUMMARY_TABLE_NAME} (
+                agent_name TEXT NOT NULL,
+                thread_id  TEXT NOT NULL,
+                user_id    TEXT NOT NULL,
+                summary    TEXT NOT NULL,
+                up_to_idx  INTEGER NOT NULL,
+                updated_at TIMESTAMP NOT NULL,
+                PRIMARY KEY (agent_name, thread_id, user_id)
+            )"""
+        )
+
+    async def _ensure_checkpoint_tables(self) -> None:
+        """Create listener checkpoint tables if they don't exist."""
+        await self.conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {self.CHECKPOINT_TABLE_NAME} (
+                agent_name  TEXT NOT NULL,
+                listener_id TEXT NOT NULL,
+                relay       TEXT NOT NULL,
+                since       BIGINT NOT NULL,
+                PRIMARY KEY (agent_name, listener_id, relay)
+            )"""
+        )
+        await self.conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {self.PROCESSED_EVENT_TABLE_NAME} (
+                agent_name  TEXT NOT NULL,
+                listener_id TEXT NOT NULL,
+                event_id    TEXT NOT NULL,
+                created_at  BIGINT NOT NULL,
+                PRIMARY KEY (agent_name, listener_id, event_id)
+            )"""
+        )
+        await self.conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{self.PROCESSED_EVENT_TABLE_NAME}_created_at ON {self.PROCESSED_EVENT_TABLE_NAME} (agent_name, listener_id, created_at)"
+        )
 
     async def add_message(
         self,
@@ -86,20 +237,14 @@ class PostgresDatabase(BaseDatabase):
         extra_inputs: dict[str, Any] = {},
         extra_outputs: dict[str, Any] = {},
     ) -> Message:
-        next_idx: int = await self.conn.fetchval(
-            f"SELECT COALESCE(MAX(idx), -1) + 1 FROM {self.MESSAGE_TABLE_NAME} WHERE agent_name = $1 AND thread_id = $2",
-            self.agent_name,
-            thread_id,
-        )
         # Use a naive UTC datetime for TIMESTAMP (without time zone) columns
         # to avoid asyncpg errors mixing aware/naive datetimes. We still return
         # an aware UTC datetime to callers.
         created_at = datetime.now(timezone.utc).replace(tzinfo=None)
-        await self.conn.execute(
-            f"INSERT INTO {self.MESSAGE_TABLE_NAME} (agent_name, thread_id, idx, user_id, role, message, content, kind, satoshis, extra_inputs, extra_outputs, created_at) VALUES ($1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11,$12)",
+        next_idx: int = await self.conn.fetchval(
+            self.ADD_MESSAGE_QUERY,
             self.agent_name,
             thread_id,
-            next_idx,
             user_id,
             role,
             message,
@@ -125,6 +270,30 @@ class PostgresDatabase(BaseDatabase):
             created_at=created_at.replace(tzinfo=timezone.utc),
         )
 
+    async def add_messages(self, messages: list[dict[str, Any]]) -> None:
+        """Append several messages in one transaction (asyncpg pipelines the rows)."""
+        created_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        async with self.pool.acquire() as conn, conn.transaction():
+            await conn.executemany(
+                self.ADD_MESSAGE_QUERY,
+                [
+                    (
+                        self.agent_name,
+                        m["thread_id"],
+                        m["user_id"],
+                        m["role"],
+                        m.get("message", ""),
+                        m.get("content", ""),
+                        m.get("kind", "request"),
+                        m.get("satoshis"),
+                        json.dumps(m["extra_inputs"]) if m.get("extra_inputs") else None,
+                        json.dumps(m["extra_outputs"]) if m.get("extra_outputs") else None,
+                        m["created_at"].astimezone(timezone.utc).replace(tzinfo=None) if "created_at" in m else created_at,
+                    )
+                    for m in messages
+                ],
+            )
+
     async def get_messages(
         self,
         thread_id: str,
@@ -155,6 +324,40 @@ class PostgresDatabase(BaseDatabase):
         rows = await self.conn.fetch(base_query, *params)
         return [Message.from_row(row) for row in rows]
 
+    async def get_thread_info(self, thread_id: str, user_id: str) -> ThreadInfo | None:
+        """Return metadata of the latest message of *thread_id* without loading message bodies."""
+        row = await self.conn.fetchrow(
+            f"""SELECT idx, role, kind, created_at FROM {self.MESSAGE_TABLE_NAME}
+            WHERE agent_name = $1 AND thread_id = $2 AND user_id = $3 ORDER BY idx DESC LIMIT 1""",
+            self.agent_name, thread_id, user_id,
+        )
+        if row is None:
+            return None
+        return ThreadInfo(thread_id=thread_id, user_id=user_id, last_idx=row["idx"], last_role=row["role"],
+                          last_kind=row["kind"], last_created_at=row["created_at"].replace(tzinfo=timezone.utc))
+
+    # ------------------- thread summaries -------------------
+    async def get_thread_summary(self, thread_id: str, user_id: str) -> ThreadSummary | None:
+        row = await self.conn.fetchrow(
+            f"""SELECT summary, up_to_idx, updated_at FROM {self.THREAD_SUMMARY_TABLE_NAME}
+            WHERE agent_name = $1 AND thread_id = $2 AND user_id = $3""",
+            self.agent_name, thread_id, user_id,
+        )
+        if row is None:
+            return None
+        return ThreadSummary(thread_id=thread_id, user_id=user_id, summary=row["summary"], up_to_idx=row["up_to_idx"],
+                             updated_at=row["updated_at"].replace(tzinfo=timezone.utc))
+
+    async def set_thread_summary(self, thread_id: str, user_id: str, summary: str, up_to_idx: int) -> None:
+        await self.conn.execute(
+            f"""INSERT INTO {self.THREAD_SUMMARY_TABLE_NAME} (agent_name, thread_id, user_id, summary, up_to_idx, updated_at)
+            VALUES ($1, $2, $3, $4, $5, $6)
+            ON CONFLICT (agent_name, thread_id, user_id) DO UPDATE SET summary = EXCLUDED.summary,
+                up_to_idx = EXCLUDED.up_to_idx, updated_at = EXCLUDED.updated_at
+            WHERE EXCLUDED.up_to_idx >= {self.THREAD_SUMMARY_TABLE_NAME}.up_to_idx""",
+            self.agent_name, thread_id, user_id, summary, up_to_idx, datetime.now(timezone.utc).replace(tzinfo=None),
+        )
+
     # --------------------------- API ----------------------------------
 
     # ------------------- thread helpers -------------------
@@ -165,31 +368,76 @@ class PostgresDatabase(BaseDatabase):
 
     async def set_current_thread_id(self, user_id: str, thread_id: str | None) -> None:
         """Persist *thread_id* as the current thread for *user_id*."""
-        user = await self.get_user(user_id)
-        user.current_thread_id = thread_id
-        await self.upsert_user(user)
+        await self.conn.execute(self.SET_THREAD_QUERY, self.agent_name, user_id, thread_id)
 
     # --------------------------- API ----------------------------------
     async def get_user(self, user_id: str) -> User:
         logger.debug("[Postgres] Getting user %s", user_id)
-        row = await self.conn.fetchrow(
-            f"SELECT available_balance, current_thread_id FROM {self.USER_TABLE_NAME} WHERE agent_name = $1 AND user_id = $2",
-            self.agent_name,
-            user_id,
-        )
+        row = await self.conn.fetchrow(self.GET_USER_QUERY, self.agent_name, user_id)
         if row:
             return User(user_id=user_id, available_balance=row["available_balance"], current_thread_id=row["current_thread_id"])
         return User(user_id=user_id)
 
+    async def adjust_balance(self, user_id: str, delta: int) -> User | None:
+        logger.debug("[Postgres] Adjusting balance of %s by %d", user_id, delta)
+        row = await self.conn.fetchrow(self.DEBIT_QUERY if delta < 0 else self.CREDIT_QUERY, self.agent_name, user_id, delta)
+        if row is None:
+            return None
+        return User(user_id=user_id, available_balance=row["available_balance"], current_thread_id=row["current_thread_id"])
+
     async def upsert_user(self, user: User) -> None:
         logger.debug("[Postgres] Upserting user %s", user)
         await self.conn.execute(
-            f"""INSERT INTO {self.USER_TABLE_NAME} (agent_name, user_id, available_balance, current_thread_id)
-            VALUES ($1, $2, $3, $4)
-            ON CONFLICT (agent_name, user_id) DO UPDATE
-            SET available_balance = EXCLUDED.available_balance, current_thread_id = EXCLUDED.current_thread_id""",
+            self.UPSERT_USER_QUERY,
             self.agent_name,
             user.user_id,
             user.available_balance,
             user.current_thread_id,
         )
+
+    # ------------------- listener checkpoints -------------------
+    async def get_checkpoints(self, listener_id: str) -> dict[str, int]:
+        rows = await self.conn.fetch(
+            f"SELECT relay, since FROM {self.CHECKPOINT_TABLE_NAME} WHERE agent_name = $1 AND listener_id = $2",
+            self.agent_name,
+            listener_id,
+        )
+        return {row["relay"]: row["since"] for row in rows}
+
+    async def save_checkpoints(
+        self,
+        listener_id: str,
+        checkpoints: dict[str, int],
+        events: list[tuple[str, int]],
+    ) -> None:
+        async with self.pool.acquire() as conn, conn.transaction():
+            await conn.executemany(
+                f"""INSERT INTO {self.CHECKPOINT_TABLE_NAME} (agent_name, listener_id, relay, since)
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT (agent_name, listener_id, relay) DO UPDATE
+                SET since = GREATEST({self.CHECKPOINT_TABLE_NAME}.since, EXCLUDED.since)""",
+                [(self.agent_name, listener_id, relay, since) for relay, since in checkpoints.items()],
+            )
+            await conn.executemany(
+                f"""INSERT INTO {self.PROCESSED_EVENT_TABLE_NAME} (agent_name, listener_id, event_id, created_at)
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT DO NOTHING""",
+                [(self.agent_name, listener_id, event_id, created_at) for event_id, created_at in events],
+            )
+
+    async def get_processed_event_ids(self, listener_id: str, since: int) -> list[str]:
+        rows = await self.conn.fetch(
+            f"SELECT event_id FROM {self.PROCESSED_EVENT_TABLE_NAME} WHERE agent_name = $1 AND listener_id = $2 AND created_at >= $3",
+            self.agent_name,
+            listener_id,
+            since,
+        )
+        return [row["event_id"] for row in rows]
+
+    async def prune_processed_events(self, listener_id: str, before: int) -> None:
+        await self.conn.execute(
+            f"DELETE FROM {self.PROCESSED_EVENT_TABLE_NAME} WHERE agent_name = $1 AND listener_id = $2 AND created_at < $3",
+            self.agent_name,
+            listener_id,
+            before,
+        )
@@ -1,22 +1,156 @@
-from typing import Optional, Any, List, Literal, Self
+from typing import Optional, Any, AsyncIterator, Awaitable, Callable, List, Literal, Self, TypeVar
+import asyncio
+import contextlib
 import json
 import aiosqlite
 from datetime import datetime, timezone
 
-from agentstr.models import Message, User
+from agentstr.models import Message, ThreadInfo, ThreadSummary, User
 from agentstr.database.base import BaseDatabase
 from agentstr.logger import get_logger
 
 logger = get_logger(__name__)
 
+T = TypeVar("T")
+
+#: Pragmas applied to every connection in performance mode.
+PERFORMANCE_PRAGMAS: dict[str, Any] = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -64000,  # KiB
+    "mmap_size": 256 * 1024 * 1024,
+    "busy_timeout": 5000,  # ms
+}
+
+
+def _parse_timestamp(value: str) -> datetime:
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
 
 class SQLiteDatabase(BaseDatabase):
-    """SQLite implementation using `aiosqlite`."""
+    """SQLite implementation using `aiosqlite`.
+
+    By default every operation runs on one connection and each write commits on
+    its own.  With *performance* enabled (file databases only):
 
-    def __init__(self, conn_str: Optional[str] = None, *, agent_name: str | None = None):
+    - Every connection uses WAL journaling and the :data:`PERFORMANCE_PRAGMAS`,
+      updated with *pragmas*.  With ``synchronous=NORMAL`` a power loss can undo
+      the last commits, but it cannot corrupt the database.
+    - Writes are queued to a dedicated writer task.  The writer runs everything
+      queued so far in one transaction (group commit).  Each write gets its own
+      savepoint, so a failing write does not undo the others.
+    - Reads run on a pool of *read_pool_size* connections.  Under WAL these do
+      not wait for the writer.
+
+    Args:
+        conn_str: ``sqlite://<path>`` connection string.
+        agent_name: Name scoping all rows to one agent.
+        performance: Enable the tuned mode described above.
+        pragmas: Extra or overriding pragmas for performance mode.
+        read_pool_size: Read connections in performance mode.
+        max_write_batch: Maximum writes committed together in performance mode.
+    """
+
+    def __init__(self, conn_str: Optional[str] = None, *, agent_name: str | None = None, performance: bool = False,
+                 pragmas: dict[str, Any] | None = None, read_pool_size: int = 4, max_write_batch: int = 256):
         super().__init__(conn_str or "sqlite://agentstr_local.db", agent_name)
         # Strip the scheme to obtain the filesystem path.
         self._db_path = self.conn_str.replace("sqlite://", "", 1)
+        if performance and (self._db_path == ":memory:" or "mode=memory" in self._db_path):
+            logger.warning("[SQLite] Performance mode needs a database file, using the default mode")
+            performance = False
+        self.performance = performance
+        self.pragmas = {**PERFORMANCE_PRAGMAS, **(pragmas or {})}
+        self.read_pool_size = read_pool_size
+        self.max_write_batch = max_write_batch
+        self._readers: asyncio.Queue[aiosqlite.Connection] | None = None
+        self._read_conns: list[aiosqlite.Connection] = []
+        self._writes: asyncio.Queue[tuple[Callable[[aiosqlite.Connection], Awaitable[Any]], asyncio.Future] | None] | None = None
+        self._writer: asyncio.Task | None = None
+
+    # --------------------------- connections -------------------------------
+    async def _connect(self, **kwargs) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self._db_path, **kwargs)
+        # Return rows as mappings so we can access by column name
+        conn.row_factory = aiosqlite.Row
+        if self.performance:
+            for name, value in self.pragmas.items():
+                await conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    @contextlib.asynccontextmanager
+    async def _read(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Borrow a connection for reading."""
+        if self._readers is None:
+            yield self.conn
+            return
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    async def _write(self, fn: Callable[[aiosqlite.Connection], Awaitable[T]]) -> T:
+        """Run *fn* on the write connection and return its result once committed."""
+        if self._writes is None:
+            result = await fn(self.conn)
+            await self.conn.commit()
+            return result
+        future = asyncio.get_running_loop().create_future()
+        self._writes.put_nowait((fn, future))
+        return await future
+
+    async def _writer_loop(self) -> None:
+        stopping = False
+        while not stopping:
+            jobs, stopping = await self._next_write_batch()
+            if not jobs:
+                break
+            for future, result, error in await self._commit_batch(jobs):
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    async def _next_write_batch(self) -> tuple[list[tuple[Callable, asyncio.Future]], bool]:
+        """Wait for queued writes and return them with whether the database is closing."""
+        jobs = []
+        # Everything queued while the last batch was committing goes in this one
+        while not jobs or (len(jobs) < self.max_write_batch and not self._writes.empty()):
+            job = await self._writes.get()
+            if job is None:  # closing
+                return jobs, True
+            jobs.append(job)
+        return jobs, False
+
+    async def _commit_batch(
+        self, jobs: list[tuple[Callable, asyncio.Future]]
+    ) -> list[tuple[asyncio.Future, Any, BaseException | None]]:
+        """Run *jobs* in one transaction, each in its own savepoint, and return their outcomes."""
+        results: list[tuple[asyncio.Future, Any, BaseException | None]] = []
+        try:
+            await self.conn.execute("BEGIN IMMEDIATE")
+            for fn, future in jobs:
+                await self.conn.execute("SAVEPOINT write")
+                try:
+                    results.append((future, await fn(self.conn), None))
+                except Exception as e:
+                    await self.conn.execute("ROLLBACK TO write")
+                    results.append((future, None, e))
+                await self.conn.execute("RELEASE write")
+            await self.conn.execute("COMMIT")
+        except Exception as e:
+            logger.error("[SQLite] Group commit of %d write(s) failed: %s", len(jobs), e)
+            with contextlib.suppress(Exception):
+                await self.conn.execute("ROLLBACK")
+            results = [(future, None, e) for _, future in jobs]
+        return results
 
     # --------------------------- helpers -------------------------------
     async def _ensure_user_table(self) -> None:
@@ -56,33 +190,91 @@ class SQLiteDatabase(BaseDatabase):
             )"""
         ):
             pass
-        # Index on agent_name for faster agent filtering
+        # History reads filter on (agent_name, thread_id, user_id) and sort by idx;
+        # index allocation uses the primary key prefix (agent_name, thread_id)
         await self.conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_message_agent_name ON message (agent_name)"
+            "CREATE INDEX IF NOT EXISTS idx_message_thread_user ON message (agent_name, thread_id, user_id, idx)"
         )
-        # Index on thread_id for faster thread filtering
+        # Superseded single-column indexes only slowed down writes
+        await self.conn.execute("DROP INDEX IF EXISTS idx_message_agent_name")
+        await self.conn.execute("DROP INDEX IF EXISTS idx_message_thread_id")
+        async with self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS thread_summary (
+                agent_name TEXT NOT NULL,
+                thread_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                up_to_idx INTEGER NOT NULL,
+                updated_at DATETIME NOT NULL,
+                PRIMARY KEY (agent_name, thread_id, user_id)
+            )"""
+        ):
+            pass
+        await self.conn.commit()
+
+    async def _ensure_checkpoint_tables(self) -> None:
+        async with self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS listener_checkpoint (
+                agent_name TEXT NOT NULL,
+                listener_id TEXT NOT NULL,
+                relay TEXT NOT NULL,
+                since INTEGER NOT NULL,
+                PRIMARY KEY (agent_name, listener_id, relay)
+            )"""
+        ):
+            pass
+        async with self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS processed_event (
+                agent_name TEXT NOT NULL,
+                listener_id TEXT NOT NULL,
+                event_id TEXT NOT NULL,
+                created_at INTEGER NOT NULL,
+                PRIMARY KEY (agent_name, listener_id, event_id)
+            )"""
+        ):
+            pass
+        # Index for loading and pruning by timestamp
         await self.conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_message_thread_id ON message (thread_id)"
+            "CREATE INDEX IF NOT EXISTS idx_processed_event_created_at ON processed_event (agent_name, listener_id, created_at)"
         )
         await self.conn.commit()
 
     # --------------------------- API ----------------------------------
     async def async_init(self) -> Self:
-        self.conn = await aiosqlite.connect(self._db_path)
-        # Return rows as mappings so we can access by column name
-        self.conn.row_factory = aiosqlite.Row
+        self.conn = await self._connect()
         await self._ensure_user_table()
         await self._ensure_message_table()
+        await self._ensure_checkpoint_tables()
+        if self.performance:
+            # The writer manages its own transactions
+            await self.conn.close()
+            self.conn = await self._connect(isolation_level=None)
+            self._read_conns = [await self._connect() for _ in range(self.read_pool_size)]
+            self._readers = asyncio.Queue()
+            for conn in self._read_conns:
+                self._readers.put_nowait(conn)
+            self._writes = asyncio.Queue()
+            self._writer = asyncio.create_task(self._writer_loop())
         return self
 
     async def close(self) -> None:
+        if self._writer is not None:
+            # Let queued writes finish
+            self._writes.put_nowait(None)
+            await self._writer
+            self._writer = None
+            self._writes = None
+        for conn in self._read_conns:
+            await conn.close()
+        self._read_conns = []
+        self._readers = None
         if self.conn:
             await self.conn.close()
             self.conn = None
 
     async def get_user(self, user_id: str) -> User:
         logger.debug("[SQLite] Getting user %s", user_id)
-        async with self.conn.execute(
+        async with self._read() as conn, conn.execute(
             "SELECT available_balance, current_thread_id FROM user WHERE agent_name = ? AND user_id = ?",
             (self.agent_name, user_id),
         ) as cursor:
@@ -98,19 +290,47 @@ class SQLiteDatabase(BaseDatabase):
 
     async def set_current_thread_id(self, user_id: str, thread_id: str | None) -> None:
         """Persist *thread_id* as the current thread for *user_id*."""
-        user = await self.get_user(user_id)
-        user.current_thread_id = thread_id
-        await self.upsert_user(user)
+        # Leave the balance alone so a concurrent payment is not overwritten
+        await self._write(lambda conn: conn.execute(
+            """INSERT INTO user (agent_name, user_id, available_balance, current_thread_id) VALUES (?, ?, 0, ?)
+            ON CONFLICT(agent_name, user_id) DO UPDATE SET current_thread_id = excluded.current_thread_id""",
+            (self.agent_name, user_id, thread_id),
+        ))
 
 
     async def upsert_user(self, user: User) -> None:
         logger.debug("[SQLite] Upserting user %s", user)
-        await self.conn.execute(
+        await self._write(lambda conn: conn.execute(
             """INSERT INTO user (agent_name, user_id, available_balance, current_thread_id) VALUES (?, ?, ?, ?)
             ON CONFLICT(agent_name, user_id) DO UPDATE SET available_balance = excluded.available_balance, current_thread_id = excluded.current_thread_id""",
             (self.agent_name, user.user_id, user.available_balance, user.current_thread_id),
-        )
-        await self.conn.commit()
+        ))
+
+    async def adjust_balance(self, user_id: str, delta: int) -> User | None:
+        logger.debug("[SQLite] Adjusting balance of %s by %d", user_id, delta)
+
+        async def adjust(conn: aiosqlite.Connection) -> User | None:
+            async with conn.execute(
+                """UPDATE user SET available_balance = available_balance + ?
+                WHERE agent_name = ? AND user_id = ? AND available_balance + ? >= 0
+                RETURNING available_balance, current_thread_id""",
+                (delta, self.agent_name, user_id, delta),
+            ) as cursor:
+                row = await cursor.fetchone()
+            if row is None and delta >= 0:
+                # New user, or one created since the update (credits cannot fail)
+                async with conn.execute(
+                    """INSERT INTO user (agent_name, user_id, available_balance, current_thread_id) VALUES (?, ?, ?, NULL)
+                    ON CONFLICT(agent_name, user_id) DO UPDATE SET available_balance = available_balance + excluded.available_balance
+                    RETURNING available_balance, current_thread_id""",
+                    (self.agent_name, user_id, delta),
+                ) as cursor:
+                    row = await cursor.fetchone()
+            if row is None:
+                return None
+            return User(user_id=user_id, available_balance=row[0], current_thread_id=row[1])
+
+        return await self._write(adjust)
 
     async def add_message(
             self,
@@ -125,33 +345,35 @@ class SQLiteDatabase(BaseDatabase):
             extra_outputs: dict[str, Any] = {},
         ) -> Message:
             """Append a message to a thread and return the stored model."""
-            # Determine next index for thread
-            async with self.conn.execute(
-                "SELECT COALESCE(MAX(idx), -1) + 1 AS next_idx FROM message WHERE agent_name = ? AND thread_id = ?",
-                (self.agent_name, thread_id),
-            ) as cursor:
-                row = await cursor.fetchone()
-                next_idx = row[0]
-
+            # Allocate the next index and insert in one statement, so concurrent
+            # appends to a thread cannot pick the same index
             created_at = datetime.now(timezone.utc).isoformat()
-            await self.conn.execute(
-                "INSERT INTO message (agent_name, thread_id, idx, user_id, role, message, content, kind, satoshis, extra_inputs, extra_outputs, created_at) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
-                (
-                    self.agent_name,
-                    thread_id,
-                    next_idx,
-                    user_id,
-                    role,
-                    message,
-                    content,
-                    kind,
-                    satoshis,
-                    json.dumps(extra_inputs) if extra_inputs else None,
-                    json.dumps(extra_outputs) if extra_outputs else None,
-                    created_at,
-                ),
-            )
-            await self.conn.commit()
+
+            async def insert(conn: aiosqlite.Connection) -> int:
+                async with conn.execute(
+                    """INSERT INTO message (agent_name, thread_id, idx, user_id, role, message, content, kind, satoshis, extra_inputs, extra_outputs, created_at)
+                    SELECT ?, ?, COALESCE(MAX(idx), -1) + 1, ?, ?, ?, ?, ?, ?, ?, ?, ?
+                    FROM message WHERE agent_name = ? AND thread_id = ?
+                    RETURNING idx""",
+                    (
+                        self.agent_name,
+                        thread_id,
+                        user_id,
+                        role,
+                        message,
+                        content,
+                        kind,
+                        satoshis,
+                        json.dumps(extra_inputs) if extra_inputs else None,
+                        json.dumps(extra_outputs) if extra_outputs else None,
+                        created_at,
+                        self.agent_name,
+                        thread_id,
+                    ),
+                ) as cursor:
+                    return (await cursor.fetchall())[0][0]
+
+            next_idx = await self._write(insert)
             return Message(
                 agent_name=self.agent_name,
                 thread_id=thread_id,
@@ -167,6 +389,33 @@ class SQLiteDatabase(BaseDatabase):
                 created_at=datetime.fromisoformat(created_at).astimezone(timezone.utc),
             )
 
+    async def add_messages(self, messages: list[dict[str, Any]]) -> None:
+            """Append several messages with one statement per row and a single commit."""
+            created_at = datetime.now(timezone.utc).isoformat()
+            await self._write(lambda conn: conn.executemany(
+                """INSERT INTO message (agent_name, thread_id, idx, user_id, role, message, content, kind, satoshis, extra_inputs, extra_outputs, created_at)
+                SELECT ?, ?, COALESCE(MAX(idx), -1) + 1, ?, ?, ?, ?, ?, ?, ?, ?, ?
+                FROM message WHERE agent_name = ? AND thread_id = ?""",
+                [
+                    (
+                        self.agent_name,
+                        m["thread_id"],
+                        m["user_id"],
+                        m["role"],
+                        m.get("message", ""),
+                        m.get("content", ""),
+                        m.get("kind", "request"),
+                        m.get("satoshis"),
+                        json.dumps(m["extra_inputs"]) if m.get("extra_inputs") else None,
+                        json.dumps(m["extra_outputs"]) if m.get("extra_outputs") else None,
+                        m["created_at"].astimezone(timezone.utc).isoformat() if "created_at" in m else created_at,
+                        self.agent_name,
+                        m["thread_id"],
+                    )
+                    for m in messages
+                ],
+            ))
+
     async def get_messages(
             self,
             thread_id: str,
@@ -191,6 +440,79 @@ class SQLiteDatabase(BaseDatabase):
         if limit is not None:
                 query += " LIMIT ?"
                 params.append(limit)
-        async with self.conn.execute(query, tuple(params)) as cursor:
+        async with self._read() as conn, conn.execute(query, tuple(params)) as cursor:
                 rows = await cursor.fetchall()
         return [Message.from_row(dict(r)) for r in rows]
+
+    async def get_thread_info(self, thread_id: str, user_id: str) -> ThreadInfo | None:
+        async with self._read() as conn, conn.execute(
+            """SELECT idx, role, kind, created_at FROM message WHERE agent_name = ? AND thread_id = ? AND user_id = ?
+            ORDER BY idx DESC LIMIT 1""",
+            (self.agent_name, thread_id, user_id),
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        return ThreadInfo(thread_id=thread_id, user_id=user_id, last_idx=row["idx"], last_role=row["role"],
+                          last_kind=row["kind"], last_created_at=_parse_timestamp(row["created_at"]))
+
+    async def get_thread_summary(self, thread_id: str, user_id: str) -> ThreadSummary | None:
+        async with self._read() as conn, conn.execute(
+            "SELECT summary, up_to_idx, updated_at FROM thread_summary WHERE agent_name = ? AND thread_id = ? AND user_id = ?",
+            (self.agent_name, thread_id, user_id),
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        return ThreadSummary(thread_id=thread_id, user_id=user_id, summary=row["summary"], up_to_idx=row["up_to_idx"],
+                             updated_at=_parse_timestamp(row["updated_at"]))
+
+    async def set_thread_summary(self, thread_id: str, user_id: str, summary: str, up_to_idx: int) -> None:
+        await self._write(lambda conn: conn.execute(
+            """INSERT INTO thread_summary (agent_name, thread_id, user_id, summary, up_to_idx, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(agent_name, thread_id, user_id) DO UPDATE SET summary = excluded.summary,
+                up_to_idx = excluded.up_to_idx, updated_at = excluded.updated_at
+            WHERE excluded.up_to_idx >= thread_summary.up_to_idx""",
+            (self.agent_name, thread_id, user_id, summary, up_to_idx, datetime.now(timezone.utc).isoformat()),
+        ))
+
+    async def get_checkpoints(self, listener_id: str) -> dict[str, int]:
+        async with self._read() as conn, conn.execute(
+            "SELECT relay, since FROM listener_checkpoint WHERE agent_name = ? AND listener_id = ?",
+            (self.agent_name, listener_id),
+        ) as cursor:
+            rows = await cursor.fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    async def save_checkpoints(
+            self,
+            listener_id: str,
+            checkpoints: dict[str, int],
+            events: list[tuple[str, int]],
+    ) -> None:
+        async def save(conn: aiosqlite.Connection) -> None:
+            await conn.executemany(
+                """INSERT INTO listener_checkpoint (agent_name, listener_id, relay, since) VALUES (?, ?, ?, ?)
+                ON CONFLICT(agent_name, listener_id, relay) DO UPDATE SET since = MAX(since, excluded.since)""",
+                [(self.agent_name, listener_id, relay, since) for relay, since in checkpoints.items()],
+            )
+            await conn.executemany(
+                "INSERT OR IGNORE INTO processed_event (agent_name, listener_id, event_id, created_at) VALUES (?, ?, ?, ?)",
+                [(self.agent_name, listener_id, event_id, created_at) for event_id, created_at in events],
+            )
+
+        await self._write(save)
+
+    async def get_processed_event_ids(self, listener_id: str, since: int) -> list[str]:
+        async with self._read() as conn, conn.execute(
+            "SELECT event_id FROM processed_event WHERE agent_name = ? AND listener_id = ? AND created_at >= ?",
+            (self.agent_name, listener_id, since),
+        ) as cursor:
+            rows = await cursor.fetchall()
+        return [row[0] for row in rows]
+
+    async def prune_processed_events(self, listener_id: str, before: int) -> None:
+        await self._write(lambda conn: conn.execute(
+            "DELETE FROM processed_event WHERE agent_name = ? AND listener_id = ? AND created_at < ?",
+            (self.agent_name, listener_id, before),
+        ))
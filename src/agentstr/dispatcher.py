@@ -0,0 +1,158 @@
+"""A bounded worker pool that runs work in parallel across keys and in order within a key."""
+import asyncio
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+from pydantic import BaseModel
+
+from agentstr.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class DispatcherStats(BaseModel):
+    """Point-in-time metrics for a :class:`KeyedDispatcher`."""
+    workers: int  #: Number of worker tasks.
+    max_queue_size: int  #: Maximum number of queued items before submit blocks.
+    queue_depth: int  #: Items waiting for a worker.
+    in_flight: int  #: Items currently being handled.
+    active_keys: int  #: Keys with queued or in-flight items.
+    submitted: int  #: Items submitted since start.
+    processed: int  #: Items handled since start (including failures).
+    failed: int  #: Items whose handler raised.
+    avg_wait_seconds: float  #: Mean time items spent queued before a worker picked them up.
+    max_wait_seconds: float  #: Longest time an item spent queued.
+
+
+class KeyedDispatcher:
+    """Runs an async handler on a fixed number of workers with per-key ordering.
+
+    Items submitted with the same key are handled one at a time in submission order,
+    while items with different keys run in parallel up to `workers` at once. At most
+    `max_queue_size` items may wait for a worker; beyond that :meth:`submit` blocks,
+    pushing back on the producer.
+
+    Args:
+        handler: Coroutine function called with the submitted arguments.
+        workers: Number of concurrent workers.
+        max_queue_size: Maximum number of items waiting for a worker.
+    """
+    def __init__(self, handler: Callable[..., Awaitable[Any]], workers: int = 8, max_queue_size: int = 1000):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if max_queue_size < 1:
+            raise ValueError("max_queue_size must be at least 1")
+        self.handler = handler
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self._pending: dict[Hashable, deque[tuple[float, tuple, dict[str, Any], asyncio.Future[None]]]] = {}
+        self._scheduled: set[Hashable] = set()
+        self._ready: asyncio.Queue[Hashable] | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._idle: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._queued = 0
+        self._in_flight = 0
+        self._submitted = 0
+        self._processed = 0
+        self._failed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _ensure_started(self):
+        if self._tasks:
+            return
+        self._ready = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_queue_size)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(self, key: Hashable, *args: Any, **kwargs: Any) -> asyncio.Future[None]:
+        """Queue `handler(*args, **kwargs)` behind earlier items with the same `key`.
+
+        Blocks while the queue is full.
+
+        Returns:
+            A future resolved once the handler has finished with the item (whether or not
+            it raised), or cancelled if the dispatcher is closed before that.
+        """
+        self._ensure_started()
+        await self._slots.acquire()
+        done = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(key, deque()).append((time.monotonic(), args, kwargs, done))
+        self._queued += 1
+        self._submitted += 1
+        self._idle.clear()
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._ready.put_nowait(key)
+        return done
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            enqueued_at, args, kwargs, done = self._pending[key].popleft()
+            self._queued -= 1
+            self._slots.release()
+            wait = time.monotonic() - enqueued_at
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+            self._in_flight += 1
+            try:
+                await self.handler(*args, **kwargs)
+            except asyncio.CancelledError:
+                done.cancel()
+                raise
+            except Exception as e:
+                self._failed += 1
+                logger.error(f"Error handling item for {key}: {e!s}", exc_info=True)
+            finally:
+                if not done.done():
+                    done.set_result(None)
+                self._in_flight -= 1
+                self._processed += 1
+                if self._pending[key]:
+                    # Go to the back of the line so other keys get a turn
+                    self._ready.put_nowait(key)
+                else:
+                    del self._pending[key]
+                    self._scheduled.discard(key)
+                if not self._scheduled:
+                    self._idle.set()
+
+    async def join(self):
+        """Wait until every submitted item has been handled."""
+        if self._idle is not None:
+            await self._idle.wait()
+
+    async def close(self, drain: bool = True):
+        """Stop the workers, first waiting for queued items if `drain` is True."""
+        if drain:
+            await self.join()
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Items never handled are not acknowledged
+        for items in self._pending.values():
+            for *_, done in items:
+                done.cancel()
+
+    def stats(self) -> DispatcherStats:
+        """Return current queue depth, wait time and throughput metrics."""
+        started = self._processed + self._in_flight
+        return DispatcherStats(
+            workers=self.workers,
+            max_queue_size=self.max_queue_size,
+            queue_depth=self._queued,
+            in_flight=self._in_flight,
+            active_keys=len(self._scheduled),
+            submitted=self._submitted,
+            processed=self._processed,
+            failed=self._failed,
+            avg_wait_seconds=self._total_wait / started if started else 0.0,
+            max_wait_seconds=self._max_wait,
+        )
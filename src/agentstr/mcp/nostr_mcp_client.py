@@ -1,8 +1,14 @@
+import asyncio
+import contextlib
 import json
 import time
+from collections.abc import Awaitable, Callable
 from typing import Any
 
-from pynostr.utils import get_public_key
+from pynostr.event import Event, EventKind
+from pynostr.filters import Filters
+from pynostr.metadata import Metadata
+from pynostr.utils import get_public_key, get_timestamp
 
 from agentstr.logger import get_logger
 from agentstr.models import Skill
@@ -19,9 +25,15 @@ class NostrMCPClient:
     `NOSTR_NSEC` for private key, `NOSTR_RELAYS` for relay URLs, and `NWC_CONN_STR` 
     for Nostr Wallet Connect string. See the documentation for more details on 
     environment variable usage.
+
+    The server publishes its tool catalog in its profile metadata. The catalog is cached
+    for `cache_ttl` seconds; after that the metadata is checked again, and the catalog is
+    only parsed again if the metadata event id changed. :meth:`watch` keeps the catalog
+    current as the server republishes it.
     """
     def __init__(self, mcp_pubkey: str, nostr_client: NostrClient | None = None,
-                 relays: list[str] | None = None, private_key: str | None = None, nwc_str: str | None = None):
+                 relays: list[str] | None = None, private_key: str | None = None, nwc_str: str | None = None,
+                 cache_ttl: float = 300):
         """Initialize the MCP client.
 
         Args:
@@ -30,22 +42,73 @@ class NostrMCPClient:
             relays: List of Nostr relay URLs (if no client provided).
             private_key: Nostr private key (if no client provided).
             nwc_str: Nostr Wallet Connect string for payments (optional).
+            cache_ttl: Seconds the tool catalog is used before checking the server's metadata again.
         """
         self.client = nostr_client or NostrClient(relays=relays, private_key=private_key, nwc_str=nwc_str)
         self.mcp_pubkey = get_public_key(mcp_pubkey).hex()
+        self.cache_ttl = cache_ttl
         self.tool_to_sats_map = {}  # Maps tool names to their satoshi costs
-
-    async def list_tools(self) -> dict[str, Any] | None:
+        self._tools: dict[str, Any] | None = None
+        self._catalog_event: Event | None = None
+        self._fetched_at = 0.0
+        self._fetch_lock = asyncio.Lock()
+        self._watcher: asyncio.Task | None = None
+        self._update_callbacks: list[Callable[[dict[str, Any]], Awaitable[None]]] = []
+
+    @property
+    def catalog_id(self) -> str | None:
+        """Id of the metadata event the cached tool catalog was read from."""
+        return self._catalog_event.id if self._catalog_event else None
+
+    @property
+    def watching(self) -> bool:
+        """True while :meth:`watch` keeps the catalog current."""
+        return self._watcher is not None and not self._watcher.done()
+
+    def _catalog_fresh(self) -> bool:
+        return self._tools is not None and (self.watching or time.monotonic() - self._fetched_at < self.cache_ttl)
+
+    async def _update_catalog(self, event: Event) -> bool:
+        """Cache the tool catalog from a metadata event and return True if it changed."""
+        self._fetched_at = time.monotonic()
+        if self._catalog_event is not None and (event.id == self._catalog_event.id
+                                                or event.created_at < self._catalog_event.created_at):
+            return False
+        tools = json.loads(Metadata.from_event(event).about)
+        changed = self._tools is not None
+        self._tools, self._catalog_event = tools, event
+        self.tool_to_sats_map.clear()
+        for tool in tools["tools"]:
+            self.tool_to_sats_map[tool["name"]] = tool["satoshis"]
+        if changed:
+            logger.info(f"Tool catalog of MCP server {self.mcp_pubkey[:10]} changed: "
+                        f"{[tool['name'] for tool in tools['tools']]}")
+            for callback in self._update_callbacks:
+                try:
+                    await callback(tools)
+                except Exception as e:
+                    logger.error(f"Tool catalog update callback failed: {e!s}", exc_info=True)
+        return changed
+
+    async def list_tools(self, refresh: bool = False) -> dict[str, Any] | None:
         """Retrieve the list of available tools from the MCP server.
 
+        Args:
+            refresh: Check the server's metadata even if the cached catalog is still fresh.
+
         Returns:
             Dictionary of tools with their metadata, or None if not found.
         """
-        metadata = await self.client.get_metadata_for_pubkey(self.mcp_pubkey)
-        tools = json.loads(metadata.about)
-        for tool in tools["tools"]:
-            self.tool_to_sats_map[tool["name"]] = tool["satoshis"]
-        return tools
+        if not refresh and self._catalog_fresh():
+            return self._tools
+        # Concurrent callers share one fetch
+        async with self._fetch_lock:
+            if refresh or not self._catalog_fresh():
+                event = await self.client.relay_manager.get_replaceable(EventKind.SET_METADATA, self.mcp_pubkey)
+                if event is None:
+                    return self._tools
+                await self._update_catalog(event)
+        return self._tools
 
     async def get_skills(self) -> list[Skill]:
         """Retrieve the list of available skills from the MCP server.
@@ -53,7 +116,39 @@ class NostrMCPClient:
         Returns:
             List of skills with their metadata.
         """
-        return [Skill(name=tool["name"], description=tool["description"]) for tool in (await self.list_tools())["tools"]]
+        tools = await self.list_tools()
+        return [Skill(name=tool["name"], description=tool["description"]) for tool in (tools or {}).get("tools", [])]
+
+    def add_update_callback(self, callback: Callable[[dict[str, Any]], Awaitable[None]]):
+        """Register a coroutine function called with the new catalog whenever it changes."""
+        self._update_callbacks.append(callback)
+
+    def watch(self):
+        """Keep the tool catalog current by subscribing to the server's metadata.
+
+        While watching, the cached catalog does not expire.
+        """
+        if not self.watching:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        # Start from the cached catalog so a republish in between is not missed
+        since = self._catalog_event.created_at if self._catalog_event else get_timestamp()
+        filters = Filters(kinds=[EventKind.SET_METADATA], authors=[self.mcp_pubkey], since=since)
+
+        async def on_metadata(event: Event):
+            self.client.relay_manager.event_store.put(event)
+            await self._update_catalog(event)
+
+        await self.client.relay_manager.event_listener(filters, on_metadata)
+
+    async def close(self):
+        """Stop watching the tool catalog."""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._watcher
+            self._watcher = None
 
     async def call_tool(self, name: str, arguments: dict[str, Any], timeout: int = 120) -> dict[str, Any] | None:
         """Call a tool on the MCP server with provided arguments.
@@ -75,14 +170,17 @@ class NostrMCPClient:
             return None
 
         message = response.message
-        timestamp = int(time.time()) + 1
+        # Servers tag replies with the request event id so concurrent calls can be told apart
+        request_refs = [tag[0] for tag in response.event.get_tag_list("e")]
+        request_id = request_refs[0] if request_refs else None
+        timestamp = response.event.created_at if request_id else int(time.time()) + 1
 
         logger.debug(f"MCP Client received message: {message}")
         if isinstance(message, str) and message.startswith("lnbc"):
             invoice = message.strip()
             logger.info(f"Paying invoice: {invoice}")
             await self.client.nwc_relay.try_pay_invoice(invoice=invoice, amount=self.tool_to_sats_map[name])
-            response = await self.client.receive_direct_message(self.mcp_pubkey, timestamp=timestamp, timeout=timeout)
+            response = await self.client.receive_direct_message(self.mcp_pubkey, timestamp=timestamp, timeout=timeout, event_ref=request_id)
 
         if response:
             logger.debug(f"MCP Client received response.message: {response.message}")
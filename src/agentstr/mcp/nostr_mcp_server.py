@@ -7,7 +7,9 @@ from mcp.server.fastmcp.exceptions import ToolError
 from mcp.server.fastmcp.tools.tool_manager import ToolManager
 from pynostr.event import Event
 from agentstr.models import Tool, Metadata
+from agentstr.dispatcher import DispatcherStats, KeyedDispatcher
 from agentstr.logger import get_logger
+from agentstr.mcp.tool_executor import ToolExecutor
 from agentstr.nostr_client import NostrClient
 from agentstr.utils import stringify_result
 
@@ -21,6 +23,9 @@ def tool(**kwargs):
         @tool(name="mytool", description="desc", satoshis=100)
         def myfunc(...): ...
 
+    Execution limits can be set the same way with ``max_concurrency``, ``timeout``
+    and ``cpu_bound`` (see :meth:`NostrMCPServer.add_tool`).
+
     The parameters are attached to the function as __tool_params__.
     """
     def decorator(fn):
@@ -40,7 +45,9 @@ class NostrMCPServer:
     """
     def __init__(self, display_name: str | None = None, nostr_client: NostrClient | None = None,
                  relays: list[str] | None = None, private_key: str | None = None, nwc_str: str | None = None,
-                 tools: list[Callable[..., Any]] = [], nostr_metadata: Metadata | None = None):
+                 tools: list[Callable[..., Any]] = [], nostr_metadata: Metadata | None = None,
+                 max_workers: int = 32, max_concurrency: int = 32, max_queue_size: int = 1000,
+                 tool_timeout: float | None = None):
         """Initialize the MCP server.
 
         Args:
@@ -51,32 +58,50 @@ class NostrMCPServer:
             nwc_str: Nostr Wallet Connect string for payments (optional).
             tools: List of tools to register (optional).
             nostr_metadata: Nostr metadata for the server (optional).
+            max_workers: Number of requests handled concurrently (default: 32).
+            max_concurrency: Maximum number of tool calls running at once across all tools (default: 32).
+            max_queue_size: Requests that may wait for a worker before the listener is paused (default: 1000).
+            tool_timeout: Default timeout in seconds for tool calls (optional).
         """
         self.client = nostr_client or NostrClient(relays=relays, private_key=private_key, nwc_str=nwc_str)
         self.display_name = display_name
         self.nostr_metadata = nostr_metadata
         self.tool_to_sats_map = {}
         self.tool_manager = ToolManager()
+        self.tool_executor = ToolExecutor(max_concurrency=max_concurrency, default_timeout=tool_timeout)
+        self.dispatcher = KeyedDispatcher(self._direct_message_callback, workers=max_workers, max_queue_size=max_queue_size)
+        self._background_tasks: set[asyncio.Task] = set()
         for tool in tools:
             self.add_tool(tool)
 
     def add_tool(self, fn: Callable[..., Any], name: str | None = None,
-                 description: str | None = None, satoshis: int | None = None):
+                 description: str | None = None, satoshis: int | None = None,
+                 max_concurrency: int | None = None, timeout: float | None = None,
+                 cpu_bound: bool | None = None):
         """Register a tool with the server.
 
         Args:
-            fn: The function to register as a tool.
+            fn: The function to register as a tool (sync or async).
             name: Name of the tool (defaults to function name).
             description: Description of the tool (optional).
             satoshis: Satoshis required to call the tool (optional).
+            max_concurrency: Maximum concurrent calls of this tool (optional).
+            timeout: Timeout in seconds for calls of this tool (optional).
+            cpu_bound: Run a synchronous tool in a process pool instead of a thread pool (optional).
         """
         tool_params = getattr(fn, "__tool_params__", None)
         if tool_params:
             name = name or tool_params.get("name")
             description = description or tool_params.get("description")
             satoshis = satoshis or tool_params.get("satoshis")
+            max_concurrency = max_concurrency or tool_params.get("max_concurrency")
+            timeout = timeout or tool_params.get("timeout")
+            cpu_bound = cpu_bound if cpu_bound is not None else tool_params.get("cpu_bound")
         if satoshis:
             self.tool_to_sats_map[name or fn.__name__] = satoshis
+        if max_concurrency or timeout or cpu_bound:
+            self.tool_executor.configure_tool(name or fn.__name__, max_concurrency=max_concurrency,
+                                              timeout=timeout, cpu_bound=bool(cpu_bound))
         self.tool_manager.add_tool(fn=fn, name=name, description=description)
 
     async def list_tools(self) -> dict[str, Any]:
@@ -107,12 +132,13 @@ class NostrMCPServer:
 
         Raises:
             ToolError: If the tool is not found.
+            TimeoutError: If the tool call exceeds its timeout.
         """
         logger.info(f"Calling tool: {name} with arguments: {arguments}")
         tool = self.tool_manager.get_tool(name)
         if not tool:
             raise ToolError(f"Unknown tool: {name}")
-        result = await tool.fn(**arguments)
+        result = await self.tool_executor.run(name, tool.fn, arguments)
         logger.info(f"Tool call result: {result}")
         if result is None:
             return None
@@ -121,13 +147,16 @@ class NostrMCPServer:
     async def _direct_message_callback(self, event: Event, message: str):
         """Handle incoming direct messages to process tool calls or list requests.
 
+        Every response is tagged with an ``e`` tag referencing the request event so
+        clients can match responses to concurrent requests.
+
         Args:
             event: The Nostr event containing the message.
             message: The message content.
         """
         message = message.strip()
         logger.debug(f"Request: {message}")
-        tasks = []
+        reply_tags = {"e": event.id}
         try:
             if not message.startswith('{'):
                 logger.warning(f"Invalid request: {message}. Skipping...")
@@ -148,22 +177,24 @@ class NostrMCPServer:
                         result = await self.call_tool(tool_name, arguments)
                         response = {"content": [{"type": "text", "text": result}]}
                         logger.debug(f"On success response: {response}")
-                        await self.client.send_direct_message(event.pubkey, json.dumps(response))
+                        await self.client.send_direct_message(event.pubkey, json.dumps(response), tags=reply_tags)
 
                     async def on_failure():
                         response = {"error": f"Payment failed for {tool_name}"}
                         logger.error(f"On failure response: {response}")
-                        await self.client.send_direct_message(event.pubkey, json.dumps(response))
+                        await self.client.send_direct_message(event.pubkey, json.dumps(response), tags=reply_tags)
 
-                    # Run in background
-                    tasks.append(asyncio.create_task(
+                    # Wait for payment in the background so the worker is freed
+                    task = asyncio.create_task(
                         self.client.nwc_relay.on_payment_success(
                             invoice=invoice,
                             callback=on_success,
                             unsuccess_callback=on_failure,
                             timeout=900,
                         ),
-                    ))
+                    )
+                    self._background_tasks.add(task)
+                    task.add_done_callback(self._background_tasks.discard)
                 else:
                     result = await self.call_tool(tool_name, arguments)
                     response = {"content": [{"type": "text", "text": str(result)}]}
@@ -174,8 +205,20 @@ class NostrMCPServer:
         if not isinstance(response, str):
             response = json.dumps(response)
         logger.debug(f"MCP Server response: {response}")
-        tasks.append(self.client.send_direct_message(event.pubkey, response))
-        await asyncio.gather(*tasks)
+        await self.client.send_direct_message(event.pubkey, response, tags=reply_tags)
+
+    async def _dispatch_message(self, event: Event, message: str):
+        """Queue an incoming request for the worker pool.
+
+        Requests are keyed by sender, so one client's calls run in the order they
+        were sent while requests from different clients run in parallel up to the
+        concurrency cap.
+        """
+        await self.dispatcher.submit(event.pubkey, event, message)
+
+    def stats(self) -> DispatcherStats:
+        """Return queue depth, in-flight and wait time metrics for incoming requests."""
+        return self.dispatcher.stats()
 
     async def start(self):
         """Start the MCP server, updating metadata and listening for direct messages."""
@@ -187,4 +230,9 @@ class NostrMCPServer:
             nostr_metadata=self.nostr_metadata,
         )
         logger.info(f"Starting message listener for {self.client.public_key.bech32()}")
-        await self.client.direct_message_listener(callback=self._direct_message_callback)
+        try:
+            await self.client.direct_message_listener(callback=self._dispatch_message)
+        finally:
+            # Answer queued requests before the tool pools go away
+            await self.dispatcher.close(drain=True)
+            self.tool_executor.shutdown()
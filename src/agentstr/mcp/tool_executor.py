@@ -0,0 +1,102 @@
+import asyncio
+import functools
+import inspect
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any
+
+from pydantic import BaseModel
+
+from agentstr.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ToolLimits(BaseModel):
+    """Execution limits for a single tool."""
+    max_concurrency: int | None = None  #: Maximum concurrent calls of this tool (unlimited if None).
+    timeout: float | None = None  #: Seconds before a call is abandoned (no limit if None).
+    cpu_bound: bool = False  #: Run synchronous tools in a process pool instead of a thread pool.
+
+
+class ToolExecutor:
+    """Runs tool calls with a global concurrency cap, per-tool limits and timeouts.
+
+    Coroutine tools run on the event loop. Synchronous tools are offloaded to a thread
+    pool, or to a process pool when the tool is marked ``cpu_bound`` (the function and
+    its arguments must then be picklable). A call that exceeds its timeout raises
+    :class:`TimeoutError`; note that work already running in a thread cannot be
+    interrupted and finishes in the background.
+
+    Args:
+        max_concurrency: Maximum number of tool calls running at once across all tools.
+        default_timeout: Timeout in seconds for tools without their own (no limit if None).
+        max_thread_workers: Size of the thread pool for synchronous tools.
+        max_process_workers: Size of the process pool for CPU-bound tools.
+    """
+    def __init__(self, max_concurrency: int = 32, default_timeout: float | None = None,
+                 max_thread_workers: int | None = None, max_process_workers: int | None = None):
+        self.max_concurrency = max_concurrency
+        self.default_timeout = default_timeout
+        self.max_thread_workers = max_thread_workers
+        self.max_process_workers = max_process_workers
+        self.limits: dict[str, ToolLimits] = {}
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._per_tool: dict[str, asyncio.Semaphore] = {}
+        self._thread_pool: ThreadPoolExecutor | None = None
+        self._process_pool: ProcessPoolExecutor | None = None
+
+    def configure_tool(self, name: str, max_concurrency: int | None = None, timeout: float | None = None,
+                       cpu_bound: bool = False):
+        """Set execution limits for the tool called `name`."""
+        self.limits[name] = ToolLimits(max_concurrency=max_concurrency, timeout=timeout, cpu_bound=cpu_bound)
+        if max_concurrency:
+            self._per_tool[name] = asyncio.Semaphore(max_concurrency)
+        else:
+            self._per_tool.pop(name, None)
+
+    def _executor(self, cpu_bound: bool) -> Executor:
+        if cpu_bound:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(max_workers=self.max_process_workers)
+            return self._process_pool
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=self.max_thread_workers, thread_name_prefix="agentstr-tool")
+        return self._thread_pool
+
+    async def _invoke(self, fn: Callable[..., Any], arguments: dict[str, Any], limits: ToolLimits) -> Any:
+        if inspect.iscoroutinefunction(fn):
+            return await fn(**arguments)
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self._executor(limits.cpu_bound), functools.partial(fn, **arguments))
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    async def run(self, name: str, fn: Callable[..., Any], arguments: dict[str, Any]) -> Any:
+        """Call `fn(**arguments)` for the tool `name` within its limits.
+
+        Raises:
+            TimeoutError: If the call does not finish within the tool's timeout.
+        """
+        limits = self.limits.get(name) or ToolLimits()
+        timeout = limits.timeout if limits.timeout is not None else self.default_timeout
+        per_tool = self._per_tool.get(name)
+        try:
+            # Queue on the tool's own limit first so its waiting calls hold no global slot
+            if per_tool is not None:
+                async with per_tool, self._global:
+                    return await asyncio.wait_for(self._invoke(fn, arguments, limits), timeout=timeout)
+            async with self._global:
+                return await asyncio.wait_for(self._invoke(fn, arguments, limits), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Tool {name} timed out after {timeout}s") from None
+
+    def shutdown(self):
+        """Shut down the thread and process pools."""
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
@@ -116,6 +116,27 @@ class Message(BaseModel):
         )
 
 
+class ThreadInfo(BaseModel):
+    """Metadata of the latest message in a thread, read without loading message bodies."""
+
+    thread_id: str
+    user_id: str
+    last_idx: int
+    last_role: Literal["user", "agent", "tool"]
+    last_kind: str | None = None
+    last_created_at: datetime
+
+
+class ThreadSummary(BaseModel):
+    """Rolling summary of a thread's messages up to and including ``up_to_idx``."""
+
+    thread_id: str
+    user_id: str
+    summary: str
+    up_to_idx: int
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
 class ChatInput(BaseModel):
     """Represents input data for an agent chat interaction."""
 
@@ -124,6 +145,7 @@ class ChatInput(BaseModel):
     user_id: str | None = None
     extra_inputs: dict[str, Any] = {}
     history: list[Message] = []
+    summary: str | None = None  #: Summary of the thread's messages older than ``history``
 
 
 class ChatOutput(BaseModel):
@@ -10,9 +10,12 @@ from pynostr.metadata import Metadata
 from pynostr.utils import get_public_key, get_timestamp
 
 from agentstr.logger import get_logger
+from agentstr.relays.checkpoint import CheckpointStore
 from agentstr.relays.nwc_relay import NWCRelay
 from agentstr.relays.relay import DecryptedMessage
+from agentstr.relays.relay_health import RelayHealthStats
 from agentstr.relays.relay_manager import RelayManager
+from agentstr.relays.relay_session import RelaySession
 
 logger = get_logger(__name__)
 
@@ -24,13 +27,15 @@ class NostrClient:
     manage metadata, and read posts by tags. It integrates with Nostr Wallet Connect (NWC)
     for payment processing if provided.
     """
-    def __init__(self, relays: list[str] = [], private_key: str | None = None, nwc_str: str | None = None):
+    def __init__(self, relays: list[str] = [], private_key: str | None = None, nwc_str: str | None = None,
+                 verify_signatures: bool = False):
         """Initialize the NostrClient.
         
         Args:
             relays: List of Nostr relay URLs to connect to.
             private_key: Nostr private key in 'nsec' format.
             nwc_str: Nostr Wallet Connect string for payment processing (optional). If not provided, will use environment variable `NWC_CONN_STR`.
+            verify_signatures: Drop incoming events whose id or signature is invalid, checked in batches off the event loop (default: False).
             
         Note:
             If no private key is provided, the client will operate in read-only mode.
@@ -65,18 +70,43 @@ class NostrClient:
             else:
                 logger.info("Nostr Wallet Connect (NWC) is not configured")
 
+            self.session = RelaySession(self.relays, self.private_key, self.nwc_str, verify_signatures=verify_signatures)
+
         except Exception as e:
             logger.critical(f"Failed to initialize NostrClient: {e!s}", exc_info=True)
             raise
 
     @property
     def relay_manager(self) -> RelayManager:
-        return RelayManager(self.relays, self.private_key)
+        """RelayManager shared by all calls made through this client."""
+        return self.session.relay_manager
 
     @property
     def nwc_relay(self) -> NWCRelay | None:
         """NWCRelay instance if NWC is configured."""
-        return NWCRelay(self.nwc_str) if self.nwc_str else None
+        return self.session.nwc_relay
+
+    def relay_health(self) -> list[RelayHealthStats]:
+        """Return rolling latency, error rate and circuit breaker state for each relay, best first."""
+        return self.relay_manager.health_stats()
+
+    async def start(self) -> "NostrClient":
+        """Open connections to the configured relays up front.
+
+        Calling this is optional: connections are otherwise opened on first use.
+        """
+        await self.session.start()
+        return self
+
+    async def close(self):
+        """Close all relay connections held by this client."""
+        await self.session.close()
+
+    async def __aenter__(self) -> "NostrClient":
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
 
     def sign(self, event: Event) -> Event:
         """Sign an event with the client's private key.
@@ -119,14 +149,33 @@ class NostrClient:
         return await self.relay_manager.get_events(filters)
 
     async def get_metadata_for_pubkey(self, public_key: str | PrivateKey = None) -> Metadata | None:
-        """Fetch metadata for a public key (or self if none provided)."""
+        """Fetch metadata for a public key (or self if none provided).
+
+        Profiles are cached by the relay manager's event store, so repeated lookups do not hit the relays.
+        """
         public_key = get_public_key(public_key if isinstance(public_key, str) else public_key.hex()) if public_key else self.public_key
-        filters = Filters(kinds=[EventKind.SET_METADATA], authors=[public_key.hex()], limit=1)
-        event = await self.relay_manager.get_event(filters)
+        event = await self.relay_manager.get_replaceable(EventKind.SET_METADATA, public_key.hex())
         if event:
             return Metadata.from_event(event)
         return None
 
+    async def get_metadata_for_pubkeys(self, public_keys: list[str]) -> dict[str, Metadata]:
+        """Fetch metadata for many public keys in one batched request per relay.
+
+        Cached profiles are served from the relay manager's event store; only the rest are fetched.
+
+        Args:
+            public_keys: Public keys in hex or bech32 format.
+
+        Returns:
+            The latest metadata found for each public key, keyed by hex public key.
+        """
+        authors = list(dict.fromkeys(get_public_key(pk).hex() for pk in public_keys))
+        if not authors:
+            return {}
+        events = await self.relay_manager.get_replaceable_many(EventKind.SET_METADATA, authors)
+        return {pubkey: Metadata.from_event(event) for pubkey, event in events.items()}
+
     async def update_metadata(self, name: str | None = None, about: str | None = None,
                        nip05: str | None = None, picture: str | None = None,
                        banner: str | None = None, lud16: str | None = None,
@@ -218,9 +267,17 @@ class NostrClient:
             logger.error(f"Failed to send direct message: {e!s}", exc_info=True)
             raise
 
-    async def receive_direct_message(self, recipient_pubkey: str, timestamp: int | None = None, timeout: int = 120) -> DecryptedMessage | None:
-        """Wait for and return the next direct message from a recipient."""
-        return await self.relay_manager.receive_message(recipient_pubkey, timestamp=timestamp, timeout=timeout)
+    async def receive_direct_message(self, recipient_pubkey: str, timestamp: int | None = None, timeout: int = 120,
+                                     event_ref: str | None = None) -> DecryptedMessage | None:
+        """Wait for and return the next direct message from a recipient.
+
+        Args:
+            recipient_pubkey: The public key the message is expected from.
+            timestamp: Only accept messages created at or after this timestamp (optional).
+            timeout: Maximum time to wait in seconds.
+            event_ref: Prefer a reply referencing this event id with an ``e`` tag (optional).
+        """
+        return await self.relay_manager.receive_message(recipient_pubkey, timestamp=timestamp, timeout=timeout, event_ref=event_ref)
 
     async def send_direct_message_and_receive_response(self, recipient_pubkey: str, message: str, timeout: int = 120, tags: dict[str, str] | None = None) -> DecryptedMessage:
         """Send an encrypted direct message to a recipient and wait for a response.
@@ -232,7 +289,8 @@ class NostrClient:
         return await self.relay_manager.send_receive_message(message=message, recipient_pubkey=recipient_pubkey, timeout=timeout, tags=tags)
 
     async def note_listener(self, callback: Callable[[Event], Any], pubkeys: list[str] | None = None,
-                     tags: list[str] | None = None, following_only: bool = False, timestamp: int | None = None):
+                     tags: list[str] | None = None, following_only: bool = False, timestamp: int | None = None,
+                     checkpoint: CheckpointStore | None = None):
         """Listen for public notes matching the given filters.
 
         Args:
@@ -241,6 +299,7 @@ class NostrClient:
             tags: List of tags to filter notes by.
             following_only: If True, only show notes from users the agent is following (optional).
             timestamp: Filter messages since this timestamp (optional).
+            checkpoint: Store to resume from after a restart, overriding `timestamp` where it has progress (optional).
         """
 
         authors = None
@@ -253,19 +312,21 @@ class NostrClient:
         if tags and len(tags) > 0:
             filters.add_arbitrary_tag("t", tags)
 
-        await self.relay_manager.event_listener(filters, callback)
+        await self.relay_manager.event_listener(filters, callback, checkpoint=checkpoint)
 
-    async def direct_message_listener(self, callback: Callable[[Event, str], Any], recipient_pubkey: str | None = None, timestamp: int | None = None):
+    async def direct_message_listener(self, callback: Callable[[Event, str], Any], recipient_pubkey: str | None = None, timestamp: int | None = None,
+                                      checkpoint: CheckpointStore | None = None):
         """Listen for incoming encrypted direct messages.
 
         Args:
             callback: Function to handle received messages (takes Event and message content as args).
             recipient_pubkey: Filter messages from a specific public key (optional).
             timestamp: Filter messages since this timestamp (optional).
+            checkpoint: Store to resume from after a restart, replaying messages missed while down (optional).
         """
         authors = [get_public_key(recipient_pubkey).hex()] if recipient_pubkey else None
         filters = Filters(authors=authors, kinds=[EventKind.ENCRYPTED_DIRECT_MESSAGE],
                                       since=timestamp or get_timestamp(), pubkey_refs=[self.public_key.hex()],
                                       limit=10)
 
-        await self.relay_manager.direct_message_listener(filters, callback)
+        await self.relay_manager.direct_message_listener(filters, callback, checkpoint=checkpoint)
@@ -1,2 +1,5 @@
+from agentstr.relays.nwc_relay import NWCRelay
 from agentstr.relays.relay_manager import RelayManager
-from agentstr.relays.nwc_relay import NWCRelay
\ No newline at end of file
+from agentstr.relays.relay_session import RelaySession
+
+__all__ = ["NWCRelay", "RelayManager", "RelaySession"]
@@ -0,0 +1,182 @@
+import asyncio
+import contextlib
+import time
+from typing import TYPE_CHECKING
+
+from pynostr.event import Event
+
+from agentstr.logger import get_logger
+from agentstr.relays.dedup import EventDeduplicator
+
+if TYPE_CHECKING:
+    from agentstr.database import BaseDatabase
+
+logger = get_logger(__name__)
+
+
+class CheckpointStore:
+    """Durable per-relay progress of one listener, stored in the database.
+
+    For each relay the store keeps a high-water mark: the newest ``created_at`` the
+    listener has processed. It also keeps the ids of the events processed around that
+    mark. On restart a listener subscribes from the mark itself rather than one second
+    after it, so events sharing that second are not skipped. The stored ids stop it
+    from handling the same event twice.
+
+    Events handed to a background worker are registered with :meth:`begin` and
+    acknowledged with :meth:`mark_processed` once the worker is done. Until then the
+    mark of their relay stays at the oldest unfinished event, so a restart replays
+    every event that had not been handled yet.
+
+    Progress is buffered in memory and written in one transaction every
+    `flush_interval` seconds or `batch_size` events, and again on :meth:`close`. An
+    event is therefore handled at least once, and at most `flush_interval` seconds of
+    work is repeated after a crash.
+
+    Args:
+        db: Database holding the checkpoints (initialized before :meth:`load`).
+        listener_id: Name distinguishing this listener from others sharing the database.
+        flush_interval: Maximum seconds between writes.
+        batch_size: Number of processed events that triggers a write.
+        retention_seconds: How long processed ids are kept behind the oldest high-water mark.
+        max_replay_seconds: Never resume further back than this (no limit if None).
+    """
+    def __init__(self, db: "BaseDatabase", listener_id: str, flush_interval: float = 1.0, batch_size: int = 100,
+                 retention_seconds: int = 86400, max_replay_seconds: int | None = None):
+        self.db = db
+        self.listener_id = listener_id
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retention_seconds = retention_seconds
+        self.max_replay_seconds = max_replay_seconds
+        self.dedup = EventDeduplicator()
+        self._checkpoints: dict[str, int] = {}
+        # Newest timestamp handled per relay, and the events still being handled (id -> created_at)
+        self._handled: dict[str, int] = {}
+        self._in_flight: dict[str, dict[str, int]] = {}
+        self._dirty: dict[str, int] = {}
+        self._events: list[tuple[str, int]] = []
+        self._loaded = False
+        self._flusher: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+
+    @property
+    def checkpoints(self) -> dict[str, int]:
+        """The current high-water mark for each relay, including unsaved progress."""
+        return dict(self._checkpoints)
+
+    async def load(self) -> dict[str, int]:
+        """Read the stored high-water marks and recently processed ids.
+
+        Returns:
+            The high-water mark for each relay.
+        """
+        if self._loaded:
+            return self.checkpoints
+        self._checkpoints = await self.db.get_checkpoints(self.listener_id)
+        if self._checkpoints:
+            event_ids = await self.db.get_processed_event_ids(self.listener_id, min(self._checkpoints.values()))
+            for event_id in event_ids:
+                self.dedup.add(event_id)
+            logger.info(f"Resuming listener {self.listener_id} from {self._checkpoints} "
+                        f"({len(event_ids)} processed event(s) loaded)")
+        self._loaded = True
+        return self.checkpoints
+
+    def since(self, relay: str) -> int | None:
+        """Return the timestamp a subscription on `relay` should resume from, or None if there is no checkpoint."""
+        since = self._checkpoints.get(relay)
+        if since is not None and self.max_replay_seconds is not None:
+            since = max(since, int(time.time()) - self.max_replay_seconds)
+        return since
+
+    def begin(self, relay: str, event: Event):
+        """Record that `event`, received from `relay`, is being handled.
+
+        The mark of `relay` does not pass the event until it is acknowledged with
+        :meth:`mark_processed`.
+        """
+        self._in_flight.setdefault(relay, {})[event.id] = event.created_at
+
+    def advance(self, relay: str, created_at: int):
+        """Move the high-water mark of `relay` forward to `created_at`, but not past unfinished events."""
+        if created_at > self._handled.get(relay, -1):
+            self._handled[relay] = created_at
+        self._settle(relay)
+
+    def skip(self, relay: str, event: Event):
+        """Record that `event` arrived again from `relay` and was not handled a second time.
+
+        If the first copy is still being handled, `relay` waits for it like its own events.
+        """
+        if any(event.id in in_flight for in_flight in self._in_flight.values()):
+            self.begin(relay, event)
+        self.advance(relay, event.created_at)
+
+    def mark_processed(self, relay: str, event: Event):
+        """Record that `event`, received from `relay`, has been handled."""
+        self._events.append((event.id, event.created_at))
+        for other, in_flight in self._in_flight.items():
+            if in_flight.pop(event.id, None) is not None and other != relay:
+                self._settle(other)
+        self.advance(relay, event.created_at)
+        self._schedule()
+        if len(self._events) >= self.batch_size:
+            self._wakeup.set()
+
+    def _settle(self, relay: str):
+        mark = self._handled.get(relay)
+        if mark is None:
+            return
+        in_flight = self._in_flight.get(relay)
+        if in_flight:
+            mark = min(mark, min(in_flight.values()))
+        if mark > self._checkpoints.get(relay, -1):
+            self._checkpoints[relay] = mark
+            self._dirty[relay] = mark
+            self._schedule()
+
+    def _schedule(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while self._dirty or self._events:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Could not save checkpoint for listener {self.listener_id}: {e!s}")
+                await asyncio.sleep(self.flush_interval)
+
+    async def flush(self):
+        """Write buffered progress to the database."""
+        async with self._flush_lock:
+            if not self._dirty and not self._events:
+                return
+            checkpoints, self._dirty = self._dirty, {}
+            events, self._events = self._events, []
+            try:
+                await self.db.save_checkpoints(self.listener_id, checkpoints, events)
+            except Exception:
+                # Keep the progress for the next attempt
+                for relay, since in checkpoints.items():
+                    self._dirty[relay] = max(since, self._dirty.get(relay, since))
+                self._events = events + self._events
+                raise
+            if checkpoints:
+                await self.db.prune_processed_events(
+                    self.listener_id, min(self._checkpoints.values()) - self.retention_seconds
+                )
+
+    async def close(self):
+        """Stop the background writer and save any buffered progress."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flusher
+            self._flusher = None
+        await self.flush()
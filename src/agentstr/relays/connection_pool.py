@@ -0,0 +1,352 @@
+import asyncio
+import contextlib
+import json
+import socket
+import uuid
+from typing import Any
+
+from pynostr.event import Event
+from pynostr.filters import Filters
+from websockets.asyncio.client import ClientConnection, connect
+
+from agentstr.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class Subscription:
+    """A REQ subscription multiplexed over a pooled :class:`RelayConnection`.
+
+    Relay frames addressed to this subscription id are queued and consumed with
+    :meth:`recv`. The subscription must be closed with :meth:`close` once it is
+    no longer needed so the relay can free its resources.
+    """
+    def __init__(self, connection: "RelayConnection", sub_id: str, filters: list[Filters]):
+        self.connection = connection
+        self.sub_id = sub_id
+        self.filters = filters
+        self.closed = False
+        self._queue: asyncio.Queue[tuple[str, Any]] = asyncio.Queue()
+
+    def _push(self, kind: str, payload: Any = None):
+        self._queue.put_nowait((kind, payload))
+
+    async def recv(self, timeout: float | None = None) -> tuple[str, Any]:
+        """Wait for the next frame for this subscription.
+
+        Args:
+            timeout: Maximum time to wait in seconds (waits forever if None).
+
+        Returns:
+            A ``(kind, payload)`` tuple where kind is ``"EVENT"`` (payload is the event dict),
+            ``"EOSE"`` (payload is None) or ``"CLOSED"`` (payload is the relay's reason).
+
+        Raises:
+            TimeoutError: If no frame arrives within `timeout` seconds.
+            ConnectionError: If the underlying connection was lost.
+        """
+        try:
+            kind, payload = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"No frame for subscription {self.sub_id} within {timeout}s") from None
+        if kind == "DISCONNECTED":
+            raise ConnectionError(f"Connection to {self.connection.url} lost: {payload}")
+        return kind, payload
+
+    def drain(self, max_items: int) -> list[tuple[str, Any]]:
+        """Return up to `max_items` frames that are already buffered, without waiting.
+
+        Stops before a lost-connection marker so the next :meth:`recv` raises.
+        """
+        frames = []
+        while len(frames) < max_items and not self._queue.empty():
+            kind, payload = self._queue.get_nowait()
+            if kind == "DISCONNECTED":
+                # Nothing is routed after a disconnect, so re-queueing keeps it last
+                self._queue.put_nowait((kind, payload))
+                break
+            frames.append((kind, payload))
+        return frames
+
+    async def close(self):
+        """Send CLOSE for this subscription and stop routing frames to it."""
+        if self.closed:
+            return
+        self.closed = True
+        await self.connection._unsubscribe(self)
+
+
+class RelayConnection:
+    """A long-lived WebSocket connection to a single Nostr relay.
+
+    Many subscriptions and publishes share one socket: incoming frames are routed to
+    subscriptions by subscription id and ``OK`` frames are routed to pending publishes
+    by event id. The socket is (re)opened lazily and kept alive with WebSocket pings.
+
+    Args:
+        url: WebSocket URL of the Nostr relay.
+        ping_interval: Seconds between keepalive pings.
+        ping_timeout: Seconds to wait for a pong before dropping the connection.
+        open_timeout: Seconds to wait for the opening handshake.
+    """
+    def __init__(self, url: str, ping_interval: float = 20, ping_timeout: float = 20, open_timeout: float = 10):
+        self.url = url
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.open_timeout = open_timeout
+        self.loop = asyncio.get_running_loop()
+        self._ws: ClientConnection | None = None
+        self._reader: asyncio.Task | None = None
+        self._connect_lock = asyncio.Lock()
+        self._subscriptions: dict[str, Subscription] = {}
+        self._pending_ok: dict[str, asyncio.Future] = {}
+        self.connects = 0
+        self.disconnects = 0
+        self.connect_errors = 0
+        self.frames_received = 0
+        self.events_published = 0
+        self.last_error: str | None = None
+
+    @property
+    def connected(self) -> bool:
+        """Whether the underlying socket is currently open."""
+        return self._ws is not None and self._reader is not None and not self._reader.done()
+
+    async def connect(self):
+        """Open the socket if it is not already open."""
+        if self.connected:
+            return
+        async with self._connect_lock:
+            if self.connected:
+                return
+            logger.debug(f"Connecting to relay: {self.url}")
+            try:
+                self._ws = await connect(self.url, ping_interval=self.ping_interval,
+                                         ping_timeout=self.ping_timeout, open_timeout=self.open_timeout)
+            except Exception as e:
+                self.connect_errors += 1
+                self.last_error = str(e)
+                raise
+            self.connects += 1
+            self._reader = asyncio.create_task(self._read_loop(self._ws))
+
+    async def _read_loop(self, ws: ClientConnection):
+        error: Exception | None = None
+        try:
+            async for raw in ws:
+                self.frames_received += 1
+                try:
+                    self._dispatch(json.loads(raw))
+                except Exception as e:
+                    logger.warning(f"Invalid frame from {self.url}: {e!s}")
+        except asyncio.CancelledError:
+            error = ConnectionError("connection closed")
+            raise
+        except Exception as e:
+            error = e
+        finally:
+            self._connection_lost(ws, error)
+
+    def _connection_lost(self, ws: ClientConnection, error: Exception | None):
+        """Release `ws` and fail the subscriptions and publishes that were using it."""
+        logger.debug(f"Connection to {self.url} closed: {error}")
+        self.disconnects += 1
+        if error is not None:
+            self.last_error = str(error)
+        if self._ws is ws:
+            self._ws = None
+        # Also release the socket when cancelled, e.g. by asyncio.run() shutting down
+        if ws.transport is not None:
+            ws.transport.abort()
+        reason = error or ConnectionError("connection closed by relay")
+        for subscription in list(self._subscriptions.values()):
+            subscription._push("DISCONNECTED", reason)
+        self._subscriptions.clear()
+        for future in self._pending_ok.values():
+            if not future.done():
+                future.set_exception(ConnectionError(f"Connection to {self.url} lost: {reason}"))
+        self._pending_ok.clear()
+
+    def _dispatch(self, message: list):
+        kind = message[0]
+        if kind in ("EVENT", "EOSE", "CLOSED"):
+            subscription = self._subscriptions.get(message[1])
+            if subscription is None:
+                return
+            if kind == "EVENT":
+                subscription._push(kind, message[2])
+            elif kind == "EOSE":
+                subscription._push(kind)
+            else:
+                self._subscriptions.pop(message[1], None)
+                subscription._push(kind, message[2] if len(message) > 2 else "")
+        elif kind == "OK":
+            future = self._pending_ok.pop(message[1], None)
+            if future is not None and not future.done():
+                future.set_result((bool(message[2]), message[3] if len(message) > 3 else ""))
+        elif kind == "NOTICE":
+            logger.info(f"Notice from {self.url}: {message[1]}")
+        else:
+            logger.debug(f"Unhandled frame from {self.url}: {message}")
+
+    async def send(self, message: list):
+        """Send a raw client message (e.g. ``["REQ", ...]``) over the socket."""
+        await self.connect()
+        data = json.dumps(message)
+        logger.debug(f"Sending to {self.url}: {data}")
+        await self._ws.send(data)
+
+    async def subscribe(self, filters: Filters | list[Filters], sub_id: str | None = None) -> Subscription:
+        """Open a REQ subscription on this connection.
+
+        Args:
+            filters: One filter or a list of filters for the REQ.
+            sub_id: Optional subscription id (random if not provided).
+
+        Returns:
+            The :class:`Subscription` receiving frames for the REQ.
+        """
+        filters = filters if isinstance(filters, list) else [filters]
+        await self.connect()
+        subscription = Subscription(self, sub_id or uuid.uuid4().hex, filters)
+        self._subscriptions[subscription.sub_id] = subscription
+        try:
+            await self.send(["REQ", subscription.sub_id, *[f.to_dict() for f in filters]])
+        except Exception:
+            self._subscriptions.pop(subscription.sub_id, None)
+            raise
+        return subscription
+
+    async def _unsubscribe(self, subscription: Subscription):
+        if self._subscriptions.pop(subscription.sub_id, None) is None:
+            return
+        if self.connected:
+            try:
+                await self.send(["CLOSE", subscription.sub_id])
+            except Exception as e:
+                logger.debug(f"Failed to send CLOSE to {self.url}: {e!s}")
+
+    async def publish(self, event: Event, timeout: float = 10) -> tuple[bool, str]:
+        """Publish an event and wait for the relay's ``OK`` frame.
+
+        Args:
+            event: The signed event to publish.
+            timeout: Maximum time to wait for the ``OK`` frame in seconds.
+
+        Returns:
+            A ``(accepted, message)`` tuple taken from the ``OK`` frame.
+        """
+        await self.connect()
+        future = self._pending_ok.get(event.id)
+        if future is None:
+            future = self.loop.create_future()
+            self._pending_ok[event.id] = future
+            try:
+                await self._ws.send(event.to_message())
+            except Exception:
+                self._pending_ok.pop(event.id, None)
+                raise
+            self.events_published += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            if self._pending_ok.get(event.id) is future:
+                del self._pending_ok[event.id]
+            raise
+
+    def stats(self) -> dict[str, Any]:
+        """Return connection state and counters for this relay."""
+        return {
+            "url": self.url,
+            "connected": self.connected,
+            "subscriptions": len(self._subscriptions),
+            "pending_publishes": len(self._pending_ok),
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "connect_errors": self.connect_errors,
+            "frames_received": self.frames_received,
+            "events_published": self.events_published,
+            "last_error": self.last_error,
+        }
+
+    async def close(self):
+        """Close the socket and fail any subscriptions or publishes still using it."""
+        # Holding the lock until the reader has cleaned up keeps a concurrent connect()
+        # from opening a socket whose subscriptions that cleanup would then fail
+        async with self._connect_lock:
+            reader, ws = self._reader, self._ws
+            self._reader, self._ws = None, None
+            if ws is not None:
+                await ws.close()
+            if reader is not None and not reader.done():
+                reader.cancel()
+                await asyncio.gather(reader, return_exceptions=True)
+
+    def abandon(self):
+        """Shut down the socket without awaiting anything.
+
+        Used when the connection's event loop is not the running one (for example it
+        was closed by ``asyncio.run``), so :meth:`close` cannot be awaited. If the
+        loop is still running, its read loop sees the socket close and cleans up.
+        """
+        ws = self._ws
+        self._reader, self._ws = None, None
+        if ws is None:
+            return
+        sock = ws.transport.get_extra_info("socket") if ws.transport is not None else None
+        if sock is not None:
+            with contextlib.suppress(OSError):
+                sock.shutdown(socket.SHUT_RDWR)
+
+
+class ConnectionPool:
+    """Pool of long-lived :class:`RelayConnection` objects keyed by relay URL.
+
+    Connections are bound to the event loop they were created on; requesting a
+    connection from a different loop abandons the old one and opens a fresh one.
+
+    Args:
+        ping_interval: Seconds between keepalive pings on each connection.
+        ping_timeout: Seconds to wait for a pong before dropping a connection.
+        open_timeout: Seconds to wait for the opening handshake.
+    """
+    def __init__(self, ping_interval: float = 20, ping_timeout: float = 20, open_timeout: float = 10):
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.open_timeout = open_timeout
+        self._connections: dict[str, RelayConnection] = {}
+
+    def get(self, url: str) -> RelayConnection:
+        """Return the pooled connection for `url`, creating it if needed."""
+        connection = self._connections.get(url)
+        if connection is None or connection.loop is not asyncio.get_running_loop():
+            if connection is not None:
+                logger.debug(f"Replacing connection to {url} from another event loop")
+                connection.abandon()
+            connection = RelayConnection(url, ping_interval=self.ping_interval,
+                                         ping_timeout=self.ping_timeout, open_timeout=self.open_timeout)
+            self._connections[url] = connection
+        return connection
+
+    @property
+    def connections(self) -> dict[str, RelayConnection]:
+        """Connections currently held by the pool, keyed by relay URL."""
+        return dict(self._connections)
+
+    async def close(self):
+        """Close every pooled connection belonging to the running event loop."""
+        loop = asyncio.get_running_loop()
+        connections = [c for c in self._connections.values() if c.loop is loop]
+        self._connections = {url: c for url, c in self._connections.items() if c.loop is not loop}
+        await asyncio.gather(*[c.close() for c in connections], return_exceptions=True)
+
+
+_default_pool: ConnectionPool | None = None
+
+
+def get_default_pool() -> ConnectionPool:
+    """Return the process-wide connection pool shared by relays that are not given one."""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = ConnectionPool()
+    return _default_pool
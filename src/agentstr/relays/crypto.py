@@ -0,0 +1,365 @@
+"""Event signing and NIP-04/NIP-44 encryption, with cached ECDH shared secrets.
+
+pynostr recomputes the secp256k1 shared secret for every message it encrypts or
+decrypts. Agents exchange many messages with the same counterparties, so the secret
+for each (private key, public key) pair is computed once and kept in an LRU cache.
+:class:`CryptoExecutor` runs these operations off the event loop.
+"""
+import asyncio
+import base64
+import functools
+import hashlib
+import hmac
+import secrets
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Literal
+
+from cryptography.hazmat.primitives import hashes, padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDFExpand
+from pynostr.event import Event, EventKind
+from pynostr.key import PrivateKey
+
+SHARED_SECRET_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=SHARED_SECRET_CACHE_SIZE)
+def get_shared_secret(private_key_hex: str, public_key_hex: str) -> bytes:
+    """Return the ECDH shared secret between a private key and an x-only public key.
+
+    Args:
+        private_key_hex: Our private key in hex.
+        public_key_hex: The counterparty's public key in hex.
+
+    Returns:
+        The 32-byte shared secret.
+    """
+    return PrivateKey(bytes.fromhex(private_key_hex)).compute_shared_secret(public_key_hex)
+
+
+def clear_shared_secret_cache():
+    """Drop all cached shared secrets."""
+    get_shared_secret.cache_clear()
+
+
+def shared_secret_cache_info() -> functools._CacheInfo:
+    """Return hit, miss and size statistics for the shared secret cache."""
+    return get_shared_secret.cache_info()
+
+
+def nip04_encrypt(private_key_hex: str, public_key_hex: str, message: str) -> str:
+    """Encrypt a message for `public_key_hex` as NIP-04 content.
+
+    Args:
+        private_key_hex: Sender's private key in hex.
+        public_key_hex: Recipient's public key in hex.
+        message: The cleartext message.
+
+    Returns:
+        The encrypted content in ``<base64 ciphertext>?iv=<base64 iv>`` format.
+    """
+    padder = padding.PKCS7(128).padder()
+    padded_data = padder.update(message.encode()) + padder.finalize()
+    iv = secrets.token_bytes(16)
+    cipher = Cipher(algorithms.AES(get_shared_secret(private_key_hex, public_key_hex)), modes.CBC(iv))
+    encryptor = cipher.encryptor()
+    encrypted_message = encryptor.update(padded_data) + encryptor.finalize()
+    return f"{base64.b64encode(encrypted_message).decode()}?iv={base64.b64encode(iv).decode()}"
+
+
+def nip04_decrypt(private_key_hex: str, public_key_hex: str, encoded_message: str) -> str:
+    """Decrypt NIP-04 content sent to us by `public_key_hex`.
+
+    Args:
+        private_key_hex: Recipient's private key in hex.
+        public_key_hex: Sender's public key in hex.
+        encoded_message: The encrypted content.
+
+    Returns:
+        The cleartext message.
+
+    Raises:
+        ValueError: If the content is malformed or cannot be decrypted.
+    """
+    encoded_content, _, encoded_iv = encoded_message.partition("?iv=")
+    if not encoded_iv:
+        raise ValueError("Encrypted message is missing its iv")
+    cipher = Cipher(algorithms.AES(get_shared_secret(private_key_hex, public_key_hex)),
+                    modes.CBC(base64.b64decode(encoded_iv)))
+    decryptor = cipher.decryptor()
+    decrypted_message = decryptor.update(base64.b64decode(encoded_content)) + decryptor.finalize()
+    unpadder = padding.PKCS7(128).unpadder()
+    return (unpadder.update(decrypted_message) + unpadder.finalize()).decode()
+
+
+def _nip44_conversation_key(private_key_hex: str, public_key_hex: str) -> bytes:
+    # HKDF-extract with the salt as the HMAC key
+    return hmac.digest(b"nip44-v2", get_shared_secret(private_key_hex, public_key_hex), hashlib.sha256)
+
+
+def _nip44_message_keys(conversation_key: bytes, nonce: bytes) -> tuple[bytes, bytes, bytes]:
+    keys = HKDFExpand(algorithm=hashes.SHA256(), length=76, info=nonce).derive(conversation_key)
+    return keys[:32], keys[32:44], keys[44:]
+
+
+def _nip44_padded_length(length: int) -> int:
+    if length <= 32:
+        return 32
+    next_power = 1 << (length - 1).bit_length()
+    chunk = 32 if next_power <= 256 else next_power // 8
+    return chunk * ((length - 1) // chunk + 1)
+
+
+def _chacha20(key: bytes, nonce: bytes, data: bytes) -> bytes:
+    # The cryptography API takes a 4-byte little-endian block counter before the 12-byte nonce
+    cipher = Cipher(algorithms.ChaCha20(key, b"\x00" * 4 + nonce), mode=None)
+    return cipher.encryptor().update(data)
+
+
+def nip44_encrypt(private_key_hex: str, public_key_hex: str, message: str, nonce: bytes | None = None) -> str:
+    """Encrypt a message for `public_key_hex` as NIP-44 (version 2) content.
+
+    Args:
+        private_key_hex: Sender's private key in hex.
+        public_key_hex: Recipient's public key in hex.
+        message: The cleartext message.
+        nonce: 32-byte nonce (random if not provided; only set it for test vectors).
+
+    Returns:
+        The base64 encoded payload.
+    """
+    plaintext = message.encode()
+    if not 1 <= len(plaintext) <= 65535:
+        raise ValueError("NIP-44 messages must be between 1 and 65535 bytes")
+    nonce = nonce or secrets.token_bytes(32)
+    conversation_key = _nip44_conversation_key(private_key_hex, public_key_hex)
+    chacha_key, chacha_nonce, hmac_key = _nip44_message_keys(conversation_key, nonce)
+    padding_length = _nip44_padded_length(len(plaintext)) - len(plaintext)
+    padded = len(plaintext).to_bytes(2, "big") + plaintext + bytes(padding_length)
+    ciphertext = _chacha20(chacha_key, chacha_nonce, padded)
+    mac = hmac.digest(hmac_key, nonce + ciphertext, hashlib.sha256)
+    return base64.b64encode(b"\x02" + nonce + ciphertext + mac).decode()
+
+
+def nip44_decrypt(private_key_hex: str, public_key_hex: str, payload: str) -> str:
+    """Decrypt NIP-44 (version 2) content sent to us by `public_key_hex`.
+
+    Args:
+        private_key_hex: Recipient's private key in hex.
+        public_key_hex: Sender's public key in hex.
+        payload: The base64 encoded payload.
+
+    Returns:
+        The cleartext message.
+
+    Raises:
+        ValueError: If the payload is malformed, of another version or fails authentication.
+    """
+    if not payload or payload[0] == "#":
+        raise ValueError("Unsupported NIP-44 version")
+    data = base64.b64decode(payload)
+    if len(data) < 99 or data[0] != 2:
+        raise ValueError("Invalid NIP-44 payload")
+    nonce, ciphertext, mac = data[1:33], data[33:-32], data[-32:]
+    conversation_key = _nip44_conversation_key(private_key_hex, public_key_hex)
+    chacha_key, chacha_nonce, hmac_key = _nip44_message_keys(conversation_key, nonce)
+    if not hmac.compare_digest(mac, hmac.digest(hmac_key, nonce + ciphertext, hashlib.sha256)):
+        raise ValueError("Invalid NIP-44 MAC")
+    padded = _chacha20(chacha_key, chacha_nonce, ciphertext)
+    length = int.from_bytes(padded[:2], "big")
+    if not 1 <= length <= len(padded) - 2 or len(padded) != 2 + _nip44_padded_length(length):
+        raise ValueError("Invalid NIP-44 padding")
+    return padded[2:2 + length].decode()
+
+
+@functools.lru_cache(maxsize=64)
+def _load_private_key(private_key_hex: str) -> PrivateKey:
+    # Deriving the public key is as costly as signing, so keys are reused
+    return PrivateKey(bytes.fromhex(private_key_hex))
+
+
+def sign_event_dicts(private_key_hex: str, events: list[dict[str, Any]]) -> list[tuple[str, str, str]]:
+    """Compute the pubkey, id and signature for each unsigned event.
+
+    Runs in an executor, so it only takes and returns picklable values.
+
+    Returns:
+        One ``(pubkey, id, sig)`` tuple per event.
+    """
+    key = _load_private_key(private_key_hex)
+    results = []
+    for fields in events:
+        event = Event(content=fields["content"], pubkey=key.public_key.hex(), created_at=fields["created_at"],
+                      kind=fields["kind"], tags=fields["tags"])
+        event.compute_id()
+        results.append((event.pubkey, event.id, key.sign(bytes.fromhex(event.id)).hex()))
+    return results
+
+
+def encrypt_many(private_key_hex: str, items: list[tuple[str, str]]) -> list[str]:
+    """Encrypt ``(public key, message)`` pairs with :func:`nip04_encrypt`."""
+    return [nip04_encrypt(private_key_hex, public_key_hex, message) for public_key_hex, message in items]
+
+
+def decrypt_many(private_key_hex: str, items: list[tuple[str, str]]) -> list[str | None]:
+    """Decrypt ``(public key, content)`` pairs with :func:`nip04_decrypt` (None where it fails)."""
+    results = []
+    for public_key_hex, content in items:
+        try:
+            results.append(nip04_decrypt(private_key_hex, public_key_hex, content))
+        except Exception:
+            results.append(None)
+    return results
+
+
+def nip44_decrypt_many(private_key_hex: str, items: list[tuple[str, str]]) -> list[str | None]:
+    """Decrypt ``(public key, content)`` pairs with :func:`nip44_decrypt` (None where it fails)."""
+    results = []
+    for public_key_hex, content in items:
+        try:
+            results.append(nip44_decrypt(private_key_hex, public_key_hex, content))
+        except Exception:
+            results.append(None)
+    return results
+
+
+def encrypt_and_sign_many(private_key_hex: str, events: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Encrypt each event's content for its first ``p`` tag and sign it.
+
+    Returns:
+        The complete event dicts, in order.
+    """
+    for fields in events:
+        recipient = next(tag[1] for tag in fields["tags"] if tag[0] == "p")
+        fields["content"] = nip04_encrypt(private_key_hex, recipient, fields["content"])
+    signatures = sign_event_dicts(private_key_hex, events)
+    return [{**fields, "pubkey": pubkey, "id": event_id, "sig": sig}
+            for fields, (pubkey, event_id, sig) in zip(events, signatures, strict=True)]
+
+
+class CryptoExecutor:
+    """Runs signing and NIP-04 encryption off the event loop.
+
+    Schnorr signatures and ECDH/AES are CPU-bound; done inline they stall every
+    coroutine while a server fans out replies. The executor moves them to a thread
+    pool (the secp256k1 bindings release the GIL) or, with ``executor="process"``,
+    a process pool. Each batch method makes a single executor round trip, so N
+    outgoing messages can be prepared in one hop.
+
+    Args:
+        executor: ``"thread"`` or ``"process"``.
+        max_workers: Size of the pool (defaults to the executor's default).
+    """
+    def __init__(self, executor: Literal["thread", "process"] = "thread", max_workers: int | None = None):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown executor: {executor}")
+        self.executor = executor
+        self.max_workers = max_workers
+        self._pool: Executor | None = None
+
+    def _executor(self) -> Executor:
+        if self._pool is None:
+            if self.executor == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="agentstr-crypto")
+        return self._pool
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor(), fn, *args)
+
+    async def sign_events(self, private_key_hex: str, events: list[Event]) -> list[Event]:
+        """Set the pubkey, id and signature of each event in place and return them."""
+        if not events:
+            return events
+        fields = [{"content": e.content, "created_at": e.created_at, "kind": e.kind, "tags": e.tags} for e in events]
+        signatures = await self._run(sign_event_dicts, private_key_hex, fields)
+        for event, (pubkey, event_id, sig) in zip(events, signatures, strict=True):
+            event.pubkey, event.id, event.sig = pubkey, event_id, sig
+        return events
+
+    async def sign_event(self, private_key_hex: str, event: Event) -> Event:
+        """Set the pubkey, id and signature of `event` in place and return it."""
+        return (await self.sign_events(private_key_hex, [event]))[0]
+
+    async def encrypt_many(self, private_key_hex: str, items: list[tuple[str, str]]) -> list[str]:
+        """Encrypt ``(recipient public key, message)`` pairs."""
+        return await self._run(encrypt_many, private_key_hex, items) if items else []
+
+    async def encrypt(self, private_key_hex: str, public_key_hex: str, message: str) -> str:
+        """Encrypt `message` for `public_key_hex`."""
+        return (await self.encrypt_many(private_key_hex, [(public_key_hex, message)]))[0]
+
+    async def decrypt_many(self, private_key_hex: str, items: list[tuple[str, str]]) -> list[str | None]:
+        """Decrypt ``(sender public key, content)`` pairs, with None for content that cannot be decrypted."""
+        return await self._run(decrypt_many, private_key_hex, items) if items else []
+
+    async def decrypt(self, private_key_hex: str, public_key_hex: str, content: str, nip44: bool = False) -> str:
+        """Decrypt `content` sent by `public_key_hex`.
+
+        Args:
+            private_key_hex: Recipient's private key in hex.
+            public_key_hex: Sender's public key in hex.
+            content: The encrypted content.
+            nip44: Whether the content is NIP-44 rather than NIP-04 encrypted.
+
+        Raises:
+            ValueError: If the content cannot be decrypted.
+        """
+        if nip44:
+            message = (await self._run(nip44_decrypt_many, private_key_hex, [(public_key_hex, content)]))[0]
+        else:
+            message = (await self.decrypt_many(private_key_hex, [(public_key_hex, content)]))[0]
+        if message is None:
+            raise ValueError("Could not decrypt message")
+        return message
+
+    async def encrypt_and_sign(self, private_key_hex: str, messages: list[tuple[str, str]],
+                               kind: int = EventKind.ENCRYPTED_DIRECT_MESSAGE,
+                               tags: list[list[list[str]]] | None = None) -> list[Event]:
+        """Build signed events with encrypted content, one per ``(recipient public key, message)`` pair.
+
+        Args:
+            private_key_hex: Sender's private key in hex.
+            messages: Recipient and cleartext for each event.
+            kind: Event kind (default: encrypted direct message).
+            tags: Extra tags for each event, added after the recipient's ``p`` tag (optional).
+
+        Returns:
+            The signed events, in order.
+        """
+        if not messages:
+            return []
+        created_at = int(time.time())
+        fields = [
+            {"content": message, "created_at": created_at, "kind": int(kind),
+             "tags": [["p", recipient], *(tags[i] if tags else [])]}
+            for i, (recipient, message) in enumerate(messages)
+        ]
+        signed = await self._run(encrypt_and_sign_many, private_key_hex, fields)
+        events = []
+        for event_dict in signed:
+            event = Event(content=event_dict["content"], pubkey=event_dict["pubkey"], created_at=event_dict["created_at"],
+                          kind=event_dict["kind"], tags=event_dict["tags"])
+            event.id, event.sig = event_dict["id"], event_dict["sig"]
+            events.append(event)
+        return events
+
+    def close(self):
+        """Shut down the executor."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_default_executor: CryptoExecutor | None = None
+
+
+def get_default_crypto_executor() -> CryptoExecutor:
+    """Return the process-wide thread-backed :class:`CryptoExecutor`."""
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = CryptoExecutor()
+    return _default_executor
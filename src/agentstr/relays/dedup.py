@@ -0,0 +1,179 @@
+import hashlib
+import math
+import time
+from collections import deque
+
+from pydantic import BaseModel
+
+from agentstr.logger import get_logger
+
+logger = get_logger(__name__)
+
+#: Approximate memory used by one id in the exact window (a 128-bit int in a set).
+EXACT_BYTES_PER_ID = 110
+
+
+_MASK_64 = (1 << 64) - 1
+
+
+def _key(event_id: str) -> int:
+    """Reduce an event id to a 128-bit int."""
+    try:
+        # Event ids are already sha256 digests, so their bits can be used directly
+        return int(event_id[:32], 16) if len(event_id) >= 32 else int(event_id, 16) << 64 | 1
+    except ValueError:
+        return int.from_bytes(hashlib.blake2b(event_id.encode(), digest_size=16).digest(), "big")
+
+
+class _BloomFilter:
+    """A fixed-size Bloom filter over 128-bit id keys.
+
+    Args:
+        capacity: Number of ids it holds before the false positive rate exceeds `error_rate`.
+        error_rate: Target false positive probability at capacity.
+    """
+    def __init__(self, capacity: int, error_rate: float = 1e-6):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    @staticmethod
+    def size_for(memory_bytes: int, error_rate: float = 1e-6) -> int:
+        """Return the capacity of a filter using `memory_bytes` at `error_rate`."""
+        return max(1, int(memory_bytes * 8 * math.log(2) ** 2 / -math.log(error_rate)))
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._bits)
+
+    def _positions(self, key: int):
+        h1, h2 = key >> 64, key & _MASK_64 | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: int):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: int) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class DedupStats(BaseModel):
+    """Point-in-time metrics for an :class:`EventDeduplicator`."""
+    exact_ids: int  #: Ids in the exact recent window.
+    bloom_ids: int  #: Ids summarized in the Bloom filters.
+    memory_bytes: int  #: Approximate memory in use.
+    checks: int  #: Ids checked.
+    hits: int  #: Checks that found a duplicate.
+    evictions: int  #: Ids forgotten entirely when the oldest Bloom filter was dropped.
+    hit_rate: float  #: Fraction of checks that were duplicates.
+    eviction_rate: float  #: Fraction of inserted ids that have been forgotten.
+
+
+class EventDeduplicator:
+    """Remembers event ids seen by a listener, bounded by memory rather than count.
+
+    Recent ids are kept exactly in per-time-bucket sets covering `window_seconds`.
+    Older ids (or recent ones, if the window outgrows its share of memory) move
+    into a rotating pair of Bloom filters, which remember millions of ids in a
+    few megabytes at the cost of a tiny false positive rate. When the newer Bloom
+    filter fills up the older one is dropped, and only then are ids forgotten.
+
+    All methods are synchronous, so on a single-threaded event loop no lock is
+    needed around :meth:`seen`.
+
+    Args:
+        max_memory_bytes: Memory budget for the whole structure.
+        window_seconds: How long ids are kept exactly.
+        bucket_seconds: Granularity of the exact window.
+        error_rate: False positive probability of each Bloom filter when full.
+    """
+    def __init__(self, max_memory_bytes: int = 16 * 1024 * 1024, window_seconds: float = 900,
+                 bucket_seconds: float = 60, error_rate: float = 1e-6):
+        self.max_memory_bytes = max_memory_bytes
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.error_rate = error_rate
+        # A quarter for the exact window, the rest split between two Bloom generations
+        self.max_exact_ids = max(1, max_memory_bytes // 4 // EXACT_BYTES_PER_ID)
+        self.bloom_capacity = _BloomFilter.size_for(max_memory_bytes * 3 // 8, error_rate)
+        self._buckets: deque[tuple[int, set[int]]] = deque()
+        self._exact_count = 0
+        self._current = _BloomFilter(self.bloom_capacity, error_rate)
+        self._previous: _BloomFilter | None = None
+        self._checks = 0
+        self._hits = 0
+        self._inserts = 0
+        self._evictions = 0
+
+    def _bucket(self) -> set[int]:
+        index = int(time.monotonic() // self.bucket_seconds)
+        if not self._buckets or self._buckets[-1][0] != index:
+            self._buckets.append((index, set()))
+        return self._buckets[-1][1]
+
+    def _expire(self):
+        oldest = int((time.monotonic() - self.window_seconds) // self.bucket_seconds)
+        while self._buckets and (self._buckets[0][0] < oldest or self._exact_count > self.max_exact_ids):
+            _, ids = self._buckets.popleft()
+            self._exact_count -= len(ids)
+            for key in ids:
+                self._bloom_add(key)
+
+    def _bloom_add(self, key: int):
+        if self._current.full:
+            if self._previous is not None:
+                self._evictions += self._previous.count
+                logger.debug(f"Dedup dropped a Bloom filter with {self._previous.count} ids")
+            self._previous = self._current
+            self._current = _BloomFilter(self.bloom_capacity, self.error_rate)
+        self._current.add(key)
+
+    def __contains__(self, event_id: str) -> bool:
+        key = _key(event_id)
+        if any(key in ids for _, ids in reversed(self._buckets)):
+            return True
+        return key in self._current or (self._previous is not None and key in self._previous)
+
+    def add(self, event_id: str):
+        """Remember `event_id`."""
+        ids = self._bucket()
+        key = _key(event_id)
+        if key not in ids:
+            ids.add(key)
+            self._exact_count += 1
+            self._inserts += 1
+        self._expire()
+
+    def seen(self, event_id: str) -> bool:
+        """Return True if `event_id` was seen before, remembering it otherwise."""
+        self._checks += 1
+        if event_id in self:
+            self._hits += 1
+            return True
+        self.add(event_id)
+        return False
+
+    def stats(self) -> DedupStats:
+        """Return sizes, memory use, and hit and eviction rates."""
+        bloom_ids = self._current.count + (self._previous.count if self._previous else 0)
+        bloom_bytes = self._current.memory_bytes + (self._previous.memory_bytes if self._previous else 0)
+        return DedupStats(
+            exact_ids=self._exact_count,
+            bloom_ids=bloom_ids,
+            memory_bytes=self._exact_count * EXACT_BYTES_PER_ID + bloom_bytes,
+            checks=self._checks,
+            hits=self._hits,
+            evictions=self._evictions,
+            hit_rate=self._hits / self._checks if self._checks else 0.0,
+            eviction_rate=self._evictions / self._inserts if self._inserts else 0.0,
+        )
@@ -0,0 +1,225 @@
+import asyncio
+import random
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+
+from pynostr.event import Event, EventKind
+from pynostr.filters import Filters
+from pynostr.key import PublicKey
+from pynostr.utils import get_timestamp
+
+from agentstr.logger import get_logger
+from agentstr.relays.dedup import EventDeduplicator
+from agentstr.relays.relay import DecryptedMessage, EventRelay
+
+logger = get_logger(__name__)
+
+
+class PendingReply:
+    """A caller waiting for a direct message from `author`.
+
+    Args:
+        author: Hex public key the reply is expected from.
+        since: Only messages created at or after this timestamp match.
+        event_ref: Optional event id the reply must reference with an ``e`` tag.
+    """
+    def __init__(self, author: str, since: int, event_ref: str | None = None):
+        self.author = author
+        self.since = since
+        self.event_ref = event_ref
+        self.future: asyncio.Future[DecryptedMessage] = asyncio.get_running_loop().create_future()
+
+
+class DirectMessageRouter:
+    """Routes direct messages from one shared subscription per relay to waiting callers.
+
+    Instead of opening a REQ per request/response exchange, the router keeps a single
+    subscription for DMs addressed to us on every relay and resolves :class:`PendingReply`
+    futures as messages arrive. Replies are matched by sender and, when present, by the
+    ``e`` tag referencing the request; replies without an ``e`` tag go to the oldest
+    waiter for that sender. Messages that arrive before anyone waits for them are kept
+    in a short buffer.
+
+    Args:
+        relays: Relays to subscribe on.
+        public_key: Our public key (DMs tagged with it are received).
+        decrypt: Coroutine function decrypting a batch of DM events addressed to us.
+        buffer_size: Maximum number of unclaimed messages kept for late waiters.
+        buffer_seconds: How long unclaimed messages are kept.
+    """
+    def __init__(self, relays: list[EventRelay], public_key: PublicKey,
+                 decrypt: Callable[[list[Event]], Awaitable[list[DecryptedMessage | None]]],
+                 buffer_size: int = 1000, buffer_seconds: int = 300):
+        self.relays = relays
+        self.public_key = public_key
+        self.decrypt = decrypt
+        self.buffer_size = buffer_size
+        self.buffer_seconds = buffer_seconds
+        self._waiters: dict[str, list[PendingReply]] = {}
+        self._buffer: deque[tuple[float, DecryptedMessage]] = deque()
+        self.dedup = EventDeduplicator()
+        self._tasks: list[asyncio.Task] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def started(self) -> bool:
+        return self._loop is asyncio.get_running_loop() and len(self._tasks) > 0
+
+    def start(self, since: int | None = None):
+        """Start the shared subscriptions if they are not already running.
+
+        Args:
+            since: Timestamp to subscribe from (defaults to now).
+        """
+        if self.started:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._waiters.clear()
+        self._buffer.clear()
+        since = since or get_timestamp()
+        self._tasks = [asyncio.create_task(self._listen(relay, since)) for relay in self.relays]
+
+    async def _listen(self, relay: EventRelay, since: int):
+        filters = Filters(kinds=[EventKind.ENCRYPTED_DIRECT_MESSAGE], pubkey_refs=[self.public_key.hex()], since=since)
+        initial_backoff = 0.5
+        max_backoff = 30.0
+        backoff = initial_backoff
+        while True:
+            subscription = None
+            try:
+                subscription = await relay.connection.subscribe(filters)
+                logger.debug(f"DM router subscribed on {relay.relay} since {filters.since}")
+                backoff = initial_backoff
+                while True:
+                    events = []
+                    for kind, payload in await relay.receive(subscription):
+                        if kind == "CLOSED":
+                            raise ConnectionError(f"Subscription closed by relay: {payload}")
+                        if kind == "EVENT":
+                            events.append(Event.from_dict(payload))
+                    await self._route(events)
+                    for event in events:
+                        filters.since = max(filters.since, event.created_at)
+            except asyncio.CancelledError:
+                if subscription:
+                    await subscription.close()
+                raise
+            except Exception as e:
+                logger.warning(f"DM router subscription on {relay.relay} failed, retrying: {e!s}")
+                jitter = random.uniform(0, backoff * 0.1)
+                await asyncio.sleep(min(max_backoff, backoff) + jitter)
+                backoff = min(max_backoff, backoff * 2)
+
+    async def _route(self, events: list[Event]):
+        fresh = []
+        for event in events:
+            if not self.dedup.seen(event.id):
+                fresh.append(event)
+        if not fresh:
+            return
+        try:
+            dms = await self.decrypt(fresh)
+        except Exception as e:
+            logger.warning(f"DM router failed to decrypt {len(fresh)} message(s): {e!s}")
+            return
+        for dm in dms:
+            if dm is None:
+                continue
+            waiter = self._match(dm)
+            if waiter is None:
+                self._buffer.append((time.time(), dm))
+                self._prune_buffer()
+                continue
+            self._remove(waiter)
+            waiter.future.set_result(dm)
+
+    def _matches(self, waiter: PendingReply, dm: DecryptedMessage, refs: list[str]) -> bool:
+        if dm.event.pubkey != waiter.author or dm.event.created_at < waiter.since:
+            return False
+        if not refs:
+            return True
+        return waiter.event_ref is None or waiter.event_ref in refs
+
+    def _match(self, dm: DecryptedMessage) -> PendingReply | None:
+        refs = [tag[0] for tag in dm.event.get_tag_list("e")]
+        candidates = [w for w in self._waiters.get(dm.event.pubkey, []) if self._matches(w, dm, refs)]
+        if not candidates:
+            return None
+        # Prefer the waiter the reply explicitly references
+        for waiter in candidates:
+            if waiter.event_ref is not None and waiter.event_ref in refs:
+                return waiter
+        return candidates[0]
+
+    def _prune_buffer(self):
+        cutoff = time.time() - self.buffer_seconds
+        while self._buffer and (len(self._buffer) > self.buffer_size or self._buffer[0][0] < cutoff):
+            self._buffer.popleft()
+
+    def _remove(self, waiter: PendingReply):
+        waiters = self._waiters.get(waiter.author, [])
+        if waiter in waiters:
+            waiters.remove(waiter)
+        if not waiters:
+            self._waiters.pop(waiter.author, None)
+
+    def expect(self, author: str, since: int | None = None, event_ref: str | None = None) -> PendingReply:
+        """Register interest in a reply before the request is sent.
+
+        Args:
+            author: Hex public key the reply is expected from.
+            since: Only messages created at or after this timestamp match (defaults to now).
+            event_ref: Optional request event id the reply is expected to reference.
+
+        Returns:
+            The :class:`PendingReply` to pass to :meth:`wait`.
+        """
+        since = since or get_timestamp()
+        self.start(since)
+        waiter = PendingReply(author, since, event_ref)
+        self._prune_buffer()
+        refs_cache = [(dm, [tag[0] for tag in dm.event.get_tag_list("e")]) for _, dm in self._buffer]
+        for i, (dm, refs) in enumerate(refs_cache):
+            if self._matches(waiter, dm, refs):
+                del self._buffer[i]
+                waiter.future.set_result(dm)
+                return waiter
+        self._waiters.setdefault(author, []).append(waiter)
+        return waiter
+
+    async def wait(self, waiter: PendingReply, timeout: float | None = None) -> DecryptedMessage | None:
+        """Wait for the reply registered with :meth:`expect`.
+
+        Returns:
+            The decrypted reply, or None if it did not arrive within `timeout` seconds.
+        """
+        try:
+            return await asyncio.wait_for(waiter.future, timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._remove(waiter)
+
+    def discard(self, waiter: PendingReply):
+        """Stop waiting for a reply registered with :meth:`expect`."""
+        self._remove(waiter)
+        waiter.future.cancel()
+
+    async def receive(self, author: str, since: int | None = None, timeout: float | None = None,
+                      event_ref: str | None = None) -> DecryptedMessage | None:
+        """Wait for the next message from `author` (see :meth:`expect` for the arguments)."""
+        return await self.wait(self.expect(author, since, event_ref), timeout)
+
+    async def close(self):
+        """Stop the shared subscriptions and cancel all waiters."""
+        tasks, self._tasks = self._tasks, []
+        if self._loop is asyncio.get_running_loop():
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for waiters in self._waiters.values():
+            for waiter in waiters:
+                waiter.future.cancel()
+        self._waiters.clear()
+        self._loop = None
@@ -0,0 +1,231 @@
+import asyncio
+import contextlib
+import json
+import time
+from collections import Counter, OrderedDict
+
+import aiosqlite
+from pydantic import BaseModel
+from pynostr.event import Event
+
+from agentstr.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def is_replaceable(kind: int) -> bool:
+    """Whether events of `kind` replace older ones from the same author (NIP-01)."""
+    return kind in (0, 3) or 10000 <= kind < 20000 or 30000 <= kind < 40000
+
+
+def replaceable_key(event: Event) -> tuple[int, str, str]:
+    """Return the ``(kind, pubkey, d tag)`` an event replaces others under."""
+    d = ""
+    if 30000 <= event.kind < 40000:
+        d = next((tag[1] for tag in event.tags if len(tag) > 1 and tag[0] == "d"), "")
+    return event.kind, event.pubkey, d
+
+
+class EventStoreStats(BaseModel):
+    """Point-in-time metrics for a :class:`ReplaceableEventStore`."""
+    entries: int  #: Cached events and known-missing keys.
+    hits: int  #: Lookups answered from the cache.
+    misses: int  #: Lookups that had to go to the relays.
+    hit_rate: float  #: Fraction of lookups answered from the cache.
+    live_authors: int  #: Authors kept fresh by the live subscription.
+
+
+class ReplaceableEventStore:
+    """Local cache of replaceable events such as profiles (kind 0) and follow lists (kind 3).
+
+    Events are keyed by kind, author and (for parameterized kinds) ``d`` tag, and an
+    event only replaces a cached one if it is newer. Entries are fresh for `ttl`
+    seconds, or indefinitely while a live subscription keeps their author up to date
+    (see :meth:`RelayManager.get_replaceable`). Lookups that found nothing are cached
+    too, for `missing_ttl` seconds.
+
+    With `path`, entries are also persisted to SQLite so a restarted process starts
+    warm. Writes are batched in the background.
+
+    Args:
+        ttl: Seconds a cached event is served without asking the relays again.
+        missing_ttl: Seconds a lookup that found nothing is remembered.
+        max_entries: Maximum number of entries kept in memory (least recently used are dropped).
+        path: SQLite file to persist entries to (memory only if None).
+        live_refresh: Keep a subscription open for the authors in the cache so entries stay fresh.
+        kinds: Kinds covered by the live subscription.
+    """
+    def __init__(self, ttl: float = 300, missing_ttl: float = 60, max_entries: int = 10000, path: str | None = None,
+                 live_refresh: bool = False, kinds: list[int] | None = None):
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        self.max_entries = max_entries
+        self.path = path
+        self.live_refresh = live_refresh
+        self.kinds = kinds or [0, 3]
+        self.live_authors: set[str] = set()
+        self.authors_changed = asyncio.Event()
+        # key -> (event or None if missing, time stored)
+        self._entries: OrderedDict[tuple[int, str, str], tuple[Event | None, float]] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        # author -> number of cached events of the live-refreshed kinds
+        self._authors: Counter[str] = Counter()
+        self._conn: aiosqlite.Connection | None = None
+        self._opened = False
+        self._dirty: dict[tuple[int, str, str], Event] = {}
+        self._flusher: asyncio.Task | None = None
+
+    def authors(self) -> list[str]:
+        """Return the authors with cached events of the live-refreshed kinds."""
+        return sorted(self._authors)
+
+    def lookup(self, kind: int, pubkey: str, d: str = "") -> tuple[bool, Event | None]:
+        """Look up a cached event.
+
+        Returns:
+            ``(True, event)`` for a fresh hit, ``(True, None)`` if the event is known not to
+            exist, and ``(False, None)`` if the relays have to be asked.
+        """
+        key = (kind, pubkey, d)
+        entry = self._entries.get(key)
+        if entry is not None:
+            event, stored_at = entry
+            age = time.monotonic() - stored_at
+            live = event is not None and pubkey in self.live_authors and kind in self.kinds
+            if live or age < (self.ttl if event is not None else self.missing_ttl):
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return True, event
+        self._misses += 1
+        return False, None
+
+    def get(self, kind: int, pubkey: str, d: str = "") -> Event | None:
+        """Return a fresh cached event, or None."""
+        return self.lookup(kind, pubkey, d)[1]
+
+    def put(self, event: Event) -> bool:
+        """Store `event` unless a newer one is already cached.
+
+        Returns:
+            True if the event is now the cached one.
+        """
+        if not is_replaceable(event.kind):
+            return False
+        key = replaceable_key(event)
+        current = self._entries.get(key)
+        if current is not None and current[0] is not None and current[0].created_at > event.created_at:
+            return False
+        self._set(key, event)
+        if self.path is not None:
+            self._dirty[key] = event
+            self._schedule_flush()
+        return True
+
+    def mark_missing(self, kind: int, pubkey: str, d: str = ""):
+        """Remember that the relays have no event for this key."""
+        key = (kind, pubkey, d)
+        current = self._entries.get(key)
+        if current is None or current[0] is None:
+            self._set(key, None)
+
+    def _is_live(self, key: tuple[int, str, str], event: Event | None) -> bool:
+        return event is not None and key[0] in self.kinds
+
+    def _set(self, key: tuple[int, str, str], event: Event | None, stored_at: float | None = None):
+        previous = self._entries.get(key)
+        self._entries[key] = (event, time.monotonic() if stored_at is None else stored_at)
+        self._entries.move_to_end(key)
+        if self._is_live(key, event) and not (previous is not None and self._is_live(key, previous[0])):
+            self._authors[key[1]] += 1
+            if self._authors[key[1]] == 1:
+                self.authors_changed.set()
+        while len(self._entries) > self.max_entries:
+            evicted, (evicted_event, _) = self._entries.popitem(last=False)
+            if self._is_live(evicted, evicted_event):
+                # The author stays live while any of their other events is cached
+                self._authors[evicted[1]] -= 1
+                if not self._authors[evicted[1]]:
+                    del self._authors[evicted[1]]
+
+    async def open(self):
+        """Load persisted entries (no-op without `path`, or if already open)."""
+        if self._opened or self.path is None:
+            return
+        self._opened = True
+        self._conn = await aiosqlite.connect(self.path)
+        await self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS replaceable_event (
+                kind INTEGER NOT NULL,
+                pubkey TEXT NOT NULL,
+                d TEXT NOT NULL,
+                created_at INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                event TEXT NOT NULL,
+                PRIMARY KEY (kind, pubkey, d)
+            )"""
+        )
+        await self._conn.commit()
+        async with self._conn.execute(
+            "SELECT event, stored_at FROM replaceable_event ORDER BY stored_at DESC LIMIT ?", (self.max_entries,)
+        ) as cursor:
+            rows = await cursor.fetchall()
+        now_wall, now = time.time(), time.monotonic()
+        for raw, stored_at in reversed(rows):
+            event = Event.from_dict(json.loads(raw))
+            key = replaceable_key(event)
+            current = self._entries.get(key)
+            if current is None or current[0] is None or current[0].created_at < event.created_at:
+                # Carry over the entry's age so it expires on schedule
+                self._set(key, event, now - (now_wall - stored_at))
+        logger.debug(f"Loaded {len(rows)} replaceable events from {self.path}")
+
+    def _schedule_flush(self):
+        if self._opened and (self._flusher is None or self._flusher.done()):
+            self._flusher = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(1)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Could not persist replaceable events to {self.path}: {e!s}")
+
+    async def flush(self):
+        """Write pending entries to SQLite."""
+        if self._conn is None or not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        now = time.time()
+        await self._conn.executemany(
+            """INSERT INTO replaceable_event (kind, pubkey, d, created_at, stored_at, event) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(kind, pubkey, d) DO UPDATE SET created_at = excluded.created_at,
+                stored_at = excluded.stored_at, event = excluded.event
+            WHERE excluded.created_at >= replaceable_event.created_at""",
+            [(*key, event.created_at, now, json.dumps(event.to_dict())) for key, event in dirty.items()],
+        )
+        await self._conn.commit()
+
+    def stats(self) -> EventStoreStats:
+        """Return size, hit rate and live subscription coverage."""
+        lookups = self._hits + self._misses
+        return EventStoreStats(
+            entries=len(self._entries),
+            hits=self._hits,
+            misses=self._misses,
+            hit_rate=self._hits / lookups if lookups else 0.0,
+            live_authors=len(self.live_authors),
+        )
+
+    async def close(self):
+        """Persist pending entries and close the database."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flusher
+            self._flusher = None
+        if self._conn is not None:
+            await self.flush()
+            await self._conn.close()
+            self._conn = None
+        self._opened = False
@@ -1,21 +1,27 @@
 import asyncio
 import json
-import math
-import time
+import random
 import os
+import warnings
 from typing import Optional
 
 from bolt11.decode import decode
-from pynostr.encrypted_dm import EncryptedDirectMessage
 from pynostr.event import Event
 from pynostr.filters import Filters
 from pynostr.key import PrivateKey
+from pynostr.utils import get_timestamp
 
 from agentstr.logger import get_logger
+from agentstr.relays.connection_pool import ConnectionPool, Subscription
+from agentstr.relays.crypto import CryptoExecutor, get_default_crypto_executor, nip04_decrypt, nip04_encrypt
+from agentstr.relays.payment_watcher import NWC_NOTIFICATION_KINDS, PaymentWatcher
 from agentstr.relays.relay import EventRelay
 
 logger = get_logger(__name__)
 
+NWC_REQUEST_KIND = 23194
+NWC_RESPONSE_KIND = 23195
+
 
 def encrypt(privkey: str, pubkey: str, plaintext: str) -> str:
     """Encrypt plaintext using ECDH shared secret.
@@ -28,9 +34,7 @@ def encrypt(privkey: str, pubkey: str, plaintext: str) -> str:
     Returns:
         The encrypted message as a string.
     """
-    dm = EncryptedDirectMessage()
-    dm.encrypt(privkey, cleartext_content=plaintext, recipient_pubkey=pubkey)
-    return dm.encrypted_message
+    return nip04_encrypt(privkey, pubkey, plaintext)
 
 
 def decrypt(privkey: str, pubkey: str, ciphertext: str) -> str:
@@ -44,9 +48,7 @@ def decrypt(privkey: str, pubkey: str, ciphertext: str) -> str:
     Returns:
         The decrypted plaintext message.
     """
-    dm = EncryptedDirectMessage()
-    dm.decrypt(privkey, encrypted_message=ciphertext, public_key_hex=pubkey)
-    return dm.cleartext_content
+    return nip04_decrypt(privkey, pubkey, ciphertext)
 
 
 def process_nwc_string(string: str) -> dict:
@@ -90,6 +92,9 @@ def process_nwc_string(string: str) -> dict:
 def get_signed_event(event: dict, private_key: str) -> Event:
     """Create and sign a Nostr event with the given private key.
 
+    .. deprecated::
+        Build an :class:`~pynostr.event.Event` and sign it directly instead.
+
     Args:
         event: The event data as a dictionary.
         private_key: The private key to sign the event with.
@@ -97,7 +102,8 @@ def get_signed_event(event: dict, private_key: str) -> Event:
     Returns:
         A signed Nostr event.
     """
-    logger.debug(f"Signing event in nwc_relay: {json.dumps(event)}")
+    warnings.warn("get_signed_event is deprecated, sign a pynostr Event directly instead",
+                  DeprecationWarning, stacklevel=2)
     event = Event(**event)
     event.sign(private_key)
     return event
@@ -107,22 +113,38 @@ class NWCRelay:
     """Client for interacting with Nostr Wallet Connect (NWC) relays.
 
     Handles encrypted communication with wallet services over the Nostr network.
+    All wallet calls share one long-lived subscription for responses (kind 23195)
+    and payment notifications (kinds 23196 and 23197); responses are matched to requests by the
+    ``e`` tag referencing the request event, so any number of calls can be in flight.
     """
-    def __init__(self, nwc_connection_string: Optional[str] = None):
+    def __init__(self, nwc_connection_string: Optional[str] = None, pool: ConnectionPool | None = None,
+                 request_timeout: float = 60, crypto: CryptoExecutor | None = None):
         """Initialize NWC client with connection string or environment variable (NWC_CONN_STR).
 
         Args:
             nwc_connection_string: NWC connection string (starts with 'nostr+walletconnect://')
+            pool: Connection pool to share the wallet relay socket through (optional).
+            request_timeout: Default seconds to wait for a wallet response (default: 60).
+            crypto: Executor for signing and encryption (defaults to the process-wide thread pool).
         """
-        logger.info(f"Initializing NWCRelay with connection string: {nwc_connection_string[:10]}...")
         try:
             if nwc_connection_string is None:
                 nwc_connection_string = os.getenv("NWC_CONN_STR")
                 if nwc_connection_string is None:
                     raise ValueError("No NWC connection string provided. Either pass variable `nwc_connection_string` or set environment variable `NWC_CONN_STR`")
+            logger.info(f"Initializing NWCRelay with connection string: {nwc_connection_string[:10]}...")
             self.nwc_info = process_nwc_string(nwc_connection_string)
             logger.debug(f"NWC info: {self.nwc_info}")
             self.private_key = PrivateKey.from_hex(self.nwc_info["app_privkey"])
+            self.request_timeout = request_timeout
+            self.crypto = crypto or get_default_crypto_executor()
+            self._event_relay = EventRelay(self.nwc_info["relay"], private_key=self.private_key, pool=pool,
+                                           crypto=self.crypto)
+            self._payment_watcher: PaymentWatcher | None = None
+            self._pending: dict[str, asyncio.Future[dict]] = {}
+            self._subscribed: asyncio.Event | None = None
+            self._listener: asyncio.Task | None = None
+            self._loop: asyncio.AbstractEventLoop | None = None
             logger.info("NWCRelay initialized successfully")
         except Exception as e:
             logger.critical(f"Failed to initialize NWCRelay: {e!s}", exc_info=True)
@@ -130,60 +152,179 @@ class NWCRelay:
 
     @property
     def event_relay(self) -> EventRelay:
-        return EventRelay(self.nwc_info["relay"], private_key=self.private_key)
+        return self._event_relay
+
+    @property
+    def payment_watcher(self) -> PaymentWatcher:
+        """Watcher resolving invoice payments for this wallet (created on first access)."""
+        if self._payment_watcher is None:
+            self._payment_watcher = PaymentWatcher(self)
+        return self._payment_watcher
+
+    async def decrypt(self, content: str, nip44: bool = False) -> str:
+        """Decrypt content sent to this app by the wallet service (NIP-04, or NIP-44 if `nip44`)."""
+        return await self.crypto.decrypt(self.nwc_info["app_privkey"], self.nwc_info["wallet_pubkey"], content,
+                                         nip44=nip44)
+
+    def start(self):
+        """Start the shared response subscription if it is not already running."""
+        if self._loop is asyncio.get_running_loop() and self._listener is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._pending.clear()
+        self._subscribed = asyncio.Event()
+        self._listener = asyncio.create_task(self._listen(get_timestamp()))
+
+    async def _listen(self, since: int):
+        filters = Filters(
+            kinds=[NWC_RESPONSE_KIND, *NWC_NOTIFICATION_KINDS],
+            authors=[self.nwc_info["wallet_pubkey"]],
+            pubkey_refs=[self.nwc_info["app_pubkey"]],
+            since=since,
+        )
+        initial_backoff = 0.5
+        max_backoff = 30.0
+        backoff = initial_backoff
+        resubscribe = False
+        while True:
+            subscription = None
+            try:
+                subscription = await self.event_relay.connection.subscribe(filters)
+                logger.debug(f"NWC subscribed on {self.event_relay.relay} since {filters.since}")
+                self._subscribed.set()
+                backoff = initial_backoff
+                # Notifications are not stored by relays, so any sent while disconnected are gone
+                if resubscribe and self._payment_watcher is not None:
+                    self._payment_watcher.recheck()
+                resubscribe = True
+                await self._consume(subscription, filters)
+            except asyncio.CancelledError:
+                if subscription:
+                    await subscription.close()
+                raise
+            except Exception as e:
+                self._subscribed.clear()
+                logger.warning(f"NWC subscription on {self.event_relay.relay} failed, retrying: {e!s}")
+                jitter = random.uniform(0, backoff * 0.1)
+                await asyncio.sleep(min(max_backoff, backoff) + jitter)
+                backoff = min(max_backoff, backoff * 2)
+
+    async def _consume(self, subscription: Subscription, filters: Filters):
+        """Route wallet responses and notifications until the subscription fails."""
+        while True:
+            kind, payload = await subscription.recv()
+            if kind == "CLOSED":
+                raise ConnectionError(f"Subscription closed by relay: {payload}")
+            if kind != "EVENT":
+                continue
+            event = Event.from_dict(payload)
+            filters.since = max(filters.since, event.created_at)
+            if event.kind in NWC_NOTIFICATION_KINDS:
+                if self._payment_watcher is not None:
+                    await self._payment_watcher._handle_notification(event)
+            else:
+                await self._handle_response(event)
+
+    async def _handle_response(self, event: Event):
+        for (event_ref, *_) in event.get_tag_list("e"):
+            future = self._pending.pop(event_ref, None)
+            if future is None or future.done():
+                continue
+            try:
+                response = json.loads(await self.decrypt(event.content))
+            except Exception as e:
+                response = e
+            if future.done():
+                return
+            if isinstance(response, Exception):
+                future.set_exception(response)
+            else:
+                future.set_result(response)
+            return
+
+    async def _request(self, method: str, params: dict | None = None, timeout: float | None = None) -> dict | None:
+        """Send a wallet request and wait for its response.
+
+        Args:
+            method: NIP-47 method name.
+            params: Method parameters (omitted if None).
+            timeout: Seconds to wait for the response (defaults to `request_timeout`).
+
+        Returns:
+            The decrypted response, or None if the wallet did not respond in time.
+        """
+        timeout = timeout or self.request_timeout
+        self.start()
+        msg = {"method": method}
+        if params is not None:
+            msg["params"] = params
+        event, = await self.crypto.encrypt_and_sign(
+            self.nwc_info["app_privkey"], [(self.nwc_info["wallet_pubkey"], json.dumps(msg))], kind=NWC_REQUEST_KIND,
+        )
+        future = self._loop.create_future()
+        self._pending[event.id] = future
+
+        async def send_and_wait() -> dict:
+            # Responses are ephemeral, so the subscription must be open before the request goes out
+            await self._subscribed.wait()
+            await self.event_relay.send_event(event)
+            return await future
+
+        try:
+            return await asyncio.wait_for(send_and_wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"No response from wallet for {method} within {timeout}s")
+            return None
+        finally:
+            self._pending.pop(event.id, None)
+
+    async def close(self):
+        """Stop the shared subscription and the payment watcher."""
+        if self._payment_watcher is not None:
+            await self._payment_watcher.close()
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
 
     async def get_response(self, event_id: str) -> Event | None:
-        """Get response for a specific event ID."""
+        """Get response for a specific event ID.
+
+        .. deprecated::
+            Wallet responses are routed to their requests by the shared subscription,
+            which also consumes them, so this is no longer needed.
+        """
+        warnings.warn("NWCRelay.get_response is deprecated, wallet methods return their responses",
+                      DeprecationWarning, stacklevel=2)
         filters = Filters(
             event_refs=[event_id],
             pubkey_refs=[self.nwc_info["app_pubkey"]],
-            kinds=[23195],
+            kinds=[NWC_RESPONSE_KIND],
             limit=1,
         )
-        for _ in range(10):
-            event = asyncio.create_task(self.event_relay.get_event(filters=filters, timeout=10, close_on_eose=False))
-            event = await event
-            if event:
-                return event
-            await asyncio.sleep(0)
-        return None
-
-    async def make_invoice(self, amount: int, description: str, expires_in: int = 900) -> Event | None:
+        return await self.event_relay.get_event(filters=filters, timeout=10, close_on_eose=False)
+
+    async def make_invoice(self, amount: int, description: str, expires_in: int = 900) -> str | None:
         """Generate a new payment request.
 
         Returns:
-            Dictionary containing invoice details
+            The BOLT11 invoice, or None if the wallet did not respond.
         """
-        msg = json.dumps({
-            "method": "make_invoice",
-            "params": {
-                "amount": amount * 1000,
-                "description": description,
-                "expiry": expires_in,
-            } if amount else {
-                "description": description,
-                "expiry": expires_in,
-            },
-        })
-        emsg = encrypt(self.nwc_info["app_privkey"], self.nwc_info["wallet_pubkey"], msg)
-        obj = {
-            "kind": 23194,
-            "content": emsg,
-            "tags": [["p", self.nwc_info["wallet_pubkey"]]],
-            "created_at": math.floor(time.time()),
-            "pubkey": self.nwc_info["app_pubkey"],
+        params = {
+            "amount": amount * 1000,
+            "description": description,
+            "expiry": expires_in,
+        } if amount else {
+            "description": description,
+            "expiry": expires_in,
         }
-        logger.debug(f"Sending invoice request: {json.dumps(obj)}")
-        event = get_signed_event(obj, self.nwc_info["app_privkey"])
-        # Send event and concurrently wait for response
-        response_task = asyncio.create_task(self.get_response(event.id))
-        await self.event_relay.send_event(event)
-        response = await response_task
-        if response is None:
+        logger.debug(f"Sending invoice request: {json.dumps(params)}")
+        dobj = await self._request("make_invoice", params)
+        if dobj is None:
             return None
-        ersp = response.content
-        drsp = decrypt(self.nwc_info["app_privkey"], self.nwc_info["wallet_pubkey"], ersp)
-        dobj = json.loads(drsp)
         logger.debug(f"Received invoice response: {json.dumps(dobj)}")
         return dobj["result"]["invoice"]
 
@@ -197,30 +338,7 @@ class NWCRelay:
             params["invoice"] = invoice
         if payment_hash is not None:
             params["payment_hash"] = payment_hash
-
-        msg = json.dumps({
-            "method": "lookup_invoice",
-            "params": params,
-        })
-        emsg = encrypt(self.nwc_info["app_privkey"], self.nwc_info["wallet_pubkey"], msg)
-        obj = {
-            "kind": 23194,
-            "content": emsg,
-            "tags": [["p", self.nwc_info["wallet_pubkey"]]],
-            "created_at": math.floor(time.time()),
-            "pubkey": self.nwc_info["app_pubkey"],
-        }
-        event = get_signed_event(obj, self.nwc_info["app_privkey"])
-        # Send event and concurrently wait for response
-        response_task = asyncio.create_task(self.get_response(event.id))
-        await self.event_relay.send_event(event)
-        response = await response_task
-        if response is None:
-            return None
-        ersp = response.content
-        drsp = decrypt(self.nwc_info["app_privkey"], self.nwc_info["wallet_pubkey"], ersp)
-        dobj = json.loads(drsp)
-        return dobj
+        return await self._request("lookup_invoice", params)
 
     async def did_payment_succeed(self, invoice: str) -> bool:
         """Check if a payment was successful.
@@ -245,164 +363,71 @@ class NWCRelay:
                 raise RuntimeError(f"Amount in invoice [{decoded.amount_msat}] does not match amount provided [{amount}]")
         elif not decoded.amount_msat and not amount:
             raise RuntimeError("No amount provided in invoice and no amount provided to pay")
-        msg = {
-            "method": "pay_invoice",
-            "params": {
-                "invoice": invoice,
-            },
+        params = {
+            "invoice": invoice,
         }
         if amount:
-            msg["params"]["amount"] = amount * 1000
-        msg = json.dumps(msg)
-        emsg = encrypt(self.nwc_info["app_privkey"], self.nwc_info["wallet_pubkey"], msg)
-        obj = {
-            "kind": 23194,
-            "content": emsg,
-            "tags": [["p", self.nwc_info["wallet_pubkey"]]],
-            "created_at": math.floor(time.time()),
-            "pubkey": self.nwc_info["app_pubkey"],
-        }
-        event = get_signed_event(obj, self.nwc_info["app_privkey"])
-        await self.event_relay.send_event(event)
+            params["amount"] = amount * 1000
+        return await self._request("pay_invoice", params)
 
     async def get_info(self) -> dict:
         """Get wallet service information and capabilities."""
-        msg = {
-            "method": "get_info",
-        }
-        msg = json.dumps(msg)
-        emsg = encrypt(self.nwc_info["app_privkey"], self.nwc_info["wallet_pubkey"], msg)
-        obj = {
-            "kind": 23194,
-            "content": emsg,
-            "tags": [["p", self.nwc_info["wallet_pubkey"]]],
-            "created_at": math.floor(time.time()),
-            "pubkey": self.nwc_info["app_pubkey"],
-        }
-        event = get_signed_event(obj, self.nwc_info["app_privkey"])
-        # Send event and concurrently wait for response
-        response_task = asyncio.create_task(self.get_response(event.id))
-        await self.event_relay.send_event(event)
-        response = await response_task
-        if response is None:
-            return None
-        ersp = response.content
-        drsp = decrypt(self.nwc_info["app_privkey"], self.nwc_info["wallet_pubkey"], ersp)
-        dobj = json.loads(drsp)
-        return dobj
+        return await self._request("get_info")
 
     async def list_transactions(self, params: dict | None = None) -> list[dict]:
         """List recent transactions matching the given parameters."""
         if params is None:
             params = {}
-        msg = {
-            "method": "list_transactions",
-            "params": params,
-        }
-        msg = json.dumps(msg)
-        emsg = encrypt(self.nwc_info["app_privkey"], self.nwc_info["wallet_pubkey"], msg)
-        obj = {
-            "kind": 23194,
-            "content": emsg,
-            "tags": [["p", self.nwc_info["wallet_pubkey"]]],
-            "created_at": math.floor(time.time()),
-            "pubkey": self.nwc_info["app_pubkey"],
-        }
-        event = get_signed_event(obj, self.nwc_info["app_privkey"])
-        # Send event and concurrently wait for response
-        response_task = asyncio.create_task(self.get_response(event.id))
-        await self.event_relay.send_event(event)
-        response = await response_task
-        if response is None:
+        dobj = await self._request("list_transactions", params)
+        if dobj is None:
             return None
-        ersp = response.content
-        drsp = decrypt(self.nwc_info["app_privkey"], self.nwc_info["wallet_pubkey"], ersp)
-        dobj = json.loads(drsp)
         return dobj.get("result", {}).get("transactions", [])
 
     async def get_balance(self) -> int | None:
         """Get current wallet balance."""
-        msg = {
-            "method": "get_balance",
-        }
-        msg = json.dumps(msg)
-        emsg = encrypt(self.nwc_info["app_privkey"], self.nwc_info["wallet_pubkey"], msg)
-        obj = {
-            "kind": 23194,
-            "content": emsg,
-            "tags": [["p", self.nwc_info["wallet_pubkey"]]],
-            "created_at": math.floor(time.time()),
-            "pubkey": self.nwc_info["app_pubkey"],
-        }
-        event = get_signed_event(obj, self.nwc_info["app_privkey"])
-        response_task = asyncio.create_task(self.get_response(event.id))
-        await self.event_relay.send_event(event)
-        response = await response_task
-        if response is None:
+        dobj = await self._request("get_balance")
+        if dobj is None:
             return None
-        ersp = response.content
-        drsp = decrypt(self.nwc_info["app_privkey"], self.nwc_info["wallet_pubkey"], ersp)
-        dobj = json.loads(drsp)
         return dobj.get("result", {}).get("balance")
 
     async def wait_for_payment_success(self, invoice: str, timeout: int = 900, interval: int = 2):
         """Wait for payment success for a given invoice.
 
-        This method continuously checks for payment success until either the payment
-        is confirmed or the timeout is reached.
+        Waits on the wallet's :class:`PaymentWatcher`, which is resolved by payment
+        notifications, or by polling when the wallet does not send notifications.
 
         Args:
             invoice (str): The BOLT11 invoice string to listen for.
             timeout (int, optional): Maximum time to wait in seconds (default: 900).
-            interval (int, optional): Time between checks in seconds (default: 2).
+            interval (int, optional): Initial time between checks in seconds when polling (default: 2).
 
         Returns:
             bool: True if payment was successful, False otherwise.
         """
-        start_time = time.time()
-        success = False
-        while True:
-            if await self.did_payment_succeed(invoice):
-                success = True
-                break
-            if time.time() - start_time > timeout:
-                break
-            await asyncio.sleep(interval)
-        if not success:
-            return False
-        return True
+        return await self.payment_watcher.wait(invoice, timeout=timeout, interval=interval)
 
     async def on_payment_success(self, invoice: str, callback=None, unsuccess_callback=None, timeout: int = 900, interval: int = 2):
         """Listen for payment success for a given invoice.
 
-        This method continuously checks for payment success until either the payment
-        is confirmed or the timeout is reached.
+        Waits on the wallet's :class:`PaymentWatcher` until either the payment is
+        confirmed or the timeout is reached.
 
         Args:
             invoice (str): The BOLT11 invoice string to listen for.
             callback (callable, optional): A function to call when payment succeeds.
             unsuccess_callback (callable, optional): A function to call if payment fails.
             timeout (int, optional): Maximum time to wait in seconds (default: 900).
-            interval (int, optional): Time between checks in seconds (default: 2).
+            interval (int, optional): Initial time between checks in seconds when polling (default: 2).
 
         Raises:
             Exception: If the callback function raises an exception.
         """
-        start_time = time.time()
-        success = False
-        while True:
-            if await self.did_payment_succeed(invoice):
-                success = True
-                if callback:
-                    try:
-                        await callback()
-                    except Exception as e:
-                        logger.error(f"Error in callback: {e}", exc_info=True)
-                        raise e
-                break
-            if time.time() - start_time > timeout:
-                break
-            await asyncio.sleep(interval)
-        if not success:
-            if unsuccess_callback:
-                await unsuccess_callback()
+        if await self.wait_for_payment_success(invoice, timeout=timeout, interval=interval):
+            if callback:
+                try:
+                    await callback()
+                except Exception as e:
+                    logger.error(f"Error in callback: {e}", exc_info=True)
+                    raise e
+        elif unsuccess_callback:
+            await unsuccess_callback()
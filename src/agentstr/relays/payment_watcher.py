@@ -0,0 +1,218 @@
+import asyncio
+import contextlib
+import json
+import time
+from typing import TYPE_CHECKING
+
+from bolt11.decode import decode
+from expiringdict import ExpiringDict
+from pynostr.event import Event
+
+from agentstr.logger import get_logger
+
+if TYPE_CHECKING:
+    from agentstr.relays.nwc_relay import NWCRelay
+
+logger = get_logger(__name__)
+
+NWC_NOTIFICATION_KIND = 23196
+# Same notifications, NIP-44 encrypted
+NWC_NIP44_NOTIFICATION_KIND = 23197
+NWC_NOTIFICATION_KINDS = (NWC_NOTIFICATION_KIND, NWC_NIP44_NOTIFICATION_KIND)
+
+
+class PaymentWatcher:
+    """Resolves invoice payment waits for one wallet from its payment notifications.
+
+    The watcher receives NIP-47 ``payment_received`` notifications (NIP-04 encrypted
+    kind 23196 or NIP-44 encrypted kind 23197) through the wallet's shared subscription
+    (see :class:`~agentstr.relays.nwc_relay.NWCRelay`) and resolves every caller waiting
+    on an invoice by its payment hash.
+    If the wallet does not advertise notifications in ``get_info`` (or the check fails),
+    pending invoices are polled instead. NIP-47 has no batch lookup, so each due invoice
+    gets its own ``lookup_invoice`` request; up to `poll_batch_size` of them are sent
+    concurrently, and each invoice backs off from `poll_interval` to `max_poll_interval`
+    while it remains unpaid.
+    Notifications are ephemeral, so one sent while the subscription is reconnecting is
+    lost. Pending invoices are therefore still looked up every `fallback_poll_interval`
+    when notifications are enabled, and all of them at once after a resubscribe.
+
+    Args:
+        nwc_relay: The wallet connection to watch.
+        notifications: Whether the wallet sends notifications (detected with ``get_info`` if None).
+        poll_interval: Initial seconds between lookups of an unpaid invoice when polling.
+        max_poll_interval: Maximum seconds between lookups of an unpaid invoice.
+        poll_batch_size: Maximum number of concurrent ``lookup_invoice`` requests.
+        fallback_poll_interval: Seconds between lookups of an unpaid invoice when notifications are enabled.
+    """
+    def __init__(self, nwc_relay: "NWCRelay", notifications: bool | None = None, poll_interval: float = 2,
+                 max_poll_interval: float = 30, poll_batch_size: int = 20, fallback_poll_interval: float = 60):
+        self.nwc_relay = nwc_relay
+        self.notifications = notifications
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.poll_batch_size = poll_batch_size
+        self.fallback_poll_interval = fallback_poll_interval
+        self._waiters: dict[str, list[asyncio.Future[bool]]] = {}
+        self._invoices: dict[str, str] = {}
+        self._schedule: dict[str, tuple[float, float]] = {}  # payment hash -> (next poll time, interval)
+        self._settled = ExpiringDict(max_len=1000, max_age_seconds=900)
+        self._wakeup: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def started(self) -> bool:
+        return self._loop is asyncio.get_running_loop() and len(self._tasks) > 0
+
+    @property
+    def polling(self) -> bool:
+        """True when pending invoices are being polled because notifications are unavailable."""
+        return self.notifications is not True
+
+    def start(self):
+        """Start the poller (and the wallet subscription) if they are not already running."""
+        if self.started:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._waiters.clear()
+        self._invoices.clear()
+        self._schedule.clear()
+        self._wakeup = asyncio.Event()
+        # Notifications arrive on the wallet's shared subscription
+        self.nwc_relay.start()
+        self._tasks = [asyncio.create_task(self._poll())]
+        if self.notifications is None:
+            self._tasks.append(asyncio.create_task(self._detect_notifications()))
+
+    async def _detect_notifications(self):
+        try:
+            info = await self.nwc_relay.get_info()
+            supported = "payment_received" in ((info or {}).get("result") or {}).get("notifications", [])
+        except Exception as e:
+            logger.warning(f"Could not detect NWC notification support: {e!s}")
+            supported = False
+        if self.notifications is None:
+            self.notifications = supported
+        logger.info(f"NWC payment notifications {'enabled' if self.notifications else 'unavailable, polling'}")
+        self._wakeup.set()
+
+    async def _handle_notification(self, event: Event):
+        try:
+            content = json.loads(await self.nwc_relay.decrypt(event.content,
+                                                              nip44=event.kind == NWC_NIP44_NOTIFICATION_KIND))
+        except Exception as e:
+            logger.warning(f"Could not decrypt NWC notification {event.id[:10]}: {e!s}")
+            return
+        if content.get("notification_type") != "payment_received":
+            return
+        # Receiving a notification proves the wallet supports them
+        self.notifications = True
+        payment_hash = (content.get("notification") or {}).get("payment_hash")
+        if payment_hash:
+            logger.debug(f"Payment notification for {payment_hash}")
+            self._resolve(payment_hash)
+
+    def recheck(self):
+        """Look up every pending invoice now, e.g. after notifications may have been missed."""
+        now = time.monotonic()
+        for payment_hash, (_, interval) in self._schedule.items():
+            self._schedule[payment_hash] = (now, interval)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _resolve(self, payment_hash: str):
+        self._settled[payment_hash] = True
+        self._invoices.pop(payment_hash, None)
+        self._schedule.pop(payment_hash, None)
+        for future in self._waiters.pop(payment_hash, []):
+            if not future.done():
+                future.set_result(True)
+
+    async def _lookup(self, payment_hash: str) -> bool:
+        invoice = self._invoices.get(payment_hash)
+        if invoice is None:
+            return False
+        return bool(await self.nwc_relay.did_payment_succeed(invoice))
+
+    def _reschedule(self, payment_hash: str):
+        if payment_hash not in self._schedule:
+            return
+        _, interval = self._schedule[payment_hash]
+        if self.polling:
+            interval = min(self.max_poll_interval, interval * 1.5)
+        else:
+            # Only a safety net for missed notifications
+            interval = max(interval, self.fallback_poll_interval)
+        self._schedule[payment_hash] = (time.monotonic() + interval, interval)
+
+    async def _poll(self):
+        while True:
+            delay = None
+            if self._schedule:
+                now = time.monotonic()
+                due = sorted((at, h) for h, (at, _) in self._schedule.items() if at <= now)
+                due = [h for _, h in due[:self.poll_batch_size]]
+                if due:
+                    results = await asyncio.gather(*[self._lookup(h) for h in due], return_exceptions=True)
+                    for payment_hash, result in zip(due, results, strict=True):
+                        if isinstance(result, Exception):
+                            logger.warning(f"lookup_invoice failed for {payment_hash}: {result!s}")
+                        if result is True:
+                            self._resolve(payment_hash)
+                        else:
+                            self._reschedule(payment_hash)
+                if self._schedule:
+                    delay = max(0, min(at for at, _ in self._schedule.values()) - time.monotonic())
+            self._wakeup.clear()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+
+    async def wait(self, invoice: str, timeout: float = 900, interval: float | None = None) -> bool:
+        """Wait until `invoice` is paid.
+
+        Args:
+            invoice: The BOLT11 invoice to wait for.
+            timeout: Maximum time to wait in seconds.
+            interval: Initial polling interval for this invoice when polling (defaults to `poll_interval`).
+
+        Returns:
+            True if the invoice was paid, False if the timeout was reached first.
+        """
+        payment_hash = decode(invoice).payment_hash
+        self.start()
+        if payment_hash in self._settled:
+            return True
+        future = self._loop.create_future()
+        self._waiters.setdefault(payment_hash, []).append(future)
+        self._invoices[payment_hash] = invoice
+        if payment_hash not in self._schedule:
+            interval = (interval or self.poll_interval) if self.polling else self.fallback_poll_interval
+            self._schedule[payment_hash] = (time.monotonic() + interval, interval)
+            self._wakeup.set()
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            waiters = self._waiters.get(payment_hash, [])
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self._waiters.pop(payment_hash, None)
+                self._invoices.pop(payment_hash, None)
+                self._schedule.pop(payment_hash, None)
+        # A notification may have been missed (e.g. during a reconnect), so check once more
+        if not self.polling:
+            try:
+                return bool(await self.nwc_relay.did_payment_succeed(invoice))
+            except Exception as e:
+                logger.warning(f"Final lookup_invoice failed for {payment_hash}: {e!s}")
+        return False
+
+    async def close(self):
+        """Stop the poller."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,21 +1,27 @@
 import asyncio
+import contextlib
+import copy
 import json
 import time
 import uuid
 import random
-from collections.abc import Callable
+from collections.abc import AsyncIterator, Awaitable, Callable
 import traceback
+from typing import Any
 
-from expiringdict import ExpiringDict
 from pydantic import BaseModel
-from pynostr.encrypted_dm import EncryptedDirectMessage
 from pynostr.event import Event, EventKind
 from pynostr.filters import Filters
 from pynostr.key import PrivateKey, PublicKey
 from pynostr.utils import get_public_key, get_timestamp
-from websockets.asyncio.client import connect
 
 from agentstr.logger import get_logger
+from agentstr.relays.checkpoint import CheckpointStore
+from agentstr.relays.connection_pool import ConnectionPool, RelayConnection, Subscription, get_default_pool
+from agentstr.relays.crypto import CryptoExecutor, get_default_crypto_executor, nip04_decrypt
+from agentstr.relays.dedup import EventDeduplicator
+from agentstr.relays.relay_health import RelayHealth
+from agentstr.relays.verifier import EventVerifier
 
 logger = get_logger(__name__)
 
@@ -45,19 +51,130 @@ class EventRelay:
         relay: WebSocket URL of the Nostr relay.
         private_key: Private key for signing events.
         public_key: Optional public key (derived from private_key if not provided).
+        pool: Connection pool to share sockets through (defaults to the process-wide pool).
+        verifier: Verifier checking incoming event signatures (optional, no verification if None).
+        crypto: Executor for signing and encryption (defaults to the process-wide thread pool).
+        health: Record of this relay's latency and errors to update (optional).
     """
-    def __init__(self, relay: str, private_key: PrivateKey | None = None, public_key: PublicKey | None = None):
+    def __init__(self, relay: str, private_key: PrivateKey | None = None, public_key: PublicKey | None = None,
+                 pool: ConnectionPool | None = None, verifier: EventVerifier | None = None,
+                 crypto: CryptoExecutor | None = None, health: RelayHealth | None = None):
         self.relay = relay
         self.private_key = private_key
         self.public_key = public_key if public_key else (self.private_key.public_key if self.private_key else None)
+        self.pool = pool or get_default_pool()
+        self.verifier = verifier
+        self.crypto = crypto or get_default_crypto_executor()
+        self.health = health or RelayHealth(relay)
 
+    @property
+    def connection(self) -> RelayConnection:
+        """The pooled connection to this relay."""
+        return self.pool.get(self.relay)
 
-    async def get_events(self, filters: Filters, limit: int = 10, timeout: int = 30, close_on_eose: bool = True) -> list[Event]:
+
+    async def receive(self, subscription: Subscription) -> list[tuple[str, Any]]:
+        """Wait for the next frames on a subscription.
+
+        With a verifier, every frame already buffered is returned at once and events
+        with an invalid id or signature are dropped (this may leave the list empty).
+        Without one, the next frame is returned on its own.
+        """
+        frames = [await subscription.recv()]
+        if self.verifier is None:
+            return frames
+        frames += subscription.drain(self.verifier.batch_size - 1)
+        flags = iter(await self.verifier.verify_many([payload for kind, payload in frames if kind == "EVENT"]))
+        return [(kind, payload) for kind, payload in frames if kind != "EVENT" or next(flags)]
+
+    async def iter_events(self, filters: Filters | list[Filters], limit: int | None = 10, timeout: int = 30,
+                          close_on_eose: bool = True) -> AsyncIterator[Event]:
+        """Yield events matching the given filters from this relay as they arrive.
+
+        The subscription is closed when the generator finishes or is closed early, so
+        use it with :func:`contextlib.aclosing` when breaking out of the loop.
+
+        Args:
+            filters: The filters to apply, or several filters to send in one REQ.
+            limit: Maximum number of events to yield (no limit if None). Defaults to 10,
+                or the limit of a single filter.
+            timeout: Maximum time to wait for events in seconds. Defaults to 30.
+            close_on_eose: Whether to stop after EOSE. Defaults to True.
+        """
+        if isinstance(filters, Filters) and filters.limit:
+            limit = filters.limit
+        logger.debug(f"Filter limit: {limit}")
+        t0 = time.time()
+        timing: dict[str, float] = {}
+        error: Exception | None = None
+        timed_out = False
+        try:
+            subscription = await self.connection.subscribe(filters)
+        except Exception as e:
+            self.health.record_failure(e)
+            raise
+        logger.debug(f"Opened subscription {subscription.sub_id} on {self.relay}")
+        try:
+            events = self._events(subscription, t0, limit, timeout, close_on_eose, timing)
+            async with contextlib.aclosing(events):
+                async for event in events:
+                    yield event
+        except TimeoutError:
+            logger.warning("Timeout in get_events")
+            timed_out = True
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            await subscription.close()
+            self._record_response(timing, error, timed_out, timeout)
+
+    async def _events(self, subscription: Subscription, t0: float, limit: int | None, timeout: float,
+                      close_on_eose: bool, timing: dict[str, float]) -> AsyncIterator[Event]:
+        """Yield events from `subscription` until `limit`, EOSE (if `close_on_eose`) or a CLOSED frame.
+
+        The seconds from `t0` to the first frame and to EOSE are stored in `timing`.
+
+        Raises:
+            TimeoutError: If `timeout` seconds from `t0` pass first.
+        """
+        found = 0
+        while limit is None or found < limit:
+            time_remaining = t0 + timeout - time.time()
+            if time_remaining <= 0:
+                raise TimeoutError()
+            kind, payload = await subscription.recv(timeout=time_remaining)
+            timing.setdefault("first_response", time.time() - t0)
+            if kind == "EVENT":
+                found += 1
+                logger.debug(f"Received message {found} in get_event: {payload}")
+                yield Event.from_dict(payload)
+            elif kind == "EOSE":
+                logger.debug("Received EOSE in get_events")
+                timing["eose"] = time.time() - t0
+                if close_on_eose:
+                    logger.debug("Closing subscription on EOSE.")
+                    return
+            else:
+                logger.warning(f"Subscription closed by relay in get_events: {payload}")
+                return
+
+    def _record_response(self, timing: dict[str, float], error: Exception | None, timed_out: bool, timeout: float):
+        if error is not None:
+            self.health.record_failure(error)
+        elif "first_response" in timing:
+            self.health.record_success(latency=timing["first_response"], eose=timing.get("eose"))
+        elif timed_out:
+            # Silence until the timeout means the relay is unresponsive
+            self.health.record_failure(f"no response within {timeout}s")
+
+    async def get_events(self, filters: Filters | list[Filters], limit: int | None = 10, timeout: int = 30,
+                         close_on_eose: bool = True) -> list[Event]:
         """Fetch events matching the given filters from this relay.
         
         Args:
-            filters: The filters to apply when fetching events.
-            limit: Maximum number of events to return. Defaults to 10.
+            filters: The filters to apply when fetching events, or several filters to send in one REQ.
+            limit: Maximum number of events to return (no limit if None). Defaults to 10.
             timeout: Maximum time to wait for events in seconds. Defaults to 30.
             close_on_eose: Whether to close the subscription after EOSE. Defaults to True.
             
@@ -67,44 +184,7 @@ class EventRelay:
         Note:
             Times out after `timeout` seconds if no matching events are found.
         """
-        limit = filters.limit if filters.limit else limit
-        logger.debug(f"Filter limit: {limit}")
-        subscription = create_subscription(filters)
-        events = []
-        t0 = time.time()
-        time_remaining = timeout
-        logger.debug(f"Connecting to relay: {self.relay}")
-        async with connect(self.relay,) as ws:
-            logger.debug(f"Sending subscription: {json.dumps(subscription)}")
-            await ws.send(json.dumps(subscription))
-            t0 = time.time()
-            found = 0
-            await asyncio.sleep(0)
-            try:
-                while time.time() < t0 + timeout and found < limit:
-                    response = await asyncio.wait_for(ws.recv(), timeout=time_remaining)
-                    response = json.loads(response)
-                    logger.debug(f"Received full message in get_events: {response}")
-                    if (len(response) > 2):
-                        found += 1
-                        logger.debug(f"Received message {found} in get_event: {response[2]}")
-                        events.append(Event.from_dict(response[2]))
-                    else:
-                        if response[0] == "EOSE":
-                            logger.debug("Received EOSE in get_events")
-                            if close_on_eose:
-                                logger.debug("Closing connection on EOSE.")
-                                break
-                        else:
-                            logger.warning(f"Invalid event: {response}")
-                    await asyncio.sleep(0)
-                    time_remaining = t0 + timeout - time.time()
-                    if time_remaining <= 0:
-                        raise TimeoutError()
-            except TimeoutError:
-                logger.warning("Timeout in get_events")
-                pass
-        return events
+        return [event async for event in self.iter_events(filters, limit, timeout, close_on_eose)]
 
     async def get_event(self, filters: Filters, timeout: int = 120, close_on_eose: bool = True) -> Event | None:
         """Get a single event matching the filters or None if not found."""
@@ -114,37 +194,51 @@ class EventRelay:
         else:
             return None
 
-    async def send_event(self, event: Event):
-        """Publish an event to this relay."""
+    async def send_event(self, event: Event) -> tuple[bool, str]:
+        """Publish an event to this relay and return the relay's ``OK`` response."""
         if not event.sig:
-            event.sign(self.private_key.hex())
-        message = event.to_message()
-        async with connect(self.relay) as ws:
-            logger.debug(f"Sending message: {message}")
-            await ws.send(message)
-            response = await ws.recv()
-            logger.debug(f"Received send_event response: {response}")
+            await self.crypto.sign_event(self.private_key.hex(), event)
+        logger.debug(f"Sending message: {event.to_message()}")
+        t0 = time.time()
+        try:
+            response = await self.connection.publish(event)
+        except Exception as e:
+            self.health.record_failure(e)
+            raise
+        # A rejection is still a timely answer, so it counts as a healthy response
+        self.health.record_success(latency=time.time() - t0)
+        logger.debug(f"Received send_event response: {response}")
+        return response
 
     def decrypt_message(self, event: Event) -> DecryptedMessage | None:
         if event and event.has_pubkey_ref(self.public_key.hex()):
-            rdm = EncryptedDirectMessage.from_event(event)
-            rdm.decrypt(self.private_key.hex(), public_key_hex=event.pubkey)
-            logger.debug(f"New dm received: {event.date_time()} {rdm.cleartext_content}")
+            message = nip04_decrypt(self.private_key.hex(), event.pubkey, event.content)
+            logger.debug(f"New dm received: {event.date_time()} {message}")
             return DecryptedMessage(
                 event=event,
-                message=rdm.cleartext_content,
+                message=message,
             )
         return None
 
+    async def decrypt_messages(self, events: list[Event]) -> list[DecryptedMessage | None]:
+        """Decrypt direct messages addressed to us in one executor round trip.
+
+        Returns:
+            One entry per event, None for events that are not for us or cannot be decrypted.
+        """
+        ours = [event for event in events if event and event.has_pubkey_ref(self.public_key.hex())]
+        messages = await self.crypto.decrypt_many(self.private_key.hex(), [(e.pubkey, e.content) for e in ours])
+        decrypted = {event.id: DecryptedMessage(event=event, message=message)
+                     for event, message in zip(ours, messages, strict=True) if message is not None}
+        return [decrypted.get(event.id) if event else None for event in events]
+
     async def send_message(self, message: str | dict, recipient_pubkey: str) -> Event:
         recipient = get_public_key(recipient_pubkey)
-        dm = EncryptedDirectMessage()
 
         if isinstance(message, dict):
             message = json.dumps(message)
 
-        dm.encrypt(self.private_key.hex(), cleartext_content=message, recipient_pubkey=recipient.hex())
-        dm_event = dm.to_event()
+        dm_event, = await self.crypto.encrypt_and_sign(self.private_key.hex(), [(recipient.hex(), message)])
         await self.send_event(dm_event)
         return dm_event
 
@@ -156,7 +250,8 @@ class EventRelay:
                             pubkey_refs=[self.public_key.hex()], since=timestamp or get_timestamp(), limit=1)
         event = await self.get_event(filters, timeout, close_on_eose=False)
         if event:
-            return self.decrypt_message(event)
+            dm, = await self.decrypt_messages([event])
+            return dm
         return None
 
     async def send_receive_message(self, message: str | dict, recipient_pubkey: str, timeout: int = 3) -> DecryptedMessage | None:
@@ -164,85 +259,159 @@ class EventRelay:
         timestamp = dm_event.created_at
         return await self.receive_message(recipient_pubkey, timestamp, timeout)
 
-    async def event_listener(self, filters: Filters, callback: Callable[[Event], None], event_cache: ExpiringDict, lock: asyncio.Lock):
-        """Continuously listen for events matching filters and call the callback for each one."""
-        subscription = create_subscription(filters)
-        logger.debug(f"Sending note subscription: {json.dumps(subscription)}")
+    async def _event_batches(self, subscription: Subscription):
+        """Yield lists of events received on `subscription`.
+
+        Stored events are held back until EOSE and yielded as one batch, oldest first,
+        so a replay after downtime is handled in order. Live events follow as they arrive.
+        """
+        stored: list[Event] | None = []
+        while True:
+            events = []
+            for kind, payload in await self.receive(subscription):
+                if kind == "CLOSED":
+                    raise ConnectionError(f"Subscription closed by relay: {payload}")
+                if kind == "EVENT":
+                    (stored if stored is not None else events).append(Event.from_dict(payload))
+                elif kind == "EOSE" and stored is not None:
+                    if stored:
+                        logger.debug(f"Replaying {len(stored)} stored event(s) from {self.relay}")
+                    events, stored = sorted(stored, key=lambda e: e.created_at), None
+            if events:
+                yield events
+
+    def _resume_filters(self, filters: Filters, checkpoint: CheckpointStore | None) -> Filters:
+        # Each relay advances its own window, so the caller's filters are not shared
+        filters = copy.deepcopy(filters)
+        since = checkpoint.since(self.relay) if checkpoint is not None else None
+        if since is not None:
+            filters.since = since
+            # Replay everything missed rather than only the newest few events
+            filters.limit = None
+        return filters
+
+    async def _handle(self, listener: str, event: Event, callback: Callable[..., Awaitable[Any]], *args: Any,
+                      checkpoint: CheckpointStore | None = None):
+        """Run `callback(*args)` for `event` and acknowledge the event in `checkpoint`.
+
+        A callback that hands the event to a worker can return an :class:`asyncio.Future`
+        (such as the one from :meth:`KeyedDispatcher.submit`); the event is then only
+        acknowledged once that future completes.
+        """
+        if checkpoint is not None:
+            checkpoint.begin(self.relay, event)
+        result = None
+        try:
+            result = await callback(*args)
+        except Exception as e:
+            logger.error(f"Error in {listener} callback: {e}")
+            logger.error(traceback.format_exc())
+        if checkpoint is None:
+            return
+        if isinstance(result, asyncio.Future):
+            def acknowledge(future: asyncio.Future):
+                if not future.cancelled():
+                    checkpoint.mark_processed(self.relay, event)
+            result.add_done_callback(acknowledge)
+        else:
+            checkpoint.mark_processed(self.relay, event)
+
+    async def event_listener(self, filters: Filters, callback: Callable[[Event], Awaitable[Any]],
+                             dedup: EventDeduplicator | None = None, checkpoint: CheckpointStore | None = None):
+        """Continuously listen for events matching filters and call the callback for each one.
+
+        Args:
+            filters: Filters for the subscription.
+            callback: Coroutine function called with each new event. It may return a future
+                that completes once the event is handled, which delays the checkpoint.
+            dedup: Deduplicator shared with listeners on other relays (a private one if None).
+            checkpoint: Loaded checkpoint store to resume from and record progress in (optional).
+        """
+        if dedup is None:
+            dedup = checkpoint.dedup if checkpoint is not None else EventDeduplicator()
+        filters = self._resume_filters(filters, checkpoint)
         latest_timestamp = filters.since or get_timestamp()
         while True:
+            subscription = None
             try:
-                async with connect(self.relay) as ws:
-                    await ws.send(json.dumps(subscription))
-                    while True:
-                        response = await ws.recv()
-                        response = json.loads(response)
-                        if (len(response) > 2):
-                            event = Event.from_dict(response[2])
-                            logger.debug(f"Checking lock with event id: {event.id}")
-                            latest_timestamp = event.created_at
-                            async with lock:
-                                if event.id in event_cache:
-                                    continue
-                                event_cache[event.id] = True
-                            logger.info(f"Event listener received event {event.id[:10]}: {event.content}")
-                            try:
-                                await callback(event)
-                            except Exception as e:
-                                logger.error(f"Error in event_listener callback: {e}")
-                                logger.error(traceback.format_exc())
-                        await asyncio.sleep(0)
+                subscription = await self.connection.subscribe(filters)
+                logger.debug(f"Opened note subscription {subscription.sub_id} on {self.relay}")
+                async for events in self._event_batches(subscription):
+                    for event in events:
+                        latest_timestamp = max(latest_timestamp, event.created_at)
+                        if dedup.seen(event.id):
+                            if checkpoint is not None:
+                                checkpoint.skip(self.relay, event)
+                            continue
+                        logger.info(f"Event listener received event {event.id[:10]}: {event.content}")
+                        await self._handle("event_listener", event, callback, event, checkpoint=checkpoint)
+            except asyncio.CancelledError:
+                if subscription:
+                    await subscription.close()
+                raise
             except Exception as e:
                 logger.warning(f"Connection closed in event_listener at {int(time.time())} trying again: {e}")
-                filters.since = latest_timestamp + 1
-                subscription = create_subscription(filters)
-                logger.debug(f"Sending event subscription: {json.dumps(subscription)}")
+                # Resume from the same second; events already handled are deduplicated
+                filters.since = latest_timestamp
                 await asyncio.sleep(0)
 
-    async def direct_message_listener(self, filters: Filters, callback: Callable[[Event, str], None], event_cache: ExpiringDict, lock: asyncio.Lock):
-        """Listen for direct messages and call the callback with decrypted content."""
-        subscription = create_subscription(filters)
-        logger.debug(f"Sending DM subscription: {json.dumps(subscription)}")
+    async def _handle_direct_messages(self, events: list[Event], callback: Callable[[Event, str], Awaitable[Any]],
+                                      dedup: EventDeduplicator, checkpoint: CheckpointStore | None):
+        """Decrypt the events not seen before and pass each message to `callback`."""
+        fresh = []
+        for event in events:
+            if not dedup.seen(event.id):
+                fresh.append(event)
+            elif checkpoint is not None:
+                checkpoint.skip(self.relay, event)
+        for event, dm in zip(fresh, await self.decrypt_messages(fresh), strict=True):
+            if dm:
+                logger.info(f"Listener received DM from {event.pubkey[:10]}: {dm.message}")
+                await self._handle("direct_message_listener", event, callback, dm.event, dm.message,
+                                   checkpoint=checkpoint)
+            elif checkpoint is not None:
+                checkpoint.mark_processed(self.relay, event)
+
+    async def direct_message_listener(self, filters: Filters, callback: Callable[[Event, str], Awaitable[Any]],
+                                      dedup: EventDeduplicator | None = None,
+                                      checkpoint: CheckpointStore | None = None):
+        """Listen for direct messages and call the callback with decrypted content.
+
+        Args:
+            filters: Filters for the subscription.
+            callback: Coroutine function called with each new event and its decrypted message. It may
+                return a future that completes once the message is handled, which delays the checkpoint.
+            dedup: Deduplicator shared with listeners on other relays (a private one if None).
+            checkpoint: Loaded checkpoint store to resume from and record progress in (optional).
+        """
+        if dedup is None:
+            dedup = checkpoint.dedup if checkpoint is not None else EventDeduplicator()
+        filters = self._resume_filters(filters, checkpoint)
         latest_timestamp = filters.since or get_timestamp()
         # Exponential backoff settings for reconnect attempts
         initial_backoff = 0.5
         max_backoff = 30.0
         backoff = initial_backoff
         while True:
+            subscription = None
             try:
-                async with connect(self.relay) as ws:
-                    # Reset backoff on successful (re)connection
-                    backoff = initial_backoff
-                    await ws.send(json.dumps(subscription))
-                    while True:
-                        response = await ws.recv()
-                        response = json.loads(response)
-                        if (len(response) > 2):
-                            logger.debug(f"Received message in direct_message_listener: {response[2]}")
-                            event = Event.from_dict(response[2])
-                            logger.debug(f"Checking lock with event id: {event.id}")
-                            latest_timestamp = event.created_at
-                            async with lock:
-                                if event.id in event_cache:
-                                    continue
-                                event_cache[event.id] = True
-                            dm = self.decrypt_message(event)
-                            if dm:
-                                logger.info(f"Listener received DM from {event.pubkey[:10]}: {dm.message}")
-                                try:
-                                    await callback(dm.event, dm.message)
-                                except Exception as e:
-                                    logger.error(f"Error in direct_message_listener callback: {e}")
-                        await asyncio.sleep(0)
+                subscription = await self.connection.subscribe(filters)
+                logger.debug(f"Opened DM subscription {subscription.sub_id} on {self.relay}")
+                # Reset backoff on successful (re)subscription
+                backoff = initial_backoff
+                async for events in self._event_batches(subscription):
+                    latest_timestamp = max(latest_timestamp, *(event.created_at for event in events))
+                    await self._handle_direct_messages(events, callback, dedup, checkpoint)
             except asyncio.CancelledError:
                 # Allow cooperative cancellation
                 logger.debug("direct_message_listener task cancelled")
+                if subscription:
+                    await subscription.close()
                 raise
             except Exception as e:
                 logger.warning(f"Connection closed in direct_message_listener at {int(time.time())} trying again: {e}")
-                # Move the window forward to avoid re-processing
-                filters.since = latest_timestamp + 1
-                subscription = create_subscription(filters)
-                logger.debug(f"Sending DM subscription: {json.dumps(subscription)}")
+                # Resume from the same second; events already handled are deduplicated
+                filters.since = latest_timestamp
                 # Exponential backoff with jitter
                 jitter = random.uniform(0, backoff * 0.1)
                 sleep_for = min(max_backoff, backoff) + jitter
@@ -0,0 +1,161 @@
+import time
+from typing import Literal
+
+from pydantic import BaseModel
+
+from agentstr.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class RelayHealthStats(BaseModel):
+    """Point-in-time health of one relay."""
+    url: str  #: Relay URL.
+    state: Literal["closed", "open", "half_open"]  #: Circuit breaker state (``open`` means the relay is skipped).
+    score: float  #: Expected seconds per request, penalized by errors (lower is better).
+    latency_ms: float | None  #: Rolling average time to the first response (event or ``OK``).
+    eose_ms: float | None  #: Rolling average time until EOSE.
+    error_rate: float  #: Rolling fraction of requests that failed.
+    requests: int  #: Requests recorded.
+    failures: int  #: Requests that failed.
+    consecutive_failures: int  #: Failures since the last success.
+    retry_in: float | None  #: Seconds until an open circuit lets a probe through.
+
+
+class RelayHealth:
+    """Rolling latency, EOSE time and error rate for one relay, with a circuit breaker.
+
+    Averages are exponentially weighted, so recent requests count most. After
+    `failure_threshold` consecutive failures the circuit opens and the relay is skipped
+    for `reset_timeout` seconds. After that, requests are let through again as probes
+    (half-open): a success closes the circuit, and a failure reopens it for twice as
+    long, up to `max_reset_timeout`.
+
+    Args:
+        url: Relay URL.
+        alpha: Weight of the newest sample in the rolling averages.
+        failure_threshold: Consecutive failures that open the circuit.
+        reset_timeout: Seconds an open circuit waits before probing.
+        max_reset_timeout: Upper bound for the backed-off wait.
+        default_latency: Latency in seconds assumed for a relay with no samples yet.
+    """
+    def __init__(self, url: str, alpha: float = 0.2, failure_threshold: int = 3, reset_timeout: float = 30,
+                 max_reset_timeout: float = 300, default_latency: float = 0.5):
+        self.url = url
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.default_latency = default_latency
+        self.latency: float | None = None
+        self.eose: float | None = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self._opened_at: float | None = None
+        self._open_for = reset_timeout
+
+    def _average(self, current: float | None, sample: float) -> float:
+        return sample if current is None else (1 - self.alpha) * current + self.alpha * sample
+
+    @property
+    def state(self) -> Literal["closed", "open", "half_open"]:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self._opened_at >= self._open_for else "open"
+
+    @property
+    def available(self) -> bool:
+        """False while the circuit is open."""
+        return self.state != "open"
+
+    @property
+    def score(self) -> float:
+        expected = self.eose or self.latency or self.default_latency
+        return expected / max(0.05, 1 - self.error_rate)
+
+    def record_success(self, latency: float | None = None, eose: float | None = None):
+        """Record a successful request.
+
+        Args:
+            latency: Seconds until the relay's first response.
+            eose: Seconds until the relay sent EOSE.
+        """
+        self.requests += 1
+        self.error_rate = self._average(self.error_rate, 0.0)
+        if latency is not None:
+            self.latency = self._average(self.latency, latency)
+        if eose is not None:
+            self.eose = self._average(self.eose, eose)
+        self.consecutive_failures = 0
+        if self._opened_at is not None:
+            logger.info(f"Relay {self.url} recovered, closing circuit")
+            self._opened_at = None
+            self._open_for = self.reset_timeout
+
+    def record_failure(self, error: BaseException | str | None = None):
+        """Record a failed request (connection error, timeout before EOSE, ...)."""
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.error_rate = self._average(self.error_rate, 1.0)
+        if self.state == "half_open":
+            self._open_for = min(self.max_reset_timeout, self._open_for * 2)
+            self._opened_at = time.monotonic()
+            logger.warning(f"Relay {self.url} probe failed, skipping it for {self._open_for:.0f}s: {error!s}")
+        elif self._opened_at is None and self.consecutive_failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            logger.warning(f"Relay {self.url} failed {self.consecutive_failures} times, "
+                           f"skipping it for {self._open_for:.0f}s: {error!s}")
+
+    def stats(self) -> RelayHealthStats:
+        """Return the rolling statistics and circuit state."""
+        retry_in = None
+        if self.state == "open":
+            retry_in = max(0.0, self._opened_at + self._open_for - time.monotonic())
+        return RelayHealthStats(
+            url=self.url,
+            state=self.state,
+            score=self.score,
+            latency_ms=self.latency * 1000 if self.latency is not None else None,
+            eose_ms=self.eose * 1000 if self.eose is not None else None,
+            error_rate=self.error_rate,
+            requests=self.requests,
+            failures=self.failures,
+            consecutive_failures=self.consecutive_failures,
+            retry_in=retry_in,
+        )
+
+
+class RelayHealthTracker:
+    """Health of a set of relays, used to pick which relays a request goes to.
+
+    Keyword arguments are passed to each :class:`RelayHealth`.
+    """
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self._relays: dict[str, RelayHealth] = {}
+
+    def get(self, url: str) -> RelayHealth:
+        """Return the health record for `url`, creating it if needed."""
+        if url not in self._relays:
+            self._relays[url] = RelayHealth(url, **self.kwargs)
+        return self._relays[url]
+
+    def select(self, urls: list[str], n: int | None = None) -> list[str]:
+        """Order relays best first, leaving out those with an open circuit.
+
+        If every circuit is open, all relays are returned (best first) rather than none.
+
+        Args:
+            urls: Candidate relay URLs.
+            n: Maximum number of relays to return (all if None).
+        """
+        ranked = sorted(urls, key=lambda url: self.get(url).score)
+        available = [url for url in ranked if self.get(url).available]
+        return (available or ranked)[:n]
+
+    def stats(self) -> list[RelayHealthStats]:
+        """Return health statistics for every tracked relay, best first."""
+        return sorted((health.stats() for health in self._relays.values()), key=lambda s: s.score)
@@ -1,20 +1,134 @@
 import asyncio
+import contextlib
+import copy
 import json
 import time
-from collections.abc import Callable
+from collections.abc import AsyncIterator, Callable
+from typing import Literal
 
-from expiringdict import ExpiringDict
-from pynostr.encrypted_dm import EncryptedDirectMessage
-from pynostr.event import Event
+from pynostr.event import Event, EventKind
 from pynostr.filters import Filters
 from pynostr.key import PrivateKey
-from pynostr.utils import get_public_key
+from pynostr.utils import get_public_key, get_timestamp
 
 from agentstr.logger import get_logger
+from agentstr.relays.checkpoint import CheckpointStore
+from agentstr.relays.connection_pool import ConnectionPool
+from agentstr.relays.crypto import CryptoExecutor, get_default_crypto_executor, nip04_decrypt, nip04_encrypt
+from agentstr.relays.dedup import EventDeduplicator
+from agentstr.relays.dm_router import DirectMessageRouter
+from agentstr.relays.event_store import EventStoreStats, ReplaceableEventStore, is_replaceable
 from agentstr.relays.relay import DecryptedMessage, EventRelay
+from agentstr.relays.relay_health import RelayHealthStats, RelayHealthTracker
+from agentstr.relays.verifier import EventVerifier
 
 logger = get_logger(__name__)
 
+#: ``"any"``, ``"all"``, or the number of relays that must accept an event.
+PublishPolicy = Literal["any", "all"] | int
+
+#: ``OK`` message prefixes (NIP-01) worth retrying.
+TRANSIENT_PUBLISH_ERRORS = ("rate-limited:", "error:")
+
+
+def required_relays(policy: PublishPolicy, relays: int) -> int:
+    """Return how many of `relays` relays must accept an event under `policy`."""
+    if policy == "all":
+        required = relays
+    elif policy == "any":
+        required = 1
+    else:
+        required = max(1, int(policy))
+    return min(required, relays)
+
+
+class _RelayFanOut:
+    """Streams :meth:`EventRelay.iter_events` from relays, best first, into one queue.
+
+    A relay is added whenever one fails or finishes, or when no relay has answered
+    within `hedge_delay` seconds, until every candidate has been asked.
+    """
+    def __init__(self, candidates: list[EventRelay], filters: Filters, limit: int, timeout: int,
+                 close_on_eose: bool, hedge_delay: float, eose_quorum: int | None):
+        self.candidates = candidates
+        self.filters = filters
+        self.limit = limit
+        self.timeout = timeout
+        self.close_on_eose = close_on_eose
+        self.hedge_delay = hedge_delay
+        self.eose_quorum = eose_quorum
+        self.queue: asyncio.Queue[tuple[EventRelay, Event | None, Exception | None]] = asyncio.Queue()
+        self.producers: list[asyncio.Task] = []
+        self.finished = 0
+        self.failures = 0
+        self.last_exc: Exception | None = None
+        self.quorum_reached = False
+
+    @property
+    def can_hedge(self) -> bool:
+        return len(self.producers) < len(self.candidates)
+
+    @property
+    def running(self) -> bool:
+        """Whether more events may still arrive."""
+        return self.finished < len(self.producers) and not self.quorum_reached
+
+    @property
+    def all_failed(self) -> bool:
+        return self.last_exc is not None and self.failures == len(self.producers)
+
+    def start(self, count: int):
+        for _ in range(count):
+            self.launch()
+
+    def launch(self):
+        self.producers.append(asyncio.create_task(self._produce(self.candidates[len(self.producers)])))
+
+    async def _produce(self, relay: EventRelay):
+        try:
+            events = relay.iter_events(self.filters, self.limit, self.timeout, self.close_on_eose)
+            async with contextlib.aclosing(events):
+                async for event in events:
+                    self.queue.put_nowait((relay, event, None))
+        except Exception as e:
+            self.queue.put_nowait((relay, None, e))
+        else:
+            self.queue.put_nowait((relay, None, None))
+
+    async def next_event(self, remaining: float) -> Event | None:
+        """Wait up to `remaining` seconds for the next event (None if a relay finished or nothing came)."""
+        hedge = self.can_hedge
+        try:
+            _, event, error = await asyncio.wait_for(
+                self.queue.get(), timeout=min(remaining, self.hedge_delay) if hedge else remaining)
+        except asyncio.TimeoutError:
+            if hedge:
+                # Nobody answered in time: hedge with the next best relay
+                logger.debug(f"get_events: hedging after {self.hedge_delay}s")
+                self.launch()
+            return None
+        if event is None:
+            self._finish(error)
+        return event
+
+    def _finish(self, error: Exception | None):
+        self.finished += 1
+        if error is not None:
+            logger.warning(f"get_events: relay task failed: {error!s}")
+            self.failures += 1
+            self.last_exc = error
+        if self.eose_quorum is not None and self.finished - self.failures >= self.eose_quorum:
+            self.quorum_reached = True
+        elif self.can_hedge:
+            # Too few events so far: ask another relay
+            self.launch()
+
+    async def close(self):
+        """Cancel the relays still streaming."""
+        for task in self.producers:
+            task.cancel()
+        await asyncio.gather(*self.producers, return_exceptions=True)
+
 
 class RelayManager:
     """Manages connections to multiple Nostr relays and handles message passing.
@@ -22,12 +136,42 @@ class RelayManager:
     Args:
         relays: List of relay URLs to connect to.
         private_key: Optional private key for signing events.
+        pool: Connection pool shared by the relays (defaults to the process-wide pool).
+        verifier: Verifier checking incoming event signatures (optional, no verification if None).
+        crypto: Executor for signing and encryption (defaults to the process-wide thread pool).
+        health: Tracker of relay latency, errors and circuit breakers (a private one if None).
+        read_relays: Number of relays a read is sent to at first, best first (all healthy relays if None).
+        hedge_delay: Seconds a read waits for an answer before also asking the next best relay.
+        publish_policy: How many relays must accept an event before a publish returns:
+            ``"any"``, ``"all"`` or a number. The rest finish in the background.
+        publish_retries: Retries per relay after a transient publish failure.
+        event_store: Cache of replaceable events such as profiles and follow lists
+            (an in-memory one if None).
     """
-    def __init__(self, relays: list[str], private_key: PrivateKey | None = None):
+    def __init__(self, relays: list[str], private_key: PrivateKey | None = None, pool: ConnectionPool | None = None,
+                 verifier: EventVerifier | None = None, crypto: CryptoExecutor | None = None,
+                 health: RelayHealthTracker | None = None, read_relays: int | None = None, hedge_delay: float = 0.5,
+                 publish_policy: PublishPolicy = "any", publish_retries: int = 2,
+                 event_store: ReplaceableEventStore | None = None):
         logger.debug(f"Initializing RelayManager with {len(relays)} relays")
         self._relays = relays
         self.private_key = private_key
         self.public_key = self.private_key.public_key if self.private_key else None
+        self.pool = pool
+        self.verifier = verifier
+        self.crypto = crypto or get_default_crypto_executor()
+        self.health = health or RelayHealthTracker()
+        self.read_relays = read_relays
+        self.hedge_delay = hedge_delay
+        self.publish_policy = publish_policy
+        self.publish_retries = publish_retries
+        self.event_store = event_store or ReplaceableEventStore()
+        self._store_refresh: asyncio.Task | None = None
+        self._background_publishes: set[asyncio.Task] = set()
+        self._event_relays = [EventRelay(relay, self.private_key, self.public_key, pool=self.pool, verifier=verifier,
+                                         crypto=self.crypto, health=self.health.get(relay))
+                              for relay in self._relays]
+        self._dm_router: DirectMessageRouter | None = None
 
     @property
     def relays(self) -> list[EventRelay]:
@@ -36,10 +180,89 @@ class RelayManager:
         Returns:
             A list of EventRelay instances, one for each relay URL.
         """
-        return [EventRelay(relay, self.private_key, self.public_key) for relay in self._relays]
+        return self._event_relays
+
+    @property
+    def dm_router(self) -> DirectMessageRouter:
+        """Router delivering replies from the shared inbound DM subscription."""
+        if self._dm_router is None:
+            self._dm_router = DirectMessageRouter(self.relays, self.public_key, self.decrypt_messages)
+        return self._dm_router
+
+    async def close(self, timeout: float = 10):
+        """Stop background subscriptions owned by this manager.
+
+        Publishes still running in the background are given up to `timeout` seconds to finish.
+        """
+        if self._background_publishes:
+            await asyncio.wait(self._background_publishes, timeout=timeout)
+        if self._dm_router is not None:
+            await self._dm_router.close()
+        if self._store_refresh is not None:
+            self._store_refresh.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._store_refresh
+            self._store_refresh = None
+        await self.event_store.close()
+
+    def _ranked_relays(self) -> list[EventRelay]:
+        """Relays ordered best first, without those whose circuit is open (unless all are)."""
+        by_url = {relay.relay: relay for relay in self.relays}
+        return [by_url[url] for url in self.health.select(list(by_url))]
+
+    def health_stats(self) -> list[RelayHealthStats]:
+        """Return rolling latency, EOSE time, error rate and circuit state for each relay, best first."""
+        return self.health.stats()
+
+    def event_store_stats(self) -> EventStoreStats:
+        """Return size and hit rate of the replaceable event cache."""
+        return self.event_store.stats()
+
+    async def iter_events(self, filters: Filters, limit: int = 10, timeout: int = 30, close_on_eose: bool = True,
+                          eose_quorum: int | None = None) -> AsyncIterator[Event]:
+        """Yield unique events matching the given filters as they arrive from any relay.
+
+        Relays are asked best first. The first `read_relays` are queried at once; another is
+        added whenever one fails or finishes, or when no relay has answered within
+        `hedge_delay` seconds. Relays with an open circuit are skipped. When the stream
+        ends, subscriptions still open on other relays are closed before returning, so
+        use it with :func:`contextlib.aclosing` when breaking out of the loop.
+
+        Args:
+            filters: The filters to apply when fetching events.
+            limit: Maximum number of events to yield. Defaults to 10.
+            timeout: Maximum time to wait for events in seconds. Defaults to 30.
+            close_on_eose: Whether relays stop after EOSE. Defaults to True.
+            eose_quorum: Stop once this many relays have finished (all queried relays if None).
+
+        Raises:
+            RuntimeError: If every relay failed and no events were found.
+        """
+        limit = filters.limit if filters.limit else limit
+        deadline = time.time() + timeout
+        candidates = self._ranked_relays()
+        fan_out = _RelayFanOut(candidates, filters, limit, timeout, close_on_eose, self.hedge_delay, eose_quorum)
+        fan_out.start(len(candidates) if self.read_relays is None else min(self.read_relays, len(candidates)))
+        seen: set[str] = set()
+        try:
+            while len(seen) < limit and fan_out.running:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                event = await fan_out.next_event(remaining)
+                if event is not None and event.id not in seen:
+                    seen.add(event.id)
+                    yield event
+        finally:
+            await fan_out.close()
+        # If every relay task failed and we collected no events, raise an error
+        if not seen and fan_out.all_failed:
+            raise RuntimeError(f"All relays failed in get_events: {fan_out.last_exc!s}")
 
     async def get_events(self, filters: Filters, limit: int = 10, timeout: int = 30, close_on_eose: bool = True) -> list[Event]:
         """Fetch events matching the given filters from connected relays.
+
+        Collects the results of :meth:`iter_events`.
         
         Args:
             filters: The filters to apply when fetching events.
@@ -53,42 +276,79 @@ class RelayManager:
         Note:
             Stops early if enough events are found before the timeout.
         """
-        limit = filters.limit if filters.limit else limit
-        event_id_map = {}
-        result = None
-        t0 = time.time()
-        tasks = []
-        failures = 0
-        last_exc: Exception | None = None
-        for relay in self.relays:
-            tasks.append(asyncio.create_task(relay.get_events(filters, limit, timeout, close_on_eose)))
-        for done in asyncio.as_completed(tasks):
-            try:
-                result = await done
-            except Exception as e:
-                logger.warning(f"get_events: relay task failed: {e!s}")
-                failures += 1
-                last_exc = e
-                continue
-            if result and len(result) >= limit:
-                # Enough results from this relay; we can stop early
-                break
-            if result:
-                for event in result:
-                    if event.id in event_id_map:
-                        continue
-                    event_id_map[event.id] = event
-                    if len(event_id_map) >= limit:
-                        result = list(event_id_map.values())
-                        break
-            if timeout < time.time() - t0:
-                break
-        if not result:
-            result = list(event_id_map.values())
-        # If every relay task failed and we collected no events, raise an error
-        if len(result) == 0 and failures == len(tasks) and last_exc is not None:
-            raise RuntimeError(f"All relays failed in get_events: {last_exc!s}")
-        return result
+        async with contextlib.aclosing(self.iter_events(filters, limit, timeout, close_on_eose)) as events:
+            return [event async for event in events]
+
+    @staticmethod
+    def _split_filter(filters: Filters, max_values: int) -> list[Filters]:
+        """Split a filter whose ``authors`` or ``ids`` list is longer than `max_values`."""
+        for field in ("authors", "ids"):
+            values = getattr(filters, field)
+            if values and len(values) > max_values:
+                chunks = []
+                for i in range(0, len(values), max_values):
+                    chunk = copy.deepcopy(filters)
+                    setattr(chunk, field, values[i:i + max_values])
+                    chunks.extend(RelayManager._split_filter(chunk, max_values))
+                return chunks
+        return [filters]
+
+    async def get_events_batch(self, filters: list[Filters], timeout: int = 30, max_filters_per_req: int = 10,
+                               max_values_per_filter: int = 500, max_concurrent_reqs: int = 8) -> list[list[Event]]:
+        """Fetch events for many filters at once and return them per filter.
+
+        Filters with long ``authors`` or ``ids`` lists are split, and the pieces are packed
+        into REQs of up to `max_filters_per_req` filters each. Every relay receives the
+        same REQs over its shared connection, so fetching profiles for 200 pubkeys takes
+        one round trip per relay instead of 200. Filters with a ``limit`` are sent in a REQ
+        of their own, because some relays apply a REQ's limit across all of its filters.
+        Each event is returned under every filter it matches; each list is newest first
+        and cut to its filter's ``limit``.
+
+        Args:
+            filters: The filters to fetch.
+            timeout: Maximum time to wait for each REQ in seconds.
+            max_filters_per_req: Filters per REQ (a relay's NIP-11 ``max_filters``).
+            max_values_per_filter: Authors or ids per filter before it is split.
+            max_concurrent_reqs: REQs open at once on each relay.
+
+        Returns:
+            One list of unique events per input filter, in the same order.
+        """
+        pieces = [(index, piece) for index, f in enumerate(filters)
+                  for piece in self._split_filter(f, max_values_per_filter)]
+        # Some relays apply one REQ's limit across all of its filters, so limited filters go alone
+        packable = [(index, piece) for index, piece in pieces if not piece.limit]
+        requests = [packable[i:i + max_filters_per_req] for i in range(0, len(packable), max_filters_per_req)]
+        requests += [[(index, piece)] for index, piece in pieces if piece.limit]
+        relays = self._ranked_relays()[:self.read_relays]
+        results: list[dict[str, Event]] = [{} for _ in filters]
+        failures: list[Exception] = []
+
+        async def fetch(relay: EventRelay, request: list[tuple[int, Filters]], semaphore: asyncio.Semaphore):
+            async with semaphore:
+                try:
+                    events = await relay.get_events([piece for _, piece in request], limit=None, timeout=timeout)
+                except Exception as e:
+                    logger.warning(f"get_events_batch: {relay.relay} failed: {e!s}")
+                    failures.append(e)
+                    return
+            indices = {index for index, _ in request}
+            for event in events:
+                for index in indices:
+                    if filters[index].matches(event):
+                        results[index].setdefault(event.id, event)
+
+        semaphores = {relay.relay: asyncio.Semaphore(max_concurrent_reqs) for relay in relays}
+        await asyncio.gather(*[fetch(relay, request, semaphores[relay.relay])
+                               for relay in relays for request in requests])
+        if failures and len(failures) == len(relays) * len(requests):
+            raise RuntimeError(f"All relays failed in get_events_batch: {failures[-1]!s}")
+        batches = []
+        for f, found in zip(filters, results, strict=True):
+            events = sorted(found.values(), key=lambda e: e.created_at, reverse=True)
+            batches.append(events[:f.limit] if f.limit else events)
+        return batches
 
     async def get_event(self, filters: Filters, timeout: int = 120, close_on_eose: bool = True) -> Event | None:
         """Get a single event matching the filters or None if not found."""
@@ -97,35 +357,117 @@ class RelayManager:
             return result[0]
         return None
 
-    async def send_event(self, event: Event) -> Event:
-        """Send an event to all connected relays.
+    async def _publish_to(self, relay: EventRelay, event: Event) -> tuple[bool, str]:
+        """Publish to one relay, retrying transient failures, and return ``(accepted, reason)``."""
+        reason = ""
+        for attempt in range(self.publish_retries + 1):
+            if attempt:
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+            try:
+                accepted, reason = await relay.send_event(event)
+            except Exception as e:
+                reason = f"error: {e!s}"
+                logger.debug(f"Publishing {event.id[:10]} to {relay.relay} failed (attempt {attempt + 1}): {e!s}")
+                continue
+            # Relays answer "duplicate:" when they already have the event
+            if accepted or reason.startswith("duplicate:"):
+                return True, reason
+            if not reason.startswith(TRANSIENT_PUBLISH_ERRORS):
+                break
+            logger.debug(f"Relay {relay.relay} rejected {event.id[:10]} (attempt {attempt + 1}): {reason}")
+        return False, reason
+
+    async def _publish(self, event: Event, policy: PublishPolicy | None = None) -> Event:
+        """Publish an already signed event to the connected relays.
+
+        Returns once the number of relays required by `policy` (default: ``publish_policy``)
+        have accepted the event with an ``OK`` frame; publishes to the other relays continue
+        in the background. Relays whose circuit is open are skipped.
 
-        Ensures a failure on one relay does not fail the whole operation.
+        Raises:
+            RuntimeError: If too few relays accepted the event.
         """
-        tasks = []
-        event.created_at = int(time.time())
-        event.compute_id()
-        event.sign(self.private_key.hex())
-        for relay in self.relays:
-            tasks.append(asyncio.create_task(relay.send_event(event)))
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        exceptions = [r for r in results if isinstance(r, Exception)]
-        for r in exceptions:
-            logger.warning(f"send_event: relay task failed: {r!s}")
-        if len(exceptions) == len(results) and len(results) > 0:
-            raise RuntimeError(f"All relays failed to send event {event.id[:10]}: {exceptions[-1]!s}")
+        relays = self._ranked_relays()
+        required = required_relays(policy or self.publish_policy, len(relays))
+        tasks = {}
+        for relay in relays:
+            logger.debug(f"Queueing event for relay: {relay.relay}")
+            tasks[asyncio.create_task(self._publish_to(relay, event))] = relay.relay
+        accepted, failures, pending = await self._await_quorum(tasks, required)
+        for task in pending:
+            self._background_publishes.add(task)
+            task.add_done_callback(self._publish_finished(event, tasks[task]))
+        if accepted < required:
+            raise RuntimeError(f"Event {event.id[:10]} accepted by {accepted} of {required} required relays: "
+                               f"{'; '.join(failures)}")
+        if is_replaceable(event.kind):
+            self.event_store.put(event)
         return event
 
+    @staticmethod
+    async def _await_quorum(tasks: dict[asyncio.Task, str],
+                            required: int) -> tuple[int, list[str], set[asyncio.Task]]:
+        """Wait for publish `tasks` until `required` succeed or that can no longer happen.
+
+        Returns:
+            The number of relays that accepted, the failures seen and the tasks still running.
+        """
+        pending = set(tasks)
+        accepted = 0
+        failures = []
+        try:
+            while pending and accepted < required and accepted + len(pending) >= required:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    ok, reason = task.result()
+                    if ok:
+                        accepted += 1
+                    else:
+                        logger.warning(f"Publishing to relay {tasks[task]} failed: {reason}")
+                        failures.append(f"{tasks[task]}: {reason}")
+        except asyncio.CancelledError:
+            for task in pending:
+                task.cancel()
+            raise
+        return accepted, failures, pending
+
+    def _publish_finished(self, event: Event, url: str) -> Callable[[asyncio.Task], None]:
+        def callback(task: asyncio.Task):
+            self._background_publishes.discard(task)
+            if not task.cancelled() and not task.result()[0]:
+                logger.warning(f"Background publish of {event.id[:10]} to {url} failed: {task.result()[1]}")
+        return callback
+
+    async def send_event(self, event: Event, policy: PublishPolicy | None = None) -> Event:
+        """Sign and send an event to all connected relays.
+
+        Args:
+            event: The event to send.
+            policy: Overrides ``publish_policy`` for this event.
+
+        Raises:
+            RuntimeError: If too few relays accepted the event.
+        """
+        event.created_at = int(time.time())
+        await self.crypto.sign_event(self.private_key.hex(), event)
+        return await self._publish(event, policy)
+
     def encrypt_message(self, message: str | dict, recipient_pubkey: str, tags: dict[str, str] | None = None) -> Event:
-        """Encrypt a message for the recipient and prepare it as a Nostr event."""
+        """Encrypt a message for the recipient and prepare it as a Nostr event.
+
+        This runs on the calling thread; use :meth:`prepare_messages` from async code.
+        """
         recipient = get_public_key(recipient_pubkey)
-        dm = EncryptedDirectMessage()
 
         if isinstance(message, dict):
             message = json.dumps(message)
 
-        dm.encrypt(self.private_key.hex(), cleartext_content=message, recipient_pubkey=recipient.hex())
-        event = dm.to_event()
+        event = Event(
+            kind=EventKind.ENCRYPTED_DIRECT_MESSAGE,
+            content=nip04_encrypt(self.private_key.hex(), recipient.hex(), message),
+            pubkey=self.public_key.hex(),
+        )
+        event.add_pubkey_ref(recipient.hex())
         event.created_at = int(time.time())
         if tags:
             for tag_key, tag_value in tags.items():
@@ -134,26 +476,51 @@ class RelayManager:
         event.sign(self.private_key.hex())
         return event
 
+    def decrypt_message(self, event: Event) -> DecryptedMessage | None:
+        """Decrypt a direct message addressed to us, or return None if it is not for us."""
+        if event and event.has_pubkey_ref(self.public_key.hex()):
+            message = nip04_decrypt(self.private_key.hex(), event.pubkey, event.content)
+            return DecryptedMessage(event=event, message=message)
+        return None
+
+    async def decrypt_messages(self, events: list[Event]) -> list[DecryptedMessage | None]:
+        """Decrypt direct messages addressed to us in one executor round trip.
+
+        Returns:
+            One entry per event, None for events that are not for us or cannot be decrypted.
+        """
+        ours = [event for event in events if event and event.has_pubkey_ref(self.public_key.hex())]
+        messages = await self.crypto.decrypt_many(self.private_key.hex(), [(e.pubkey, e.content) for e in ours])
+        decrypted = {event.id: DecryptedMessage(event=event, message=message)
+                     for event, message in zip(ours, messages, strict=True) if message is not None}
+        return [decrypted.get(event.id) if event else None for event in events]
+
+    async def prepare_messages(self, messages: list[tuple[str | dict, str, dict[str, str] | None]]) -> list[Event]:
+        """Encrypt and sign direct messages in one executor round trip.
+
+        Args:
+            messages: ``(message, recipient_pubkey, tags)`` for each message.
+
+        Returns:
+            The signed events, in order.
+        """
+        items = []
+        extra_tags = []
+        for message, recipient_pubkey, tags in messages:
+            if isinstance(message, dict):
+                message = json.dumps(message)
+            items.append((get_public_key(recipient_pubkey).hex(), message))
+            extra_tags.append([[key, value] for key, value in (tags or {}).items()])
+        return await self.crypto.encrypt_and_sign(self.private_key.hex(), items, tags=extra_tags)
+
     async def send_message(self, message: str | dict, recipient_pubkey: str, tags: dict[str, str] | None = None) -> Event:
         """Send an encrypted message to a recipient through all connected relays."""
         logger.info(f"Sending message to {recipient_pubkey[:10]}: {message}")
         await asyncio.sleep(0)
         try:
-            event = self.encrypt_message(message, recipient_pubkey, tags=tags)
+            event, = await self.prepare_messages([(message, recipient_pubkey, tags)])
             logger.debug(f"Encrypted message event: {event.id}")
-
-            tasks = []
-            for relay in self.relays:
-                logger.debug(f"Queueing message for relay: {relay.relay}")
-                tasks.append(asyncio.create_task(relay.send_event(event)))
-
-            logger.debug(f"Dispatching message to {len(tasks)} relays")
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            exceptions = [r for r in results if isinstance(r, Exception)]
-            for r in exceptions:
-                logger.warning(f"send_message: relay task failed: {r!s}")
-            if len(exceptions) == len(results) and len(results) > 0:
-                raise RuntimeError(f"All relays failed to send message event {event.id[:10]}: {exceptions[-1]!s}")
+            await self._publish(event)
             logger.info(f"Successfully sent message to {recipient_pubkey[:10]} with event id: {event.id[:10]}")
 
             return event
@@ -162,110 +529,210 @@ class RelayManager:
             logger.error(f"Failed to send message to {recipient_pubkey[:10]}: {e!s}", exc_info=True)
             raise
 
-    async def receive_message(self, author_pubkey: str, timestamp: int | None = None, timeout: int = 30) -> DecryptedMessage | None:
-        """Wait for and return the next message from the specified author."""
-        logger.info(f"Waiting for message from {author_pubkey[:10]}...")
-        logger.debug(f"Timeout: {timeout}s, Timestamp: {timestamp}")
+    async def send_messages(self, messages: list[tuple[str | dict, str, dict[str, str] | None]]) -> list[Event]:
+        """Send many encrypted messages, preparing them all in one executor round trip.
 
-        t0 = time.time()
-        tasks = []
-        failures = 0
-        last_exc: Exception | None = None
-        try:
-            # Start receive tasks for all relays
-            await asyncio.sleep(0.5)
-            for relay in self.relays:
-                logger.debug(f"Starting receive task for relay: {relay.relay}")
-                task = asyncio.create_task(relay.receive_message(author_pubkey, timestamp, timeout))
-                tasks.append(task)
-
-            # Wait for the first successful response
-            for task in asyncio.as_completed(tasks):
-                try:
-                    result = await task
-                except Exception as e:
-                    logger.warning(f"Error in receive task: {e!s}")
-                    # count failure and continue waiting for other relays
-                    failures += 1
-                    last_exc = e
-                    result = None
-
-                if result:
-                    logger.info(f"Received message from {author_pubkey[:10]} with id {result.event.id[:10]}: {result.message}")
-                    # Cancel all other pending tasks
-                    for t in tasks:
-                        if not t.done():
-                            t.cancel()
-                    return result
-
-                # Check timeout
-                if time.time() - t0 > timeout:
-                    logger.warning(f"Receive operation timed out after {timeout} seconds")
-                    break
+        Args:
+            messages: ``(message, recipient_pubkey, tags)`` for each message.
 
-            # If every relay task failed, raise; otherwise it's a timeout/no message
-            if failures == len(tasks) and last_exc is not None:
-                raise RuntimeError(f"All relays failed to receive message: {last_exc!s}")
-            logger.warning("No messages received before timeout")
-            return None
+        Returns:
+            The sent events, in order.
 
-        except Exception as e:
-            logger.error(f"Error in receive_message: {e!s}", exc_info=True)
-            return None
-        finally:
-            # Ensure cleanup of any remaining tasks
-            pending = [t for t in tasks if not t.done()]
-            for t in pending:
-                t.cancel()
-            if pending:
-                await asyncio.gather(*pending, return_exceptions=True)
+        Raises:
+            RuntimeError: If too few relays accepted a message (the others are still sent).
+        """
+        events = await self.prepare_messages(messages)
+        results = await asyncio.gather(*[self._publish(event) for event in events], return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        logger.info(f"Sent {len(events)} messages")
+        return events
+
+    async def receive_message(self, author_pubkey: str, timestamp: int | None = None, timeout: int = 30,
+                              event_ref: str | None = None) -> DecryptedMessage | None:
+        """Wait for and return the next message from the specified author.
+
+        If `event_ref` is given, replies referencing that event id are preferred.
+        """
+        logger.info(f"Waiting for message from {author_pubkey[:10]}...")
+        logger.debug(f"Timeout: {timeout}s, Timestamp: {timestamp}, Event ref: {event_ref}")
+        result = await self.dm_router.receive(get_public_key(author_pubkey).hex(), since=timestamp, timeout=timeout, event_ref=event_ref)
+        if result:
+            logger.info(f"Received message from {author_pubkey[:10]} with id {result.event.id[:10]}: {result.message}")
+        else:
+            logger.warning("No messages received before timeout")
+        return result
 
     async def send_receive_message(self, message: str | dict, recipient_pubkey: str, timeout: int = 3, tags: dict[str, str] | None = None) -> DecryptedMessage | None:
         """Send a message and wait for a response from the recipient.
 
+        Replies referencing the request event with an ``e`` tag are matched to this
+        exchange even when several requests to the same recipient are in flight.
         Returns the first response received within the timeout period.
         """
-        dm_event = await self.send_message(message, recipient_pubkey, tags)
-        timestamp = dm_event.created_at
-        await asyncio.sleep(0)
-        logger.debug(f"Sent receive DM event: {dm_event.to_dict()}")
-        return await self.receive_message(recipient_pubkey, timestamp, timeout)
+        event, = await self.prepare_messages([(message, recipient_pubkey, tags)])
+        # Register for the reply before sending so a fast response cannot be missed
+        pending = self.dm_router.expect(get_public_key(recipient_pubkey).hex(), since=event.created_at, event_ref=event.id)
+        try:
+            logger.info(f"Sending message to {recipient_pubkey[:10]}: {message}")
+            await self._publish(event)
+        except Exception:
+            self.dm_router.discard(pending)
+            raise
+        logger.debug(f"Sent receive DM event: {event.to_dict()}")
+        return await self.dm_router.wait(pending, timeout)
 
-    async def event_listener(self, filters: Filters, callback: Callable[[Event], None]):
+    async def event_listener(self, filters: Filters, callback: Callable[[Event], None],
+                             checkpoint: CheckpointStore | None = None):
         """Start listening for events matching the given filters.
 
         The callback will be called for each matching event.
+
+        Args:
+            filters: Filters for the subscriptions.
+            callback: Coroutine function called with each new event.
+            checkpoint: Store to resume from and record progress in (optional, listens from `filters.since` if None).
         """
-        event_cache = ExpiringDict(max_len=1000, max_age_seconds=900)
-        lock = asyncio.Lock()
+        await self._listen("event_listener", filters, callback, checkpoint)
+
+    async def _listen(self, listener: str, filters: Filters, callback: Callable, checkpoint: CheckpointStore | None):
+        if checkpoint is not None:
+            await checkpoint.load()
+            dedup = checkpoint.dedup
+        else:
+            dedup = EventDeduplicator()
         tasks = []
         for relay in self.relays:
-            tasks.append(asyncio.create_task(relay.event_listener(filters, callback, event_cache, lock)))
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+            tasks.append(asyncio.create_task(getattr(relay, listener)(filters, callback, dedup, checkpoint)))
+        try:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            if checkpoint is not None:
+                await checkpoint.close()
         for r in results:
             if isinstance(r, Exception):
-                logger.warning(f"event_listener: relay task failed: {r!s}")
+                logger.warning(f"{listener}: relay task failed: {r!s}")
 
-    async def direct_message_listener(self, filters: Filters, callback: Callable[[Event, str], None]):
+    async def direct_message_listener(self, filters: Filters, callback: Callable[[Event, str], None],
+                                      checkpoint: CheckpointStore | None = None):
         """Start listening for direct messages.
 
         The callback will be called with each received message and its decrypted content.
+
+        Args:
+            filters: Filters for the subscriptions.
+            callback: Coroutine function called with each new event and its decrypted message.
+            checkpoint: Store to resume from and record progress in (optional, listens from `filters.since` if None).
         """
-        event_cache = ExpiringDict(max_len=1000, max_age_seconds=900)
-        lock = asyncio.Lock()
-        tasks = []
-        for relay in self.relays:
-            tasks.append(asyncio.create_task(relay.direct_message_listener(filters, callback, event_cache, lock)))
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        for r in results:
-            if isinstance(r, Exception):
-                logger.warning(f"direct_message_listener: relay task failed: {r!s}")
+        await self._listen("direct_message_listener", filters, callback, checkpoint)
+
+    async def get_replaceable(self, kind: int, pubkey: str, d: str = "", timeout: int = 30) -> Event | None:
+        """Get the latest replaceable event (profile, follow list, ...) of an author.
+
+        The event is served from :attr:`event_store` when a fresh copy is cached, and
+        fetched from the relays (and cached) otherwise.
+
+        Args:
+            kind: Event kind.
+            pubkey: Author's public key in hex format.
+            d: ``d`` tag, for parameterized replaceable kinds.
+            timeout: Maximum time to wait for the relays in seconds.
+        """
+        await self.event_store.open()
+        self._start_store_refresh()
+        found, event = self.event_store.lookup(kind, pubkey, d)
+        if found:
+            return event
+        filters = Filters(authors=[pubkey], kinds=[kind], limit=1)
+        if d:
+            filters.add_arbitrary_tag("d", [d])
+        event = await self.get_event(filters, timeout=timeout)
+        if event is None:
+            self.event_store.mark_missing(kind, pubkey, d)
+            return None
+        self.event_store.put(event)
+        # A newer copy may have arrived on the live subscription meanwhile
+        return self.event_store.get(kind, pubkey, d) or event
+
+    async def get_replaceable_many(self, kind: int, pubkeys: list[str], timeout: int = 30) -> dict[str, Event]:
+        """Get the latest replaceable event of `kind` for many authors.
+
+        Cached events are returned directly; the rest are fetched with one batched
+        request per relay (see :meth:`get_events_batch`).
+
+        Args:
+            kind: Event kind (not a parameterized one).
+            pubkeys: Authors' public keys in hex format.
+            timeout: Maximum time to wait for the relays in seconds.
+
+        Returns:
+            The latest event found for each author, keyed by public key.
+        """
+        await self.event_store.open()
+        self._start_store_refresh()
+        results: dict[str, Event] = {}
+        misses = []
+        for pubkey in dict.fromkeys(pubkeys):
+            found, event = self.event_store.lookup(kind, pubkey)
+            if not found:
+                misses.append(pubkey)
+            elif event is not None:
+                results[pubkey] = event
+        if misses:
+            events, = await self.get_events_batch([Filters(kinds=[kind], authors=misses)], timeout=timeout)
+            for event in events:
+                self.event_store.put(event)
+            for pubkey in misses:
+                event = self.event_store.get(kind, pubkey)
+                if event is None:
+                    self.event_store.mark_missing(kind, pubkey)
+                else:
+                    results[pubkey] = event
+        return results
+
+    def _start_store_refresh(self):
+        if self.event_store.live_refresh and (self._store_refresh is None or self._store_refresh.done()):
+            self._store_refresh = asyncio.create_task(self._refresh_event_store())
+
+    async def _refresh_event_store(self):
+        """Keep a subscription open for the authors in :attr:`event_store` so their entries stay fresh.
+
+        The subscription is replaced whenever new authors are cached.
+        """
+        store = self.event_store
+
+        async def on_event(event: Event):
+            store.put(event)
+
+        listeners: list[asyncio.Task] = []
+        try:
+            while True:
+                await store.authors_changed.wait()
+                # Let a burst of new authors settle before resubscribing
+                await asyncio.sleep(1)
+                store.authors_changed.clear()
+                authors = store.authors()
+                # Overlap a little with the fetches that cached these authors
+                filters = Filters(kinds=store.kinds, authors=authors, since=get_timestamp() - 60)
+                previous = listeners
+                listeners = [asyncio.create_task(self.event_listener(chunk, on_event))
+                             for chunk in self._split_filter(filters, 500)]
+                for task in previous:
+                    task.cancel()
+                await asyncio.gather(*previous, return_exceptions=True)
+                store.live_authors = set(authors)
+                logger.debug(f"Event store refreshing {len(authors)} authors live")
+        finally:
+            store.live_authors = set()
+            for task in listeners:
+                task.cancel()
+            await asyncio.gather(*listeners, return_exceptions=True)
 
     async def get_following(self, pubkey: str | None = None) -> list[str]:
         """Get the list of public keys that the specified user follows."""
         pubkey = get_public_key(pubkey).hex() if pubkey else self.public_key.hex()
-        filters = Filters(authors=[pubkey], kinds=[3], limit=1)
-        event = await self.get_event(filters)
+        event = await self.get_replaceable(3, pubkey)
         if event:
             return [tag[1] for tag in event.tags if tag[0] == "p"]
         return []
@@ -0,0 +1,83 @@
+import asyncio
+from typing import Any
+
+from pynostr.key import PrivateKey
+
+from agentstr.logger import get_logger
+from agentstr.relays.connection_pool import ConnectionPool
+from agentstr.relays.crypto import CryptoExecutor, get_default_crypto_executor
+from agentstr.relays.nwc_relay import NWCRelay
+from agentstr.relays.relay_manager import RelayManager
+from agentstr.relays.verifier import EventVerifier
+
+logger = get_logger(__name__)
+
+
+class RelaySession:
+    """Long-lived relay state shared by everything a :class:`~agentstr.nostr_client.NostrClient` does.
+
+    The session owns the connection pool, the :class:`RelayManager` (and its relays) and the
+    optional :class:`NWCRelay`, so they are built once instead of on every call. Connections
+    are opened lazily; :meth:`start` opens them up front and :meth:`close` tears them down.
+    It can also be used as an async context manager.
+
+    Args:
+        relays: List of relay URLs to connect to.
+        private_key: Optional private key for signing events.
+        nwc_str: Optional Nostr Wallet Connect string.
+        pool: Connection pool to use (a private pool is created if not provided).
+        verify_signatures: Verify ids and signatures of incoming events off the event loop (default: False).
+        crypto: Executor for signing and encryption (defaults to the process-wide thread pool).
+    """
+    def __init__(self, relays: list[str], private_key: PrivateKey | None = None,
+                 nwc_str: str | None = None, pool: ConnectionPool | None = None, verify_signatures: bool = False,
+                 crypto: CryptoExecutor | None = None):
+        self.pool = pool or ConnectionPool()
+        self.verifier = EventVerifier() if verify_signatures else None
+        self.crypto = crypto or get_default_crypto_executor()
+        self.relay_manager = RelayManager(relays, private_key, pool=self.pool, verifier=self.verifier, crypto=self.crypto)
+        self.nwc_str = nwc_str
+        self._nwc_relay: NWCRelay | None = None
+        self.started = False
+
+    @property
+    def nwc_relay(self) -> NWCRelay | None:
+        """NWCRelay instance if NWC is configured (created on first access)."""
+        if self._nwc_relay is None and self.nwc_str:
+            self._nwc_relay = NWCRelay(self.nwc_str, pool=self.pool, crypto=self.crypto)
+        return self._nwc_relay
+
+    async def start(self) -> "RelaySession":
+        """Open connections to all relays (and the NWC relay, if configured).
+
+        Relays that cannot be reached are logged and retried lazily on next use.
+        """
+        relays = list(self.relay_manager.relays)
+        if self.nwc_relay:
+            relays.append(self.nwc_relay.event_relay)
+        results = await asyncio.gather(*[relay.connection.connect() for relay in relays], return_exceptions=True)
+        for relay, result in zip(relays, results, strict=True):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to connect to {relay.relay}: {result!s}")
+        self.started = True
+        return self
+
+    async def close(self):
+        """Close all connections held by the session."""
+        await self.relay_manager.close()
+        if self._nwc_relay is not None:
+            await self._nwc_relay.close()
+        await self.pool.close()
+        if self.verifier is not None:
+            self.verifier.close()
+        self.started = False
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """Return connection state and counters for each relay, keyed by relay URL."""
+        return {url: connection.stats() for url, connection in self.pool.connections.items()}
+
+    async def __aenter__(self) -> "RelaySession":
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -0,0 +1,121 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Literal
+
+from pydantic import BaseModel
+from pynostr.event import Event
+
+from agentstr.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def verify_event_dicts(events: list[dict[str, Any]]) -> list[bool]:
+    """Check the id and Schnorr signature of each raw event.
+
+    Runs in an executor, so it only takes and returns picklable values.
+
+    Args:
+        events: Events as received from a relay.
+
+    Returns:
+        One flag per event, True if both its id and signature are valid.
+    """
+    results = []
+    for payload in events:
+        try:
+            event = Event.from_dict(payload)
+            results.append(event.verify() and event.id == payload.get("id"))
+        except Exception:
+            results.append(False)
+    return results
+
+
+class VerifierStats(BaseModel):
+    """Point-in-time metrics for an :class:`EventVerifier`."""
+    verified: int  #: Events checked since start.
+    invalid: int  #: Events that failed verification.
+    batches: int  #: Executor round trips made.
+    queue_depth: int  #: Events currently waiting for or undergoing verification.
+    verifications_per_second: float  #: Events checked per second of executor time.
+
+
+class EventVerifier:
+    """Verifies event ids and signatures in batches off the event loop.
+
+    Signature checks are CPU-bound, so they run in a thread pool (the secp256k1 bindings
+    release the GIL) or, with ``executor="process"``, in a process pool. Listeners hand
+    over all frames that are already buffered on a subscription at once, so a burst of
+    events costs one executor round trip instead of one per event.
+
+    Args:
+        executor: ``"thread"`` or ``"process"``.
+        max_workers: Size of the pool (defaults to the executor's default).
+        batch_size: Maximum number of events verified per executor call.
+    """
+    def __init__(self, executor: Literal["thread", "process"] = "thread", max_workers: int | None = None,
+                 batch_size: int = 256):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown executor: {executor}")
+        self.executor = executor
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self._pool: Executor | None = None
+        self._verified = 0
+        self._invalid = 0
+        self._batches = 0
+        self._queued = 0
+        self._busy_seconds = 0.0
+
+    def _executor(self) -> Executor:
+        if self._pool is None:
+            if self.executor == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="agentstr-verify")
+        return self._pool
+
+    async def verify_many(self, events: list[dict[str, Any]]) -> list[bool]:
+        """Verify raw events, returning one validity flag per event in order."""
+        if not events:
+            return []
+        loop = asyncio.get_running_loop()
+        self._queued += len(events)
+        try:
+            chunks = [events[i:i + self.batch_size] for i in range(0, len(events), self.batch_size)]
+            t0 = time.perf_counter()
+            results = await asyncio.gather(*[
+                loop.run_in_executor(self._executor(), verify_event_dicts, chunk) for chunk in chunks
+            ])
+            self._busy_seconds += time.perf_counter() - t0
+        finally:
+            self._queued -= len(events)
+        flags = [flag for chunk in results for flag in chunk]
+        self._batches += len(chunks)
+        self._verified += len(flags)
+        invalid = flags.count(False)
+        if invalid:
+            self._invalid += invalid
+            logger.warning(f"Dropped {invalid} event(s) with an invalid id or signature")
+        return flags
+
+    async def verify(self, event: dict[str, Any]) -> bool:
+        """Verify a single raw event."""
+        return (await self.verify_many([event]))[0]
+
+    def stats(self) -> VerifierStats:
+        """Return verification counts, throughput and queue depth."""
+        return VerifierStats(
+            verified=self._verified,
+            invalid=self._invalid,
+            batches=self._batches,
+            queue_depth=self._queued,
+            verifications_per_second=self._verified / self._busy_seconds if self._busy_seconds else 0.0,
+        )
+
+    def close(self):
+        """Shut down the executor."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from pynostr.event import Event
+from pynostr.key import PrivateKey
+
+from agentstr.agents.nostr_agent import NostrAgent
+from agentstr.agents.nostr_agent_server import NostrAgentServer
+from agentstr.database import Database
+from agentstr.models import AgentCard, ChatOutput
+
+
+class FakeWallet:
+    def __init__(self):
+        self.paid: dict[str, asyncio.Event] = {}
+
+    async def make_invoice(self, amount: int, description: str) -> str:
+        invoice = f"lnbc{amount}n{len(self.paid)}"
+        self.paid[invoice] = asyncio.Event()
+        return invoice
+
+    async def wait_for_payment_success(self, invoice: str, timeout: int = 900, interval: int = 2) -> bool:
+        await self.paid[invoice].wait()
+        return True
+
+
+class FakeClient:
+    def __init__(self):
+        self.private_key = PrivateKey()
+        self.relays = []
+        self.nwc_relay = FakeWallet()
+        self.sent: list[tuple[str, str]] = []
+
+    async def send_direct_message(self, recipient_pubkey: str, message: str, tags=None):
+        self.sent.append((recipient_pubkey, message))
+
+
+@pytest_asyncio.fixture
+async def server():
+    async def reply(chat_input):
+        text = f"hi {chat_input.user_id[:4]}"
+        yield ChatOutput(message=text, content=text, kind="final_response",
+                         thread_id=chat_input.thread_id, user_id=chat_input.user_id)
+
+    db = await Database("sqlite://:memory:").async_init()
+    agent = NostrAgent(AgentCard(name="paid", description="test", satoshis=10), chat_generator=reply)
+    server = NostrAgentServer(agent, nostr_client=FakeClient(), db=db, max_workers=1, resume=False)
+    yield server
+    await server.dispatcher.close(drain=False)
+    for task in server._background_tasks:
+        task.cancel()
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_unpaid_invoices_do_not_hold_workers(server):
+    users = [PrivateKey().public_key.hex() for _ in range(3)]
+    for user in users:
+        await server._dispatch_message(Event(content="hello", pubkey=user), "hello")
+    await asyncio.wait_for(server.dispatcher.join(), timeout=5)
+    # Every user got an invoice although only one worker exists
+    invoices = [message for _, message in server.client.sent]
+    assert len(invoices) == 3 and all("Pay 10 sats" in message for message in invoices)
+    assert len(server._background_tasks) == 3
+
+    server.client.nwc_relay.paid[invoices[1].split()[-1]].set()
+    for _ in range(50):
+        if len(server.client.sent) > 3:
+            break
+        await asyncio.sleep(0.05)
+    assert server.client.sent[3] == (users[1], f"hi {users[1][:4]}")
+    assert len(server._background_tasks) == 2
@@ -0,0 +1,53 @@
+import os
+import pytest
+from dotenv import load_dotenv
+from pynostr.event import Event
+from pynostr.filters import Filters
+from pynostr.key import PrivateKey
+from agentstr.nostr_client import NostrClient
+from agentstr.relays import RelayManager
+
+load_dotenv()
+
+RELAY = os.getenv("NOSTR_RELAYS", "ws://localhost:6969").split(",")[0]
+
+
+def test_split_filter_chunks_long_author_lists():
+    authors = [PrivateKey().public_key.hex() for _ in range(25)]
+    pieces = RelayManager._split_filter(Filters(kinds=[0], authors=authors), 10)
+    assert [len(p.authors) for p in pieces] == [10, 10, 5]
+    assert [a for p in pieces for a in p.authors] == authors
+    assert all(p.kinds == [0] for p in pieces)
+
+
+@pytest.mark.asyncio
+async def test_batch_demultiplexes_results_per_filter():
+    keys = [PrivateKey() for _ in range(12)]
+    for i, key in enumerate(keys):
+        publisher = RelayManager([RELAY], key)
+        await publisher.send_event(Event(kind=1, content=f"post {i}"))
+        await publisher.send_event(Event(kind=1, content=f"post {i} again"))
+    manager = RelayManager([RELAY], PrivateKey())
+    filters = [Filters(kinds=[1], authors=[key.public_key.hex()]) for key in keys]
+    filters.append(Filters(kinds=[1], authors=[key.public_key.hex() for key in keys]))
+    filters.append(Filters(kinds=[1], authors=[keys[0].public_key.hex()], limit=1))
+    subscriptions = manager.relays[0].connection.stats()["subscriptions"]
+    batches = await manager.get_events_batch(filters, max_filters_per_req=5, max_values_per_filter=4)
+    assert len(batches) == 14
+    for key, events in zip(keys, batches):
+        assert len(events) == 2
+        assert {e.pubkey for e in events} == {key.public_key.hex()}
+    assert len(batches[12]) == 24
+    assert len(batches[13]) == 1 and batches[13][0].id in {e.id for e in batches[0]}
+    assert manager.relays[0].connection.stats()["subscriptions"] == subscriptions
+
+
+@pytest.mark.asyncio
+async def test_metadata_for_many_pubkeys():
+    keys = [PrivateKey() for _ in range(3)]
+    for i, key in enumerate(keys):
+        client = NostrClient(relays=[RELAY], private_key=key.bech32())
+        await client.update_metadata(name=f"agent{i}", about=f"about {i}")
+    client = NostrClient(relays=[RELAY])
+    metadata = await client.get_metadata_for_pubkeys([key.public_key.bech32() for key in keys] + [PrivateKey().public_key.hex()])
+    assert {pk: m.name for pk, m in metadata.items()} == {key.public_key.hex(): f"agent{i}" for i, key in enumerate(keys)}
@@ -0,0 +1,135 @@
+import os
+import time
+import asyncio
+import pytest
+import pytest_asyncio
+from dotenv import load_dotenv
+from pynostr.event import Event
+from pynostr.filters import Filters
+from pynostr.key import PrivateKey
+from agentstr.database import Database
+from agentstr.relays import RelayManager
+from agentstr.relays.checkpoint import CheckpointStore
+
+load_dotenv()
+
+RELAY = os.getenv("NOSTR_RELAYS", "ws://localhost:6969").split(",")[0]
+
+
+@pytest_asyncio.fixture
+async def db(tmp_path):
+    database = Database(f"sqlite://{tmp_path / 'checkpoints.db'}", agent_name="test")
+    await database.async_init()
+    yield database
+    await database.close()
+
+
+@pytest.mark.asyncio
+async def test_checkpoints_never_move_backwards(db):
+    await db.save_checkpoints("dm", {"wss://a": 100, "wss://b": 50}, [("e1", 100), ("e2", 50)])
+    await db.save_checkpoints("dm", {"wss://a": 90}, [("e1", 100)])
+    assert await db.get_checkpoints("dm") == {"wss://a": 100, "wss://b": 50}
+    assert await db.get_checkpoints("other") == {}
+    assert sorted(await db.get_processed_event_ids("dm", 50)) == ["e1", "e2"]
+    await db.prune_processed_events("dm", 60)
+    assert await db.get_processed_event_ids("dm", 0) == ["e1"]
+
+
+@pytest.mark.asyncio
+async def test_mark_waits_for_unfinished_events(db):
+    store = CheckpointStore(db, "dm")
+    await store.load()
+    e1, e2, e3, e4 = [Event(content=str(t), created_at=t) for t in (100, 105, 110, 120)]
+    for event in (e1, e2, e3):
+        store.begin("wss://a", event)
+    store.mark_processed("wss://a", e2)
+    store.mark_processed("wss://a", e3)
+    assert store.checkpoints == {"wss://a": 100}
+    store.mark_processed("wss://a", e1)
+    assert store.checkpoints == {"wss://a": 110}
+
+    # A duplicate from another relay waits for the first copy to be handled
+    store.begin("wss://a", e4)
+    store.skip("wss://b", e4)
+    store.mark_processed("wss://b", Event(content="newer", created_at=130))
+    assert store.checkpoints["wss://b"] == 120
+    store.mark_processed("wss://a", e4)
+    assert store.checkpoints == {"wss://a": 120, "wss://b": 130}
+    await store.close()
+    assert await db.get_checkpoints("dm") == {"wss://a": 120, "wss://b": 130}
+
+
+async def listen(manager: RelayManager, store: CheckpointStore, received: list[str]):
+    async def callback(event, message):
+        received.append(message)
+    await manager.direct_message_listener(
+        filters=Filters(kinds=[4], pubkey_refs=[manager.public_key.hex()], since=int(time.time()), limit=1),
+        callback=callback,
+        checkpoint=store,
+    )
+
+
+async def wait_for(received: list[str], count: int, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while len(received) < count and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+
+
+@pytest.mark.asyncio
+async def test_listener_resumes_and_replays_missed_messages(db):
+    sender = RelayManager([RELAY], PrivateKey())
+    key = PrivateKey()
+    receiver = RelayManager([RELAY], key)
+
+    received = []
+    store = CheckpointStore(db, "dm")
+    task = asyncio.create_task(listen(receiver, store, received))
+    await asyncio.sleep(0.3)
+    await sender.send_message("before 1", key.public_key.hex())
+    await sender.send_message("before 2", key.public_key.hex())
+    await wait_for(received, 2)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert received == ["before 1", "before 2"]
+    assert (await db.get_checkpoints("dm"))[RELAY] > 0
+
+    # Sent while the listener is down, in the same second as the last processed message
+    for i in range(3):
+        await sender.send_message(f"missed {i}", key.public_key.hex())
+
+    received = []
+    store = CheckpointStore(db, "dm")
+    task = asyncio.create_task(listen(RelayManager([RELAY], key), store, received))
+    await wait_for(received, 3)
+    await asyncio.sleep(0.3)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert sorted(received) == ["missed 0", "missed 1", "missed 2"]
+
+
+@pytest.mark.asyncio
+async def test_listener_checkpoints_queued_messages_once_handled(db):
+    sender = RelayManager([RELAY], PrivateKey())
+    key = PrivateKey()
+    store = CheckpointStore(db, "dm")
+    queued: list[asyncio.Future] = []
+
+    async def callback(event, message):
+        queued.append(asyncio.get_running_loop().create_future())
+        return queued[-1]
+
+    task = asyncio.create_task(RelayManager([RELAY], key).direct_message_listener(
+        filters=Filters(kinds=[4], pubkey_refs=[key.public_key.hex()], since=int(time.time()), limit=1),
+        callback=callback,
+        checkpoint=store,
+    ))
+    await asyncio.sleep(0.3)
+    await sender.send_message("queued", key.public_key.hex())
+    await wait_for(queued, 1)
+    await asyncio.sleep(0.1)
+    assert RELAY not in store.checkpoints
+    queued[0].set_result(None)
+    await asyncio.sleep(0)
+    assert RELAY in store.checkpoints
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
@@ -19,6 +19,7 @@ def db():
     user.available_balance = 1000
     db.get_user = AsyncMock(return_value=user)
     db.upsert_user = AsyncMock()
+    db.adjust_balance = AsyncMock(return_value=user)
     return db
 
 @pytest_asyncio.fixture
@@ -0,0 +1,117 @@
+import os
+import asyncio
+import pytest
+from dotenv import load_dotenv
+from pynostr.event import Event
+from pynostr.filters import Filters
+from pynostr.key import PrivateKey
+from agentstr.relays.connection_pool import ConnectionPool
+from agentstr.relays.relay import EventRelay
+
+load_dotenv()
+
+RELAY = os.getenv("NOSTR_RELAYS", "ws://localhost:6969").split(",")[0]
+
+
+@pytest.mark.asyncio
+async def test_send_and_get_share_one_socket():
+    pool = ConnectionPool()
+    private_key = PrivateKey()
+    relay = EventRelay(RELAY, private_key, pool=pool)
+    try:
+        event = Event(content="pooled", kind=1)
+        accepted, _ = await relay.send_event(event)
+        assert accepted
+        events = await relay.get_events(Filters(ids=[event.id], limit=1), timeout=5)
+        assert [e.id for e in events] == [event.id]
+        assert pool.get(RELAY).connects == 1
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_subscriptions_multiplexed():
+    pool = ConnectionPool()
+    private_key = PrivateKey()
+    relay = EventRelay(RELAY, private_key, pool=pool)
+    try:
+        sent = []
+        for i in range(5):
+            event = Event(content=f"multiplexed {i}", kind=1)
+            await relay.send_event(event)
+            sent.append(event)
+        results = await asyncio.gather(*[
+            relay.get_events(Filters(ids=[event.id], limit=1), timeout=5) for event in sent
+        ])
+        assert [r[0].id for r in results] == [e.id for e in sent]
+        assert pool.get(RELAY).connects == 1
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_reconnects_after_close():
+    pool = ConnectionPool()
+    relay = EventRelay(RELAY, PrivateKey(), pool=pool)
+    try:
+        await relay.send_event(Event(content="first", kind=1))
+        await pool.get(RELAY).close()
+        accepted, _ = await relay.send_event(Event(content="second", kind=1))
+        assert accepted
+        assert pool.get(RELAY).connects == 2
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_subscribe_during_close_keeps_new_socket():
+    pool = ConnectionPool()
+    connection = pool.get(RELAY)
+    try:
+        await connection.connect()
+        old_ws = connection._ws
+        close_ws = old_ws.close
+
+        async def slow_close():
+            await asyncio.sleep(0.3)
+            await close_ws()
+
+        old_ws.close = slow_close
+        closing = asyncio.create_task(connection.close())
+        await asyncio.sleep(0)
+        await connection.subscribe(Filters(kinds=[1], limit=1))
+        await closing
+        # The old socket's cleanup must not drop the subscription on the new one
+        assert connection.stats()["subscriptions"] == 1
+        assert connection.connects == 2
+    finally:
+        await pool.close()
+
+
+
+def test_connections_from_other_loops_are_released():
+    pool = ConnectionPool()
+
+    async def publish():
+        relay = EventRelay(RELAY, PrivateKey(), pool=pool)
+        accepted, _ = await relay.send_event(Event(content="loop", kind=1))
+        assert accepted
+        connection = pool.get(RELAY)
+        return connection, connection._ws.transport.get_extra_info("socket")
+
+    # asyncio.run() cancels the read loop, which closes the socket
+    first, sock = asyncio.run(publish())
+    assert not first.connected and sock.fileno() == -1
+
+    # A loop left open keeps its read loop; the pool shuts the socket down instead
+    loop = asyncio.new_event_loop()
+    try:
+        second, sock = loop.run_until_complete(publish())
+        third, _ = asyncio.run(publish())
+        assert third is not second and second._ws is None
+        assert sock._sock.recv(1) == b""
+        # Once that loop runs again, its read loop sees the socket closed and exits
+        loop.run_until_complete(asyncio.sleep(0.1))
+        assert all(task.done() for task in asyncio.all_tasks(loop))
+    finally:
+        loop.close()
@@ -0,0 +1,82 @@
+import pytest
+from pynostr.encrypted_dm import EncryptedDirectMessage
+from pynostr.event import Event
+from pynostr.key import PrivateKey
+from agentstr.relays.crypto import (CryptoExecutor, clear_shared_secret_cache, nip04_decrypt, nip04_encrypt,
+                                    nip44_decrypt, nip44_encrypt, shared_secret_cache_info)
+
+
+def test_interoperates_with_pynostr():
+    alice, bob = PrivateKey(), PrivateKey()
+    content = nip04_encrypt(alice.hex(), bob.public_key.hex(), "hi bob")
+    dm = EncryptedDirectMessage()
+    dm.decrypt(bob.hex(), encrypted_message=content, public_key_hex=alice.public_key.hex())
+    assert dm.cleartext_content == "hi bob"
+
+    dm = EncryptedDirectMessage()
+    dm.encrypt(bob.hex(), cleartext_content="hi alice", recipient_pubkey=alice.public_key.hex())
+    assert nip04_decrypt(alice.hex(), bob.public_key.hex(), dm.encrypted_message) == "hi alice"
+
+
+def test_shared_secret_is_cached():
+    clear_shared_secret_cache()
+    alice, bob = PrivateKey(), PrivateKey()
+    for i in range(5):
+        content = nip04_encrypt(alice.hex(), bob.public_key.hex(), f"message {i}")
+        assert nip04_decrypt(alice.hex(), bob.public_key.hex(), content) == f"message {i}"
+    info = shared_secret_cache_info()
+    assert info.misses == 1
+    assert info.hits == 9
+
+
+def test_malformed_content():
+    with pytest.raises(ValueError):
+        nip04_decrypt(PrivateKey().hex(), PrivateKey().public_key.hex(), "not encrypted")
+
+
+def test_nip44_matches_spec_vector():
+    sec1, sec2 = "00" * 31 + "01", "00" * 31 + "02"
+    pub1, pub2 = PrivateKey.from_hex(sec1).public_key.hex(), PrivateKey.from_hex(sec2).public_key.hex()
+    payload = nip44_encrypt(sec1, pub2, "a", nonce=bytes.fromhex("00" * 31 + "01"))
+    assert payload.endswith("ee0G5VSK0/9YypIObAtDKfYEAjD35uVkHyB0F4DwrcNaCXlCWZKaArsGrY6M9wnuTMxWfp1RTN9Xga8no+kF5Vsb")
+    assert nip44_decrypt(sec2, pub1, payload) == "a"
+    message = "x" * 300
+    assert nip44_decrypt(sec2, pub1, nip44_encrypt(sec1, pub2, message)) == message
+    with pytest.raises(ValueError):
+        nip44_decrypt(sec2, pub1, payload[:-4] + "AAAA")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("executor", ["thread", "process"])
+async def test_executor_signs_and_encrypts_in_batches(executor):
+    crypto = CryptoExecutor(executor=executor)
+    sender = PrivateKey()
+    recipients = [PrivateKey() for _ in range(3)]
+    events = await crypto.encrypt_and_sign(
+        sender.hex(),
+        [(r.public_key.hex(), f"hello {i}") for i, r in enumerate(recipients)],
+        tags=[[["e", "ab" * 32]], [], []],
+    )
+    for i, (event, recipient) in enumerate(zip(events, recipients)):
+        assert event.verify()
+        assert event.pubkey == sender.public_key.hex()
+        assert event.get_tag_list("p") == [[recipient.public_key.hex()]]
+        assert await crypto.decrypt(recipient.hex(), sender.public_key.hex(), event.content) == f"hello {i}"
+    assert events[0].has_event_ref("ab" * 32)
+
+    notes = [Event(content=f"note {i}") for i in range(3)]
+    await crypto.sign_events(sender.hex(), notes)
+    assert all(note.verify() for note in notes)
+    crypto.close()
+
+
+@pytest.mark.asyncio
+async def test_executor_decrypt_failures():
+    crypto = CryptoExecutor()
+    alice, bob = PrivateKey(), PrivateKey()
+    content = nip04_encrypt(alice.hex(), bob.public_key.hex(), "secret")
+    results = await crypto.decrypt_many(bob.hex(), [(alice.public_key.hex(), content), (alice.public_key.hex(), "junk")])
+    assert results == ["secret", None]
+    with pytest.raises(ValueError):
+        await crypto.decrypt(bob.hex(), alice.public_key.hex(), "junk")
+    crypto.close()
@@ -1,11 +1,15 @@
+import asyncio
 import pytest
 import pytest_asyncio
 from agentstr.database import Database
 from agentstr.models import User, Message
 
-@pytest_asyncio.fixture
-async def db():
-    database = Database('sqlite://:memory:', agent_name='test')
+@pytest_asyncio.fixture(params=["default", "performance"])
+async def db(request, tmp_path):
+    if request.param == "performance":
+        database = Database(f"sqlite://{tmp_path / 'perf.db'}", agent_name='test', performance=True, read_pool_size=2)
+    else:
+        database = Database('sqlite://:memory:', agent_name='test')
     await database.async_init()
     yield database
     await database.close()
@@ -125,6 +129,39 @@ async def test_get_messages_pagination(db):
     assert single[0].idx == 4
 
 
+@pytest.mark.asyncio
+async def test_history_window_and_thread_info(db, monkeypatch):
+    assert await db.get_thread_info("thread3", "u1") is None
+    for i in range(7):
+        await db.add_message(thread_id="thread3", user_id="u1", role="user", content="x" * 40, kind="request")
+    last = await db.add_message(thread_id="thread3", user_id="u1", role="agent", content="done", kind="final_response")
+
+    info = await db.get_thread_info("thread3", "u1")
+    assert (info.last_idx, info.last_role, info.last_kind) == (7, "agent", "final_response")
+    assert info.last_created_at == last.created_at
+
+    assert [m.idx for m in await db.get_history("thread3", "u1", limit=3)] == [5, 6, 7]
+    assert len(await db.get_history("thread3", "u1")) == 8
+    # "done" costs 2 tokens and each 40 character message 11, paged two at a time
+    monkeypatch.setattr(db, "HISTORY_PAGE_SIZE", 2)
+    assert [m.idx for m in await db.get_history("thread3", "u1", max_tokens=20)] == [6, 7]
+    assert [m.idx for m in await db.get_history("thread3", "u1", max_tokens=24)] == [5, 6, 7]
+    assert [m.idx for m in await db.get_history("thread3", "u1", limit=2, max_tokens=100)] == [6, 7]
+    assert await db.get_history("thread3", "u1", max_tokens=1) == []
+
+
+@pytest.mark.asyncio
+async def test_thread_summary_only_moves_forward(db):
+    assert await db.get_thread_summary("thread4", "u1") is None
+    await db.set_thread_summary("thread4", "u1", "first ten", up_to_idx=9)
+    await db.set_thread_summary("thread4", "u1", "first five", up_to_idx=4)
+    summary = await db.get_thread_summary("thread4", "u1")
+    assert (summary.summary, summary.up_to_idx) == ("first ten", 9)
+    await db.set_thread_summary("thread4", "u1", "first twenty", up_to_idx=19)
+    assert (await db.get_thread_summary("thread4", "u1")).summary == "first twenty"
+    assert await db.get_thread_summary("thread4", "u2") is None
+
+
 @pytest.mark.asyncio
 async def test_current_thread_id_default_none(db):
     user_id = "ctid1"
@@ -162,3 +199,98 @@ async def test_set_current_thread_id_to_none(db):
     assert await db.get_current_thread_id(user_id) == thread_id
     await db.set_current_thread_id(user_id, None)
     assert await db.get_current_thread_id(user_id) is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_appends_get_unique_indices(db):
+    messages = await asyncio.gather(*[
+        db.add_message(thread_id="busy", user_id="u1", role="user", message=str(i)) for i in range(100)
+    ])
+    assert sorted(m.idx for m in messages) == list(range(100))
+    stored = await db.get_messages(thread_id="busy", user_id="u1")
+    assert {m.message: m.idx for m in stored} == {m.message: m.idx for m in messages}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("performance", [False, True])
+async def test_concurrent_appends_from_separate_connections(tmp_path, performance):
+    conn_str = f"sqlite://{tmp_path / 'shared.db'}"
+    databases = [await Database(conn_str, agent_name="test", performance=performance).async_init() for _ in range(3)]
+    try:
+        messages = await asyncio.gather(*[
+            databases[i % 3].add_message(thread_id="busy", user_id=f"u{i % 2}", role="user", message=str(i))
+            for i in range(60)
+        ])
+        assert sorted(m.idx for m in messages) == list(range(60))
+    finally:
+        for database in databases:
+            await database.close()
+
+
+@pytest.mark.asyncio
+async def test_performance_mode_group_commits_and_isolates_failures(tmp_path):
+    db = await Database(f"sqlite://{tmp_path / 'perf.db'}", agent_name="test", performance=True,
+                        pragmas={"cache_size": -2000}).async_init()
+    try:
+        async with db._read() as conn, conn.execute("PRAGMA journal_mode") as cursor:
+            assert (await cursor.fetchone())[0] == "wal"
+        commits = []
+        execute = db.conn.execute
+
+        def tracking_execute(sql, *args):
+            if sql == "COMMIT":
+                commits.append(sql)
+            return execute(sql, *args)
+
+        db.conn.execute = tracking_execute
+
+        async def failing(conn):
+            raise ValueError("bad write")
+
+        results = await asyncio.gather(
+            *[db.add_message(thread_id="t1", user_id="u1", role="user", message=str(i)) for i in range(50)],
+            db._write(failing),
+            db.upsert_user(User(user_id="u1", available_balance=5)),
+            return_exceptions=True,
+        )
+        assert isinstance(results[50], ValueError)
+        assert sorted(m.idx for m in results[:50]) == list(range(50))
+        assert len(commits) < 10
+        assert len(await db.get_messages("t1", "u1")) == 50
+        assert (await db.get_user("u1")).available_balance == 5
+    finally:
+        await db.close()
+
+
+@pytest.mark.asyncio
+async def test_adjust_balance_never_goes_negative(db):
+    assert await db.adjust_balance("payer", -1) is None
+    assert (await db.adjust_balance("payer", 100)).available_balance == 100
+    await db.set_current_thread_id("payer", "t1")
+    results = await asyncio.gather(*[db.adjust_balance("payer", -30) for _ in range(5)],
+                                   db.set_current_thread_id("payer", "t2"))
+    assert [r.available_balance for r in results[:5] if r is not None] == [70, 40, 10]
+    user = await db.get_user("payer")
+    assert (user.available_balance, user.current_thread_id) == (10, "t2")
+
+
+@pytest.mark.asyncio
+async def test_backends_without_checkpoints_or_summaries_still_work():
+    from agentstr.database.base import BaseDatabase
+
+    class MinimalDatabase(BaseDatabase):
+        async def async_init(self): return self
+        async def close(self): pass
+        async def get_user(self, user_id): return User(user_id=user_id)
+        async def upsert_user(self, user): pass
+        async def add_message(self, thread_id, user_id, role, **kwargs): pass
+        async def get_messages(self, thread_id, user_id, **kwargs): return []
+        async def get_current_thread_id(self, user_id): return None
+        async def set_current_thread_id(self, user_id, thread_id): pass
+
+    db = MinimalDatabase("minimal://")
+    await db.save_checkpoints("listener", {"wss://relay": 10}, [("abc", 10)])
+    assert await db.get_checkpoints("listener") == {}
+    assert await db.get_processed_event_ids("listener", 0) == []
+    await db.set_thread_summary("t1", "u1", "summary", 3)
+    assert await db.get_thread_summary("t1", "u1") is None
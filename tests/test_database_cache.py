@@ -0,0 +1,82 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from agentstr.database import Database
+from agentstr.database.cache import CachedDatabase
+from agentstr.models import User
+
+
+@pytest_asyncio.fixture
+async def inner():
+    database = Database('sqlite://:memory:', agent_name='test')
+    await database.async_init()
+    yield database
+    await database.close()
+
+
+def _count_calls(monkeypatch, db, name: str, delay: float = 0) -> list:
+    calls = []
+    original = getattr(db, name)
+
+    async def wrapper(*args, **kwargs):
+        calls.append(args)
+        await asyncio.sleep(delay)
+        return await original(*args, **kwargs)
+
+    monkeypatch.setattr(db, name, wrapper)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_query(inner, monkeypatch):
+    await inner.upsert_user(User(user_id="alice", available_balance=5))
+    cache = CachedDatabase(inner)
+    reads = _count_calls(monkeypatch, inner, "get_user", delay=0.05)
+    users = await asyncio.gather(*[cache.get_user("alice") for _ in range(10)])
+    assert {u.available_balance for u in users} == {5}
+    users[0].available_balance = 999  # callers get copies
+    assert (await cache.get_user("alice")).available_balance == 5
+    assert len(reads) == 1
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_writes_go_through_and_unchanged_threads_are_not_written(inner, monkeypatch):
+    cache = CachedDatabase(inner, ttl=0.2, max_users=2)
+    writes = _count_calls(monkeypatch, inner, "set_current_thread_id")
+    await cache.set_current_thread_id("bob", "t1")
+    assert await cache.get_current_thread_id("bob") == "t1"
+    await cache.set_current_thread_id("bob", "t1")
+    assert len(writes) == 1
+    await cache.upsert_user(User(user_id="bob", available_balance=7, current_thread_id="t2"))
+    assert (await inner.get_user("bob")).available_balance == 7
+    assert (await cache.get_user("bob")).current_thread_id == "t2"
+
+    reads = _count_calls(monkeypatch, inner, "get_user")
+    await cache.get_user("carol")
+    await cache.get_user("dave")
+    assert cache.stats()["users"] == 2
+    await cache.get_user("bob")  # evicted as least recently used
+    await inner.upsert_user(User(user_id="dave", available_balance=3))
+    await asyncio.sleep(0.25)
+    assert (await cache.get_user("dave")).available_balance == 3  # expired
+    assert len(reads) == 4
+
+
+@pytest.mark.asyncio
+async def test_concurrent_deductions_cannot_overspend(tmp_path):
+    inner = Database(f"sqlite://{tmp_path / 'cache.db'}", agent_name='test', performance=True)
+    cache = await CachedDatabase(inner).async_init()
+    await cache.adjust_balance("payer", 100)
+    assert (await cache.get_user("payer")).available_balance == 100
+
+    async def spend():
+        user = await cache.get_user("payer")  # may be stale, the deduction is still checked
+        return await cache.adjust_balance(user.user_id, -15)
+
+    results = await asyncio.gather(*[spend() for _ in range(20)], cache.set_current_thread_id("payer", "t1"))
+    assert len([r for r in results[:20] if r is not None]) == 6
+    user = await cache.get_user("payer")
+    assert (user.available_balance, user.current_thread_id) == (10, "t1")
+    assert (await inner.get_user("payer")).available_balance == 10
+    await cache.close()
@@ -0,0 +1,40 @@
+import os
+
+from agentstr.relays.dedup import EventDeduplicator
+
+
+def _ids(n):
+    return [os.urandom(32).hex() for _ in range(n)]
+
+
+def test_detects_duplicates_beyond_old_cache_size():
+    dedup = EventDeduplicator()
+    ids = _ids(5000)
+    assert not any(dedup.seen(event_id) for event_id in ids)
+    assert all(dedup.seen(event_id) for event_id in ids)
+    stats = dedup.stats()
+    assert stats.checks == 10000
+    assert stats.hits == 5000
+    assert stats.hit_rate == 0.5
+
+
+def test_ids_demoted_to_bloom_filter_are_still_seen():
+    dedup = EventDeduplicator(max_memory_bytes=64 * 1024)
+    ids = _ids(5000)
+    for event_id in ids:
+        dedup.add(event_id)
+    stats = dedup.stats()
+    assert stats.bloom_ids > 0
+    assert stats.exact_ids <= dedup.max_exact_ids
+    assert all(event_id in dedup for event_id in ids)
+    assert sum(event_id in dedup for event_id in _ids(1000)) <= 1
+
+
+def test_oldest_bloom_generation_is_evicted():
+    dedup = EventDeduplicator(max_memory_bytes=16 * 1024)
+    for event_id in _ids(3 * dedup.bloom_capacity + dedup.max_exact_ids):
+        dedup.add(event_id)
+    stats = dedup.stats()
+    assert stats.evictions > 0
+    assert 0 < stats.eviction_rate < 1
+    assert stats.memory_bytes <= dedup.max_memory_bytes
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from agentstr.dispatcher import KeyedDispatcher
+
+
+@pytest.mark.asyncio
+async def test_same_key_runs_in_order():
+    handled = []
+
+    async def handler(key, i):
+        await asyncio.sleep(0.01 * (5 - i))
+        handled.append((key, i))
+
+    dispatcher = KeyedDispatcher(handler, workers=4)
+    for i in range(5):
+        await dispatcher.submit("alice", "alice", i)
+    await dispatcher.close()
+    assert handled == [("alice", i) for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_different_keys_run_in_parallel():
+    running = 0
+    peak = 0
+
+    async def handler(key):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+
+    dispatcher = KeyedDispatcher(handler, workers=3)
+    for key in ["a", "b", "c", "d", "e", "f"]:
+        await dispatcher.submit(key, key)
+    await dispatcher.close()
+    assert peak == 3
+    assert dispatcher.stats().processed == 6
+
+
+@pytest.mark.asyncio
+async def test_submit_blocks_when_queue_full():
+    release = asyncio.Event()
+
+    async def handler():
+        await release.wait()
+
+    dispatcher = KeyedDispatcher(handler, workers=1, max_queue_size=2)
+    await dispatcher.submit("a")
+    await asyncio.sleep(0)  # worker picks up the first item
+    await dispatcher.submit("a")
+    await dispatcher.submit("a")
+    blocked = asyncio.create_task(dispatcher.submit("a"))
+    await asyncio.sleep(0.05)
+    assert not blocked.done()
+    assert dispatcher.stats().queue_depth == 2
+    release.set()
+    await blocked
+    await dispatcher.close()
+    assert dispatcher.stats().processed == 4
+
+
+@pytest.mark.asyncio
+async def test_failures_are_counted_and_do_not_stop_workers():
+    async def handler(fail):
+        if fail:
+            raise RuntimeError("boom")
+
+    dispatcher = KeyedDispatcher(handler, workers=1)
+    await dispatcher.submit("a", fail=True)
+    await dispatcher.submit("a", fail=False)
+    await dispatcher.close()
+    stats = dispatcher.stats()
+    assert stats.failed == 1
+    assert stats.processed == 2
+    assert stats.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_submit_returns_completion_future():
+    release = asyncio.Event()
+
+    async def handler(fail):
+        await release.wait()
+        if fail:
+            raise ValueError("boom")
+
+    dispatcher = KeyedDispatcher(handler, workers=1)
+    first = await dispatcher.submit("a", fail=True)
+    second = await dispatcher.submit("b", fail=False)
+    await asyncio.sleep(0)
+    assert not first.done()
+    release.set()
+    await asyncio.wait_for(asyncio.gather(first, second), timeout=1)
+    # Items never handled are cancelled rather than acknowledged
+    release.clear()
+    await dispatcher.submit("c", fail=False)
+    pending = await dispatcher.submit("c", fail=False)
+    await dispatcher.close(drain=False)
+    assert pending.cancelled()
@@ -0,0 +1,79 @@
+import os
+import time
+import asyncio
+import pytest
+from dotenv import load_dotenv
+from pynostr.filters import Filters
+from pynostr.key import PrivateKey
+from agentstr.relays import RelayManager
+
+load_dotenv()
+
+RELAY = os.getenv("NOSTR_RELAYS", "ws://localhost:6969").split(",")[0]
+
+
+async def echo_responder(manager: RelayManager):
+    async def callback(event, message):
+        await manager.send_message(f"echo: {message}", event.pubkey)
+    await manager.direct_message_listener(
+        filters=Filters(kinds=[4], pubkey_refs=[manager.public_key.hex()], since=int(time.time())),
+        callback=callback,
+    )
+
+
+@pytest.mark.asyncio
+async def test_send_receive_uses_shared_subscription():
+    client = RelayManager([RELAY], PrivateKey())
+    server = RelayManager([RELAY], PrivateKey())
+    responder = asyncio.create_task(echo_responder(server))
+    try:
+        await asyncio.sleep(0.5)
+        for i in range(3):
+            reply = await client.send_receive_message(f"ping {i}", server.public_key.hex(), timeout=5)
+            assert reply.message == f"echo: ping {i}"
+        # One long-lived DM subscription, no per-exchange REQs
+        assert len(client.dm_router._tasks) == 1
+        assert not client.dm_router._waiters
+    finally:
+        responder.cancel()
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_receive_message_claims_buffered_reply():
+    sender = RelayManager([RELAY], PrivateKey())
+    receiver = RelayManager([RELAY], PrivateKey())
+    timestamp = int(time.time())
+    receiver.dm_router.start(timestamp)
+    await asyncio.sleep(0.2)
+    await sender.send_message("early", receiver.public_key.hex())
+    await asyncio.sleep(0.5)
+    dm = await receiver.receive_message(sender.public_key.hex(), timestamp, timeout=5)
+    assert dm.message == "early"
+    # Claimed messages are not delivered twice
+    assert await receiver.receive_message(sender.public_key.hex(), timestamp, timeout=0.5) is None
+    await receiver.close()
+
+
+@pytest.mark.asyncio
+async def test_receive_message_timeout():
+    receiver = RelayManager([RELAY], PrivateKey())
+    t0 = time.time()
+    assert await receiver.receive_message(PrivateKey().public_key.hex(), timeout=1) is None
+    assert time.time() - t0 < 2
+    await receiver.close()
+
+
+@pytest.mark.asyncio
+async def test_send_messages_batch():
+    sender = RelayManager([RELAY], PrivateKey())
+    receivers = [RelayManager([RELAY], PrivateKey()) for _ in range(3)]
+    timestamp = int(time.time())
+    for receiver in receivers:
+        receiver.dm_router.start(timestamp)
+    await asyncio.sleep(0.2)
+    await sender.send_messages([(f"hi {i}", r.public_key.hex(), None) for i, r in enumerate(receivers)])
+    for i, receiver in enumerate(receivers):
+        dm = await receiver.receive_message(sender.public_key.hex(), timestamp, timeout=5)
+        assert dm.message == f"hi {i}"
+        await receiver.close()
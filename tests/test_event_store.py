@@ -0,0 +1,107 @@
+import asyncio
+import os
+import time
+import pytest
+from dotenv import load_dotenv
+from pynostr.event import Event
+from pynostr.key import PrivateKey
+from agentstr.relays import RelayManager
+from agentstr.relays.event_store import ReplaceableEventStore
+
+load_dotenv()
+
+RELAY = os.getenv("NOSTR_RELAYS", "ws://localhost:6969").split(",")[0]
+
+
+def _event(key: PrivateKey, kind: int, content: str, created_at: int, tags: list | None = None) -> Event:
+    event = Event(kind=kind, content=content, tags=tags or [], created_at=created_at)
+    event.sign(key.hex())
+    return event
+
+
+def test_newest_event_wins_and_entries_expire():
+    key = PrivateKey()
+    pubkey = key.public_key.hex()
+    store = ReplaceableEventStore(ttl=0.2, missing_ttl=0.2, max_entries=3)
+    now = int(time.time())
+    assert store.put(_event(key, 0, "new", now))
+    assert not store.put(_event(key, 0, "old", now - 10))
+    assert not store.put(_event(key, 1, "note", now))
+    assert store.get(0, pubkey).content == "new"
+    assert store.put(_event(key, 30078, "a", now, [["d", "a"]]))
+    assert store.put(_event(key, 30078, "b", now, [["d", "b"]]))
+    assert store.get(30078, pubkey, "a").content == "a"
+    store.mark_missing(3, pubkey)
+    assert store.lookup(3, pubkey) == (True, None)
+    # The least recently used entry (the profile) was dropped
+    assert store.lookup(0, pubkey) == (False, None)
+    time.sleep(0.25)
+    assert store.lookup(3, pubkey) == (False, None)
+    assert store.lookup(30078, pubkey, "b") == (False, None)
+    stats = store.stats()
+    assert stats.entries == 3 and stats.hits == 3 and stats.misses == 3
+
+
+def test_evicting_one_key_keeps_author_with_other_keys():
+    key, other = PrivateKey(), PrivateKey()
+    pubkey = key.public_key.hex()
+    store = ReplaceableEventStore(ttl=0.2, max_entries=2)
+    now = int(time.time())
+    assert store.put(_event(key, 0, "profile", now))
+    assert store.put(_event(key, 3, "follows", now))
+    assert store.put(_event(other, 0, "other", now))
+    assert store.authors() == sorted([pubkey, other.public_key.hex()])
+    assert store.put(_event(other, 3, "other follows", now))
+    assert store.authors() == [other.public_key.hex()]
+    # An older event does not extend the cached one's lifetime
+    time.sleep(0.25)
+    assert not store.put(_event(other, 0, "older", now - 10))
+    assert store.lookup(0, other.public_key.hex()) == (False, None)
+
+
+@pytest.mark.asyncio
+async def test_persisted_entries_survive_restart(tmp_path):
+    key = PrivateKey()
+    path = str(tmp_path / "events.db")
+    store = ReplaceableEventStore(path=path)
+    await store.open()
+    store.put(_event(key, 0, "profile", int(time.time())))
+    await store.close()
+    store = ReplaceableEventStore(path=path)
+    await store.open()
+    assert store.get(0, key.public_key.hex()).content == "profile"
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_lookups_are_cached_and_refreshed_live():
+    key = PrivateKey()
+    pubkey = key.public_key.hex()
+    publisher = RelayManager([RELAY], key)
+    await publisher.send_event(Event(kind=0, content='{"name": "first"}'))
+    assert publisher.event_store.get(0, pubkey).content == '{"name": "first"}'
+
+    reader = RelayManager([RELAY], PrivateKey(), event_store=ReplaceableEventStore(live_refresh=True))
+    assert (await reader.get_replaceable(0, pubkey)).content == '{"name": "first"}'
+    assert await reader.get_replaceable(3, pubkey) is None
+    requests = reader.relays[0].health.requests
+    assert (await reader.get_replaceable_many(0, [pubkey, PrivateKey().public_key.hex()])).keys() == {pubkey}
+    assert await reader.get_following(pubkey) == []
+    assert reader.relays[0].health.requests == requests + 1
+
+    # Wait for the live subscription, then publish a newer profile
+    for _ in range(50):
+        if pubkey in reader.event_store.live_authors:
+            break
+        await asyncio.sleep(0.1)
+    # Let the subscription open; created_at also has one second resolution
+    await asyncio.sleep(1.5)
+    await publisher.send_event(Event(kind=0, content='{"name": "second"}'))
+    for _ in range(50):
+        if reader.event_store.get(0, pubkey).content == '{"name": "second"}':
+            break
+        await asyncio.sleep(0.1)
+    assert (await reader.get_replaceable(0, pubkey)).content == '{"name": "second"}'
+    assert reader.relays[0].health.requests == requests + 1
+    await reader.close()
+    await publisher.close()
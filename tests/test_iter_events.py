@@ -0,0 +1,66 @@
+import os
+import time
+import contextlib
+import pytest
+import websockets
+from dotenv import load_dotenv
+from pynostr.event import Event
+from pynostr.filters import Filters
+from pynostr.key import PrivateKey
+from agentstr.relays import RelayManager
+
+load_dotenv()
+
+RELAY = os.getenv("NOSTR_RELAYS", "ws://localhost:6969").split(",")[0]
+# The same relay under a second URL, so it gets its own connection
+RELAY_ALIAS = RELAY.replace("localhost", "127.0.0.1")
+
+
+@contextlib.asynccontextmanager
+async def stalled_relay():
+    async def silent(ws):
+        async for _ in ws:
+            pass
+
+    async with websockets.serve(silent, "localhost", 0) as server:
+        yield f"ws://localhost:{server.sockets[0].getsockname()[1]}"
+
+
+async def publish_notes(count: int) -> tuple[PrivateKey, list[Event]]:
+    key = PrivateKey()
+    publisher = RelayManager([RELAY], key)
+    events = [await publisher.send_event(Event(kind=1, content=f"note {i}")) for i in range(count)]
+    return key, events
+
+
+@pytest.mark.asyncio
+async def test_iter_events_merges_and_dedupes_relays():
+    key, published = await publish_notes(3)
+    manager = RelayManager([RELAY, RELAY_ALIAS], PrivateKey())
+    filters = Filters(authors=[key.public_key.hex()], kinds=[1], limit=10)
+    streamed = [event async for event in manager.iter_events(filters)]
+    assert sorted(e.id for e in streamed) == sorted(e.id for e in published)
+
+
+@pytest.mark.asyncio
+async def test_limit_closes_other_subscriptions():
+    _key, published = await publish_notes(1)
+    async with stalled_relay() as stalled:
+        manager = RelayManager([stalled, RELAY], PrivateKey())
+        t0 = time.time()
+        events = await manager.get_events(Filters(ids=[published[0].id], limit=1), timeout=10)
+        assert [e.id for e in events] == [published[0].id]
+        assert time.time() - t0 < 5
+        assert all(relay.connection.stats()["subscriptions"] == 0 for relay in manager.relays)
+
+
+@pytest.mark.asyncio
+async def test_eose_quorum_stops_without_waiting_for_stalled_relay():
+    async with stalled_relay() as stalled:
+        manager = RelayManager([stalled, RELAY], PrivateKey())
+        filters = Filters(authors=[PrivateKey().public_key.hex()], kinds=[1], limit=5)
+        t0 = time.time()
+        events = [event async for event in manager.iter_events(filters, timeout=10, eose_quorum=1)]
+        assert events == []
+        assert time.time() - t0 < 5
+        assert manager.relays[0].connection.stats()["subscriptions"] == 0
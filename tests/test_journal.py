@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from agentstr.database import Database
+from agentstr.database.journal import MessageJournal
+
+
+@pytest_asyncio.fixture
+async def db():
+    database = Database('sqlite://:memory:', agent_name='test')
+    await database.async_init()
+    yield database
+    await database.close()
+
+
+@pytest.mark.asyncio
+async def test_messages_are_written_in_batches(db, monkeypatch):
+    batches = []
+    add_messages = db.add_messages
+
+    async def record(messages):
+        batches.append(len(messages))
+        await add_messages(messages)
+
+    monkeypatch.setattr(db, "add_messages", record)
+    journal = MessageJournal(db, flush_interval=0.05, batch_size=10)
+    for i in range(25):
+        await journal.add_message("t1", "u1", "agent", message=str(i), kind="tool_message")
+    assert journal.pending == 25
+    await asyncio.sleep(0.2)
+    assert journal.pending == 0
+    assert sum(batches) == 25 and max(batches) <= 10 and len(batches) < 25
+    messages = await db.get_messages("t1", "u1")
+    assert [m.message for m in messages] == [str(i) for i in range(25)]
+    assert [m.idx for m in messages] == list(range(25))
+    assert messages[0].created_at <= messages[-1].created_at
+    await journal.close()
+
+
+@pytest.mark.asyncio
+async def test_reads_see_pending_writes_and_close_flushes(db):
+    journal = MessageJournal(db, flush_interval=60)
+    queued = await journal.add_message("t1", "u1", "user", message="hello", extra_inputs={"a": 1})
+    assert (queued.message, queued.role, queued.idx) == ("hello", "user", -1)
+    history = await journal.get_messages("t1", "u1")
+    assert [(m.message, m.extra_inputs) for m in history] == [("hello", {"a": 1})]
+    await journal.add_message("t1", "u1", "agent", message="hi")
+    assert (await journal.get_thread_info("t1", "u1")).last_role == "agent"
+    await journal.add_message("t1", "u1", "user", message="again")
+    assert [m.message for m in await journal.get_history("t1", "u1", limit=2)] == ["hi", "again"]
+    await journal.add_message("t2", "u1", "user", message="bye")
+    await journal.close()
+    assert [m.message for m in await db.get_messages("t2", "u1")] == ["bye"]
+
+
+@pytest.mark.asyncio
+async def test_full_queue_blocks_writers_and_failed_batches_are_retried(db, monkeypatch):
+    failures = []
+    add_messages = db.add_messages
+
+    async def flaky(messages):
+        if not failures:
+            failures.append(len(messages))
+            raise RuntimeError("database unavailable")
+        await add_messages(messages)
+
+    monkeypatch.setattr(db, "add_messages", flaky)
+    journal = MessageJournal(db, flush_interval=0.01, batch_size=5, max_queue_size=5)
+    await asyncio.wait_for(asyncio.gather(*[
+        journal.add_message("t1", "u1", "user", message=str(i)) for i in range(20)
+    ]), timeout=5)
+    await journal.close()
+    assert failures == [5]
+    assert sorted(int(m.message) for m in await db.get_messages("t1", "u1")) == list(range(20))
+
+
+@pytest.mark.asyncio
+async def test_batches_failing_too_often_are_dropped(db, monkeypatch):
+    async def broken(messages):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(db, "add_messages", broken)
+    journal = MessageJournal(db, flush_interval=0.01, batch_size=5, max_queue_size=5, max_retries=3)
+    await journal.add_message("t1", "u1", "user", message="lost")
+    with pytest.raises(RuntimeError):
+        await journal.get_history("t1", "u1")
+    # Writers are unblocked once the failing batches are given up on
+    await asyncio.wait_for(asyncio.gather(*[
+        journal.add_message("t2", "u1", "user", message=str(i)) for i in range(10)
+    ]), timeout=5)
+    await asyncio.sleep(0.3)
+    assert journal.pending == 0
+    # Only the most recent max_queue_size dropped messages are kept
+    assert [m["message"] for m in journal.dead_letters] == [str(i) for i in range(5, 10)]
+    assert await journal.get_history("t1", "u1") == []
+    await journal.close()
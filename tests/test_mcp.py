@@ -0,0 +1,103 @@
+import os
+import asyncio
+import json
+import random
+import pytest
+import pytest_asyncio
+from dotenv import load_dotenv
+from pynostr.key import PrivateKey
+from agentstr.mcp.nostr_mcp_client import NostrMCPClient
+from agentstr.mcp.nostr_mcp_server import NostrMCPServer
+from agentstr.nostr_client import NostrClient
+
+load_dotenv()
+
+RELAY = os.getenv("NOSTR_RELAYS", "ws://localhost:6969").split(",")[0]
+
+
+async def add(a: int, b: int) -> int:
+    """Add two numbers."""
+    await asyncio.sleep(random.uniform(0, 0.2))
+    return a + b
+
+
+@pytest_asyncio.fixture
+async def mcp_server():
+    server = NostrMCPServer("Test Server", relays=[RELAY], private_key=PrivateKey().bech32(), tools=[add])
+    task = asyncio.create_task(server.start())
+    await asyncio.sleep(1)
+    yield server
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await server.client.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_tool_calls_are_correlated(mcp_server):
+    client = NostrMCPClient(mcp_server.client.public_key.hex(), relays=[RELAY], private_key=PrivateKey().bech32())
+    try:
+        results = await asyncio.gather(*[
+            client.call_tool("add", {"a": i, "b": 100}, timeout=10) for i in range(5)
+        ])
+        assert [r["content"][0]["text"] for r in results] == [str(i + 100) for i in range(5)]
+    finally:
+        await client.client.close()
+
+
+@pytest.mark.asyncio
+async def test_responses_reference_request(mcp_server):
+    client = NostrMCPClient(mcp_server.client.public_key.hex(), relays=[RELAY], private_key=PrivateKey().bech32())
+    try:
+        request = '{"action": "call_tool", "tool_name": "add", "arguments": {"a": 1, "b": 2}}'
+        event = client.client.relay_manager.encrypt_message(request, client.mcp_pubkey)
+        pending = client.client.relay_manager.dm_router.expect(client.mcp_pubkey, since=event.created_at)
+        await client.client.relay_manager._publish(event)
+        reply = await client.client.relay_manager.dm_router.wait(pending, timeout=10)
+        assert reply.event.has_event_ref(event.id)
+    finally:
+        await client.client.close()
+
+
+def _catalog(*names: str) -> str:
+    return json.dumps({"tools": [{"name": name, "description": name, "inputSchema": {}, "satoshis": 0}
+                                 for name in names]})
+
+
+@pytest.mark.asyncio
+async def test_tool_catalog_is_cached_and_refreshed_live():
+    server_key = PrivateKey()
+    server = NostrClient(relays=[RELAY], private_key=server_key.bech32())
+    await server.update_metadata(name="catalog", about=_catalog("add"))
+    client = NostrMCPClient(server_key.public_key.hex(), relays=[RELAY], private_key=PrivateKey().bech32(), cache_ttl=0.2)
+    health = client.client.relay_manager.relays[0].health
+    try:
+        results = await asyncio.gather(*[client.list_tools() for _ in range(5)])
+        assert all(tools is results[0] for tools in results)
+        assert [skill.name for skill in await client.get_skills()] == ["add"]
+        assert health.requests == 1
+        catalog_id = client.catalog_id
+        # After the TTL the unchanged metadata event is recognized and not parsed again
+        await asyncio.sleep(0.3)
+        assert await client.list_tools(refresh=True) is results[0]
+        assert client.catalog_id == catalog_id
+
+        updates = []
+
+        async def on_update(tools):
+            updates.append([tool["name"] for tool in tools["tools"]])
+
+        client.add_update_callback(on_update)
+        client.watch()
+        await asyncio.sleep(1.5)  # created_at has one second resolution
+        await server.update_metadata(about=_catalog("add", "multiply"))
+        for _ in range(50):
+            if updates:
+                break
+            await asyncio.sleep(0.1)
+        assert updates == [["add", "multiply"]]
+        assert client.catalog_id != catalog_id
+        assert [tool["name"] for tool in (await client.list_tools())["tools"]] == ["add", "multiply"]
+    finally:
+        await client.close()
+        await client.client.close()
+        await server.close()
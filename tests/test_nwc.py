@@ -1,10 +1,28 @@
 import os
+import json
+import time
+import asyncio
+import hashlib
 import pytest
+import pytest_asyncio
 from dotenv import load_dotenv
+from bolt11 import encode
+from bolt11.decode import decode
+from bolt11.models.tags import TagChar, Tags
+from bolt11.types import Bolt11, MilliSatoshi
+from pynostr.event import Event
+from pynostr.filters import Filters
+from pynostr.key import PrivateKey
 
 load_dotenv()
 
 from agentstr.relays import NWCRelay
+from agentstr.relays.connection_pool import ConnectionPool
+from agentstr.relays.crypto import nip44_encrypt
+from agentstr.relays.nwc_relay import decrypt, encrypt, get_signed_event
+from agentstr.relays.relay import EventRelay
+
+RELAY = os.getenv("NOSTR_RELAYS", "ws://localhost:6969").split(",")[0]
 
 #nwc_relay = NWCRelay(os.getenv("TEST_NWC_CONN_STR"))
 
@@ -12,4 +30,195 @@ from agentstr.relays import NWCRelay
 #@pytest.mark.asyncio
 #async def test_get_info():
 #    info = await nwc_relay.get_info()
-#    assert info["result"]["pubkey"]
\ No newline at end of file
+#    assert info["result"]["pubkey"]
+
+
+class FakeWallet:
+    """Minimal NIP-47 wallet service answering requests on the local relay."""
+    def __init__(self, notifications: bool, nip44: bool = False):
+        self.key = PrivateKey()
+        self.app_key = PrivateKey()
+        self.notifications = notifications
+        self.nip44 = nip44
+        self.relay = EventRelay(RELAY, pool=ConnectionPool())
+        self.invoices: dict[str, str] = {}
+        self.paid: set[str] = set()
+        self.requests: list[str] = []
+
+    @property
+    def nwc_str(self) -> str:
+        return f"nostr+walletconnect://{self.key.public_key.hex()}?relay={RELAY}&secret={self.app_key.hex()}"
+
+    def make_invoice(self, amount_msat: int) -> str:
+        preimage = os.urandom(32)
+        payment_hash = hashlib.sha256(preimage).hexdigest()
+        tags = Tags()
+        tags.add(TagChar.payment_hash, payment_hash)
+        tags.add(TagChar.payment_secret, os.urandom(32).hex())
+        tags.add(TagChar.description, "test")
+        invoice = encode(Bolt11(currency="bc", date=int(time.time()), tags=tags,
+                                amount_msat=MilliSatoshi(amount_msat)), self.key.hex())
+        self.invoices[payment_hash] = preimage.hex()
+        return invoice
+
+    async def send(self, kind: int, content: dict, tags: list[list[str]]):
+        cipher = nip44_encrypt if kind == 23197 else encrypt
+        event = Event(kind=kind, content=cipher(self.key.hex(), self.app_key.public_key.hex(), json.dumps(content)),
+                      tags=[["p", self.app_key.public_key.hex()], *tags], pubkey=self.key.public_key.hex())
+        event.sign(self.key.hex())
+        await self.relay.send_event(event)
+
+    async def pay(self, invoice: str):
+        payment_hash = decode(invoice).payment_hash
+        self.paid.add(payment_hash)
+        if self.notifications:
+            await self.send(23197 if self.nip44 else 23196, {"notification_type": "payment_received",
+                                    "notification": {"payment_hash": payment_hash}}, [])
+
+    def handle(self, request: dict) -> dict:
+        method = request["method"]
+        params = request.get("params", {})
+        if method == "get_info":
+            return {"methods": ["make_invoice", "lookup_invoice"],
+                    "notifications": ["payment_received"] if self.notifications else []}
+        if method == "make_invoice":
+            return {"invoice": self.make_invoice(params["amount"])}
+        if method == "lookup_invoice":
+            payment_hash = decode(params["invoice"]).payment_hash
+            if payment_hash in self.paid:
+                return {"payment_hash": payment_hash, "preimage": self.invoices.get(payment_hash, ""),
+                        "settled_at": int(time.time())}
+            return {"payment_hash": payment_hash}
+        if method == "get_balance":
+            return {"balance": 21000}
+        raise ValueError(method)
+
+    async def serve(self):
+        filters = Filters(kinds=[23194], pubkey_refs=[self.key.public_key.hex()], since=int(time.time()))
+        subscription = await self.relay.connection.subscribe(filters)
+        try:
+            while True:
+                kind, payload = await subscription.recv()
+                if kind != "EVENT":
+                    continue
+                event = Event.from_dict(payload)
+                request = json.loads(decrypt(self.key.hex(), event.pubkey, event.content))
+                self.requests.append(request["method"])
+                await self.send(23195, {"result_type": request["method"], "result": self.handle(request)},
+                                [["e", event.id]])
+        finally:
+            await subscription.close()
+
+
+@pytest_asyncio.fixture
+async def wallet(request):
+    wallet = FakeWallet(**getattr(request, "param", {"notifications": True}))
+    task = asyncio.create_task(wallet.serve())
+    await asyncio.sleep(0.3)
+    yield wallet
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await wallet.relay.pool.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("wallet", [{"notifications": True}, {"notifications": True, "nip44": True}],
+                         indirect=True)
+async def test_payment_resolved_by_notification(wallet):
+    nwc_relay = NWCRelay(wallet.nwc_str, pool=ConnectionPool())
+    invoice = wallet.make_invoice(1000)
+    waiter = asyncio.create_task(nwc_relay.wait_for_payment_success(invoice, timeout=10))
+    await asyncio.sleep(1)
+    await wallet.pay(invoice)
+    t0 = time.time()
+    assert await waiter
+    assert time.time() - t0 < 1
+    assert nwc_relay.payment_watcher.notifications is True
+    assert "lookup_invoice" not in wallet.requests
+    await nwc_relay.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("wallet", [{"notifications": False}], indirect=True)
+async def test_payment_falls_back_to_polling(wallet):
+    nwc_relay = NWCRelay(wallet.nwc_str, pool=ConnectionPool())
+    invoices = [wallet.make_invoice(1000) for _ in range(3)]
+    waiters = [asyncio.create_task(nwc_relay.wait_for_payment_success(i, timeout=15, interval=0.2)) for i in invoices]
+    await asyncio.sleep(1)
+    assert nwc_relay.payment_watcher.notifications is False
+    for invoice in invoices:
+        await wallet.pay(invoice)
+    assert await asyncio.gather(*waiters) == [True, True, True]
+    await nwc_relay.close()
+
+
+@pytest.mark.asyncio
+async def test_missed_notification_found_by_fallback_poll(wallet):
+    nwc_relay = NWCRelay(wallet.nwc_str, pool=ConnectionPool())
+    nwc_relay.payment_watcher.notifications = True
+    nwc_relay.payment_watcher.fallback_poll_interval = 0.5
+    invoice = wallet.make_invoice(1000)
+    waiter = asyncio.create_task(nwc_relay.wait_for_payment_success(invoice, timeout=10))
+    await asyncio.sleep(0.3)
+    wallet.paid.add(decode(invoice).payment_hash)  # paid without a notification
+    assert await asyncio.wait_for(waiter, timeout=3)
+    assert "lookup_invoice" in wallet.requests
+    await nwc_relay.close()
+
+
+@pytest.mark.asyncio
+async def test_pending_invoices_looked_up_after_resubscribe(wallet):
+    nwc_relay = NWCRelay(wallet.nwc_str, pool=ConnectionPool())
+    nwc_relay.payment_watcher.notifications = True
+    invoice = wallet.make_invoice(1000)
+    waiter = asyncio.create_task(nwc_relay.wait_for_payment_success(invoice, timeout=30))
+    await asyncio.sleep(0.5)
+    # The notification would have been sent while the subscription was down
+    wallet.paid.add(decode(invoice).payment_hash)
+    await nwc_relay.event_relay.connection.close()
+    assert await asyncio.wait_for(waiter, timeout=5)
+    await nwc_relay.close()
+
+
+@pytest.mark.asyncio
+async def test_unpaid_invoice_times_out(wallet):
+    nwc_relay = NWCRelay(wallet.nwc_str, pool=ConnectionPool())
+    nwc_relay.payment_watcher.notifications = True
+    calls = []
+
+    async def on_failure():
+        calls.append("failure")
+
+    await nwc_relay.on_payment_success(wallet.make_invoice(1000), unsuccess_callback=on_failure, timeout=1)
+    assert calls == ["failure"]
+    assert not nwc_relay.payment_watcher._waiters
+    await nwc_relay.close()
+
+
+@pytest.mark.asyncio
+async def test_pipelined_requests_share_one_subscription(wallet):
+    nwc_relay = NWCRelay(wallet.nwc_str, pool=ConnectionPool())
+    t0 = time.time()
+    invoices = await asyncio.gather(*[nwc_relay.make_invoice(amount=i + 1, description="test") for i in range(10)])
+    balance = await nwc_relay.get_balance()
+    assert time.time() - t0 < 5
+    assert [decode(invoice).amount_msat for invoice in invoices] == [(i + 1) * 1000 for i in range(10)]
+    assert balance == 21000
+    assert nwc_relay.event_relay.connection.stats()["subscriptions"] == 1
+    assert not nwc_relay._pending
+    await nwc_relay.close()
+
+
+@pytest.mark.asyncio
+async def test_request_timeout_without_wallet():
+    nwc_relay = NWCRelay(FakeWallet(notifications=False).nwc_str, pool=ConnectionPool(), request_timeout=0.5)
+    assert await nwc_relay.get_balance() is None
+    assert not nwc_relay._pending
+    await nwc_relay.close()
+
+
+def test_get_signed_event_is_deprecated():
+    key = PrivateKey()
+    with pytest.warns(DeprecationWarning):
+        event = get_signed_event({"content": "hi", "kind": 1, "pubkey": key.public_key.hex()}, key.hex())
+    assert event.verify()
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import uuid
+import pytest
+import pytest_asyncio
+from agentstr.database import PostgresDatabase
+from agentstr.models import User
+
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+pytestmark = pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL is not set")
+
+
+@pytest_asyncio.fixture
+async def db():
+    database = PostgresDatabase(POSTGRES_URL, agent_name=f"test-{uuid.uuid4().hex[:8]}", min_pool_size=2, max_pool_size=8)
+    await database.async_init()
+    yield database
+    await database.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_use_the_pool(db):
+    async def conversation(i: int):
+        await db.upsert_user(User(user_id=f"user{i}", available_balance=i))
+        await db.add_message(f"thread{i}", f"user{i}", "user", message="hi", content="hi")
+        return await db.get_user(f"user{i}"), await db.get_messages(f"thread{i}", f"user{i}")
+
+    results = await asyncio.gather(*[conversation(i) for i in range(50)])
+    for i, (user, messages) in enumerate(results):
+        assert user.available_balance == i
+        assert [m.message for m in messages] == ["hi"]
+    stats = db.pool_stats()
+    assert stats["min_size"] <= stats["size"] <= 8
+
+
+@pytest.mark.asyncio
+async def test_health_check(db):
+    assert await db.health_check()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_appends_get_unique_indices(db):
+    messages = await asyncio.gather(*[
+        db.add_message("busy", f"user{i % 3}", "user", message=str(i)) for i in range(200)
+    ])
+    assert sorted(m.idx for m in messages) == list(range(200))
+
+
+@pytest.mark.asyncio
+async def test_thread_info_and_summary(db):
+    assert await db.get_thread_info("thread", "u1") is None
+    for role in ("user", "agent", "user"):
+        last = await db.add_message("thread", "u1", role, content=role)
+    info = await db.get_thread_info("thread", "u1")
+    assert (info.last_idx, info.last_role, info.last_created_at) == (2, "user", last.created_at)
+    assert [m.idx for m in await db.get_history("thread", "u1", limit=2)] == [1, 2]
+    await db.set_thread_summary("thread", "u1", "newer", up_to_idx=1)
+    await db.set_thread_summary("thread", "u1", "older", up_to_idx=0)
+    assert (await db.get_thread_summary("thread", "u1")).summary == "newer"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_deductions_cannot_overspend(db):
+    assert await db.adjust_balance("payer", -1) is None
+    await db.adjust_balance("payer", 100)
+    results = await asyncio.gather(*[db.adjust_balance("payer", -15) for _ in range(20)],
+                                   db.set_current_thread_id("payer", "t1"))
+    assert len([r for r in results[:20] if r is not None]) == 6
+    user = await db.get_user("payer")
+    assert (user.available_balance, user.current_thread_id) == (10, "t1")
@@ -0,0 +1,63 @@
+import os
+import json
+import time
+import pytest
+import websockets
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from pynostr.event import Event
+from pynostr.key import PrivateKey
+from agentstr.relays import RelayManager
+
+load_dotenv()
+
+RELAY = os.getenv("NOSTR_RELAYS", "ws://localhost:6969").split(",")[0]
+
+
+@asynccontextmanager
+async def fake_relay(responses: list[tuple[bool, str]] | None):
+    """Relay answering each EVENT with the next ``(accepted, message)`` (the last one repeats), or never if None."""
+    received = []
+
+    async def handler(ws):
+        async for raw in ws:
+            message = json.loads(raw)
+            if message[0] != "EVENT":
+                continue
+            received.append(message[1]["id"])
+            if responses is not None:
+                accepted, reason = responses[min(len(received), len(responses)) - 1]
+                await ws.send(json.dumps(["OK", message[1]["id"], accepted, reason]))
+
+    async with websockets.serve(handler, "localhost", 0) as server:
+        yield f"ws://localhost:{server.sockets[0].getsockname()[1]}", received
+
+
+@pytest.mark.asyncio
+async def test_any_returns_before_slow_relay():
+    async with fake_relay(None) as (stalled, _):
+        manager = RelayManager([stalled, RELAY], PrivateKey(), publish_retries=0)
+        t0 = time.time()
+        await manager.send_event(Event(kind=1, content="fast ack"))
+        assert time.time() - t0 < 2
+        assert len(manager._background_publishes) == 1
+        await manager.close(timeout=0.1)
+
+
+@pytest.mark.asyncio
+async def test_rejection_fails_quorum_without_retry():
+    async with fake_relay([(False, "blocked: not allowed")]) as (blocking, received):
+        manager = RelayManager([blocking, RELAY], PrivateKey())
+        with pytest.raises(RuntimeError, match="blocked"):
+            await manager.send_event(Event(kind=1, content="needs all"), policy="all")
+        assert len(received) == 1
+        await manager.send_event(Event(kind=1, content="needs one"), policy=1)
+        await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_transient_rejection_is_retried():
+    async with fake_relay([(False, "rate-limited: slow down"), (True, "")]) as (limited, received):
+        manager = RelayManager([limited], PrivateKey(), publish_retries=2)
+        await manager.send_event(Event(kind=1, content="retry me"), policy="all")
+        assert len(received) == 2
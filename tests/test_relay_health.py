@@ -0,0 +1,78 @@
+import os
+import time
+import pytest
+import websockets
+from dotenv import load_dotenv
+from pynostr.event import Event
+from pynostr.filters import Filters
+from pynostr.key import PrivateKey
+from agentstr.relays import RelayManager
+from agentstr.relays.relay_health import RelayHealth, RelayHealthTracker
+
+load_dotenv()
+
+RELAY = os.getenv("NOSTR_RELAYS", "ws://localhost:6969").split(",")[0]
+DEAD_RELAY = "ws://localhost:1"
+
+
+def test_circuit_opens_probes_and_closes():
+    health = RelayHealth("wss://example", failure_threshold=2, reset_timeout=0.05)
+    health.record_failure("boom")
+    assert health.state == "closed"
+    health.record_failure("boom")
+    assert health.state == "open" and not health.available
+    time.sleep(0.06)
+    assert health.state == "half_open" and health.available
+    # A failed probe reopens the circuit for longer
+    health.record_failure("boom")
+    assert health.state == "open"
+    assert health.stats().retry_in > 0.05
+    time.sleep(0.11)
+    health.record_success(latency=0.1, eose=0.2)
+    assert health.state == "closed"
+    assert health.consecutive_failures == 0
+
+
+def test_select_prefers_fast_healthy_relays():
+    tracker = RelayHealthTracker(failure_threshold=1)
+    tracker.get("wss://slow").record_success(eose=2.0)
+    tracker.get("wss://fast").record_success(eose=0.1)
+    tracker.get("wss://dead").record_failure("refused")
+    assert tracker.select(["wss://slow", "wss://dead", "wss://fast"]) == ["wss://fast", "wss://slow"]
+    assert tracker.select(["wss://slow", "wss://fast"], n=1) == ["wss://fast"]
+    # With every circuit open, all relays are still tried
+    assert tracker.select(["wss://dead"]) == ["wss://dead"]
+
+
+@pytest.mark.asyncio
+async def test_dead_relay_is_skipped_after_circuit_opens():
+    manager = RelayManager([DEAD_RELAY, RELAY], PrivateKey())
+    filters = Filters(authors=[PrivateKey().public_key.hex()], kinds=[1], limit=1)
+    for _ in range(3):
+        assert await manager.get_events(filters, timeout=5) == []
+    dead = manager.health.get(DEAD_RELAY)
+    assert dead.state == "open"
+    requests = dead.requests
+    await manager.get_events(filters, timeout=5)
+    assert dead.requests == requests
+    stats = {s.url: s for s in manager.health_stats()}
+    assert stats[RELAY].state == "closed"
+    assert stats[RELAY].eose_ms is not None
+
+
+@pytest.mark.asyncio
+async def test_hedged_read_when_best_relay_stalls():
+    async def silent(ws):
+        async for _ in ws:
+            pass
+
+    async with websockets.serve(silent, "localhost", 0) as server:
+        stalled = f"ws://localhost:{server.sockets[0].getsockname()[1]}"
+        manager = RelayManager([stalled, RELAY], PrivateKey(), read_relays=1, hedge_delay=0.2)
+        # Make the stalled relay look best so it is asked first
+        manager.health.get(stalled).record_success(eose=0.01)
+        event = await RelayManager([RELAY], PrivateKey()).send_event(Event(kind=1, content="hedged"))
+        t0 = time.time()
+        events = await manager.get_events(Filters(ids=[event.id], limit=1), timeout=10)
+        assert [e.id for e in events] == [event.id]
+        assert time.time() - t0 < 5
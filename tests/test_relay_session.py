@@ -0,0 +1,40 @@
+import os
+import pytest
+from dotenv import load_dotenv
+from pynostr.key import PrivateKey
+from agentstr.nostr_client import NostrClient
+
+load_dotenv()
+
+RELAY = os.getenv("NOSTR_RELAYS", "ws://localhost:6969").split(",")[0]
+
+
+def nwc_string() -> str:
+    wallet_pubkey = PrivateKey().public_key.hex()
+    return f"nostr+walletconnect://{wallet_pubkey}?relay={RELAY}&secret={PrivateKey().hex()}"
+
+
+def test_session_objects_are_cached():
+    client = NostrClient(relays=[RELAY], private_key=PrivateKey().bech32(), nwc_str=nwc_string())
+    assert client.relay_manager is client.relay_manager
+    assert client.relay_manager.relays is client.relay_manager.relays
+    assert client.nwc_relay is client.nwc_relay
+    assert client.nwc_relay.event_relay is client.nwc_relay.event_relay
+
+
+def test_nwc_relay_none_without_connection_string(monkeypatch):
+    monkeypatch.delenv("NWC_CONN_STR", raising=False)
+    client = NostrClient(relays=[RELAY], private_key=PrivateKey().bech32())
+    assert client.nwc_relay is None
+
+
+@pytest.mark.asyncio
+async def test_session_lifecycle():
+    client = NostrClient(relays=[RELAY], private_key=PrivateKey().bech32(), nwc_str=nwc_string())
+    async with client:
+        stats = client.session.stats()
+        assert stats[RELAY]["connected"]
+        assert stats[RELAY]["connects"] == 1
+        await client.read_posts_by_author(client.public_key.hex())
+        assert client.session.stats()[RELAY]["connects"] == 1
+    assert not client.session.stats()
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agentstr.mcp.tool_executor import ToolExecutor
+
+
+def blocking_tool(seconds: float) -> str:
+    time.sleep(seconds)
+    return threading.current_thread().name
+
+
+@pytest.mark.asyncio
+async def test_sync_tools_run_off_the_event_loop():
+    executor = ToolExecutor()
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    names = await asyncio.gather(*[executor.run("blocking", blocking_tool, {"seconds": 0.2}) for _ in range(4)])
+    task.cancel()
+    executor.shutdown()
+    assert all(name.startswith("agentstr-tool") for name in names)
+    assert ticks > 5
+
+
+@pytest.mark.asyncio
+async def test_per_tool_and_global_limits():
+    executor = ToolExecutor(max_concurrency=3)
+    executor.configure_tool("limited", max_concurrency=1)
+    running = {"limited": 0, "free": 0}
+    peak = {"limited": 0, "free": 0, "total": 0}
+
+    def make(name):
+        async def fn():
+            running[name] += 1
+            peak[name] = max(peak[name], running[name])
+            peak["total"] = max(peak["total"], running["limited"] + running["free"])
+            await asyncio.sleep(0.05)
+            running[name] -= 1
+        return fn
+
+    await asyncio.gather(
+        *[executor.run("limited", make("limited"), {}) for _ in range(3)],
+        *[executor.run("free", make("free"), {}) for _ in range(5)],
+    )
+    assert peak["limited"] == 1
+    assert peak["total"] == 3
+
+
+@pytest.mark.asyncio
+async def test_calls_waiting_on_tool_limit_hold_no_global_slot():
+    executor = ToolExecutor(max_concurrency=2)
+    executor.configure_tool("limited", max_concurrency=1)
+    release = asyncio.Event()
+
+    async def limited():
+        await release.wait()
+
+    async def free():
+        return "free"
+
+    blocked = [asyncio.create_task(executor.run("limited", limited, {})) for _ in range(3)]
+    await asyncio.sleep(0)
+    # Only one limited call runs, leaving a global slot for other tools
+    assert await asyncio.wait_for(executor.run("free", free, {}), timeout=1) == "free"
+    release.set()
+    await asyncio.gather(*blocked)
+
+
+@pytest.mark.asyncio
+async def test_timeout():
+    executor = ToolExecutor(default_timeout=0.1)
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def quick():
+        return 1
+
+    with pytest.raises(TimeoutError):
+        await executor.run("slow", slow, {})
+    executor.configure_tool("slow", timeout=2)
+    assert await executor.run("slow", quick, {}) == 1
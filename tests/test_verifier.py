@@ -0,0 +1,54 @@
+import pytest
+from pynostr.event import Event
+from pynostr.key import PrivateKey
+
+from agentstr.relays.connection_pool import Subscription
+from agentstr.relays.relay import EventRelay
+from agentstr.relays.verifier import EventVerifier
+
+
+def signed_event(content: str) -> dict:
+    key = PrivateKey()
+    event = Event(content=content, pubkey=key.public_key.hex())
+    event.sign(key.hex())
+    return event.to_dict()
+
+
+def forged_events() -> list[dict]:
+    tampered = signed_event("original")
+    tampered["content"] = "tampered"
+    bad_sig = signed_event("bad sig")
+    bad_sig["sig"] = signed_event("other")["sig"]
+    wrong_id = signed_event("wrong id")
+    wrong_id["id"] = "0" * 64
+    return [tampered, bad_sig, wrong_id]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("executor", ["thread", "process"])
+async def test_verify_many(executor):
+    verifier = EventVerifier(executor=executor, batch_size=4)
+    events = [signed_event(f"valid {i}") for i in range(5)] + forged_events()
+    assert await verifier.verify_many(events) == [True] * 5 + [False] * 3
+    stats = verifier.stats()
+    assert stats.verified == 8
+    assert stats.invalid == 3
+    assert stats.batches == 2
+    assert stats.queue_depth == 0
+    assert stats.verifications_per_second > 0
+    verifier.close()
+
+
+@pytest.mark.asyncio
+async def test_receive_drops_invalid_events_in_one_batch():
+    verifier = EventVerifier()
+    relay = EventRelay("ws://localhost:6969", verifier=verifier)
+    subscription = Subscription(connection=None, sub_id="test", filters=[])
+    valid = signed_event("valid")
+    for payload in [valid, *forged_events()]:
+        subscription._push("EVENT", payload)
+    subscription._push("EOSE")
+    frames = await relay.receive(subscription)
+    assert frames == [("EVENT", valid), ("EOSE", None)]
+    assert verifier.stats().batches == 1
+    verifier.close()